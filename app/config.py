@@ -1,6 +1,7 @@
 """
 配置文件
 """
+
 from pydantic_settings import BaseSettings
 from typing import Optional
 import os
@@ -20,9 +21,64 @@ class Settings(BaseSettings):
     # 下载配置
     DOWNLOAD_DIR: str = "./downloads"
     MAX_CONCURRENT_DOWNLOADS: int = 3
-    CHUNK_SIZE: int = 1024 * 1024  # 1MB
+    CHUNK_SIZE: int = 1024 * 1024  # 初始块大小1MB,下载中按实测吞吐调整
+    MIN_CHUNK_SIZE: int = 64 * 1024  # 最小块大小64KB
+    MAX_CHUNK_SIZE: int = 8 * 1024 * 1024  # 最大块大小8MB
+    DOWNLOAD_SEGMENTS: int = 4  # 单个文件的并行分段数,1表示不分段
+    SEGMENT_MIN_SIZE: int = 4 * 1024 * 1024  # 每段最小4MB,文件过小时不分段
+    # 单个文件等待写盘的数据上限(字节),写满后暂停网络读取
+    WRITE_QUEUE_BYTES: int = 16 * 1024 * 1024
+    BUFFER_POOL_BYTES: int = 32 * 1024 * 1024  # 缓冲池保留的空闲缓冲区上限(字节)
+    CONTENT_STORE_ENABLED: bool = True  # 已下载过的视频直接从去重存储链接
+    CONTENT_STORE_DIR: Optional[str] = None  # 去重存储目录,默认 DOWNLOAD_DIR/.store
+    # 任务连续无进展的可重试错误次数上限(跨重启累计),下载到新数据后重新计算
     RETRY_TIMES: int = 3
+    # 重试等待基数(秒),第n次重试在 0 ~ base*2^n 秒之间随机等待
+    RETRY_BACKOFF_BASE: float = 1.0
+    RETRY_BACKOFF_MAX: float = 60.0  # 单次重试的最长等待时间(秒)
     TIMEOUT: int = 30
+    RECOVER_TASKS_ON_STARTUP: bool = True  # 启动时恢复上次退出时未完成的任务
+    RECOVERY_MAX_RETRIES: int = 3  # 被中断超过该次数的任务不再自动恢复,标记为失败
+    PROGRESS_FLUSH_INTERVAL: float = 1.0  # 下载进度批量写入数据库的间隔(秒)
+    METADATA_CONCURRENCY: int = 8  # 并发获取视频信息的数量(补全任务信息、批量创建任务)
+    DOWNLOAD_URL_CACHE_TTL: int = 600  # 下载链接未带过期时间时的缓存时长(秒)
+    DOWNLOAD_URL_EXPIRY_MARGIN: int = 60  # 比签名链接的过期时间提前失效的秒数
+    # 解析过的视频页面的缓存时间(秒),期间获取下载链接不再请求页面
+    VIDEO_INFO_CACHE_TTL: int = 120
+    VIDEO_INFO_CACHE_SIZE: int = 512  # 最多缓存的视频页面数,超过时淘汰最久未使用的
+    # 在API进程内下载;设为False时由独立的下载进程(python -m app.worker)领取任务
+    EMBEDDED_WORKER: bool = True
+    WORKER_POLL_INTERVAL: float = 1.0  # 查询数据库队列和控制命令的间隔(秒)
+    # 下载租约有效期(秒),进程退出后超过该时间未续期的任务由其他进程接管
+    LEASE_TTL: int = 30
+    LEASE_HEARTBEAT_INTERVAL: int = 10  # 下载租约续期间隔(秒)
+    # 任务读缓存的最长有效期(秒),多个进程共用数据库时其他进程的修改最迟在该时间后可见
+    TASK_CACHE_TTL: float = 2.0
+    # 任务变化推送的最小间隔(秒),间隔内同一任务的变化合并后推送
+    TASK_EVENT_INTERVAL: float = 1.0
+
+    # 下载连接池配置
+    # 启用HTTP/2(需要安装h2);同一主机的分段会复用一个连接,失去多连接的吞吐
+    DOWNLOAD_HTTP2: bool = False
+    DOWNLOAD_MAX_CONNECTIONS: int = 100  # 连接池最大连接数
+    DOWNLOAD_PER_HOST_CONNECTIONS: int = 16  # 单个CDN主机的最大并发请求数
+    DOWNLOAD_KEEPALIVE_EXPIRY: int = 30  # 空闲连接保持时间(秒)
+
+    # CDN镜像选择配置(masterUrl/backupUrls)
+    MIRROR_PROBE_TIMEOUT: int = 3  # 探测镜像延迟的超时时间(秒)
+    MIRROR_STATS_TTL: int = 300  # 镜像测量结果的有效期(秒),过期后重新探测
+    MIRROR_MIN_SPEED: int = 20  # 单连接吞吐低于该值(KB/s)时切换镜像
+    MIRROR_CHECK_INTERVAL: int = 5  # 吞吐检测窗口(秒)
+
+    # CDN主机熔断配置
+    # 同一主机连续故障(连接失败、超时、429/5xx)该次数后熔断
+    CIRCUIT_FAILURE_THRESHOLD: int = 5
+    CIRCUIT_OPEN_SECONDS: int = 30  # 首次熔断时长(秒),试探失败后加倍
+    CIRCUIT_MAX_OPEN_SECONDS: int = 600  # 最长熔断时长(秒)
+
+    # 带宽限速配置(KB/s, 0表示不限速, 运行时可通过 /api/system/bandwidth 调整)
+    GLOBAL_BANDWIDTH_LIMIT: int = 0  # 所有下载合计
+    TASK_BANDWIDTH_LIMIT: int = 0  # 单个任务
 
     # 小红书API配置
     XHS_BASE_URL: str = "https://www.xiaohongshu.com"
@@ -1,17 +1,60 @@
-from sqlalchemy import create_engine
+import logging
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
+logger = logging.getLogger(__name__)
+
 SQLALCHEMY_DATABASE_URL = "sqlite:///./sql_app.db"
 
+# 多个下载进程同时写入时等待数据库锁,而不是立即报错
 engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False, "timeout": 30}
 )
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
 
+def upgrade_schema():
+    """
+    为已存在的表补充模型中新增的列和索引
+    create_all只创建缺失的表,不会修改已有表的结构
+    """
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"
+                    # 数值默认值写入表结构,已有的行也会取得默认值
+                    default = column.default
+                    if (
+                        default is not None
+                        and default.is_scalar
+                        and isinstance(default.arg, (int, float))
+                    ):
+                        ddl += f" DEFAULT {int(default.arg) if isinstance(default.arg, bool) else default.arg}"
+                    conn.execute(text(ddl))
+
+    # 每个索引单独创建: 已有数据违反唯一索引时只跳过该索引,不影响启动
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        for index in table.indexes:
+            try:
+                with engine.begin() as conn:
+                    index.create(conn, checkfirst=True)
+            except SQLAlchemyError as e:
+                logger.warning(f"创建索引失败 {index.name}: {e}")
+
+
 def get_db():
     """
     数据库会话依赖项
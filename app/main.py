@@ -1,19 +1,43 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import HTMLResponse
 from . import models
-from .database import engine
-from .routers import items, tasks, videos, auth, favorites
+from .database import engine, upgrade_schema
+from .routers import items, tasks, videos, auth, favorites, system
 from .config import settings
+from .services.task_manager import task_manager
 import os
 
-# 创建数据库表
-models.Base.metadata.create_all(bind=engine)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    应用生命周期
+    启动时创建、升级数据库表,在后台恢复上次退出时未完成的任务,
+    并启动控制循环(跨进程的停止/暂停命令、下载租约续期和接管);
+    关闭时停止下载并释放下载连接池
+    """
+    # 创建数据库表;在启动时而不是导入时执行,导入应用(如运行测试)不会修改数据库
+    models.Base.metadata.create_all(bind=engine)
+    upgrade_schema()
+
+    recovery = None
+    if settings.RECOVER_TASKS_ON_STARTUP:
+        recovery = asyncio.create_task(task_manager.recover_tasks())
+    task_manager.start_control_loop()
+    yield
+    if recovery is not None and not recovery.done():
+        recovery.cancel()
+    await task_manager.shutdown()
+
 
 app = FastAPI(
     title=settings.APP_NAME,
     description="功能完整的小红书视频下载工具,支持单视频下载、批量下载、收藏夹管理等功能",
     version=settings.APP_VERSION,
+    lifespan=lifespan,
 )
 
 # 注册路由
@@ -21,6 +45,7 @@ app.include_router(tasks.router)
 app.include_router(videos.router)
 app.include_router(auth.router)
 app.include_router(favorites.router)
+app.include_router(system.router)
 app.include_router(items.router)  # 保留示例路由
 
 # 挂载静态文件
@@ -58,5 +83,5 @@ async def health_check():
     return {
         "status": "ok",
         "app_name": settings.APP_NAME,
-        "version": settings.APP_VERSION
+        "version": settings.APP_VERSION,
     }
@@ -1,4 +1,14 @@
-from sqlalchemy import Column, Integer, String, DateTime, Float, Text, JSON, Enum as SQLEnum
+from sqlalchemy import (
+    Column,
+    Integer,
+    String,
+    DateTime,
+    Float,
+    Text,
+    JSON,
+    Index,
+    Enum as SQLEnum,
+)
 from sqlalchemy.sql import func
 from datetime import datetime
 from .database import Base
@@ -7,6 +17,7 @@ import enum
 
 class TaskStatus(str, enum.Enum):
     """任务状态枚举"""
+
     PENDING = "pending"
     DOWNLOADING = "downloading"
     PAUSED = "paused"
@@ -17,6 +28,7 @@ class TaskStatus(str, enum.Enum):
 
 class VideoQuality(str, enum.Enum):
     """视频质量枚举"""
+
     HD = "hd"  # 高清
     SD = "sd"  # 标清
     LD = "ld"  # 流畅
@@ -24,7 +36,12 @@ class VideoQuality(str, enum.Enum):
 
 class DownloadTask(Base):
     """下载任务模型"""
+
     __tablename__ = "download_tasks"
+    # 续期、释放本进程的租约和接管过期租约时按进程和租约到期时间查询
+    __table_args__ = (
+        Index("ix_download_tasks_worker_lease", "worker_id", "lease_expires_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     task_id = Column(String, unique=True, index=True, nullable=False)  # 任务唯一ID
@@ -37,6 +54,11 @@ class DownloadTask(Base):
     # 下载配置
     quality = Column(SQLEnum(VideoQuality), default=VideoQuality.HD)  # 视频质量
     parts = Column(JSON)  # 选择下载的分P列表 [1,2,3] 或 null表示全部
+    priority = Column(Integer, default=0)  # 优先级,数值大的先下载
+    scheduled_at = Column(DateTime)  # 预定开始时间,之前不会开始下载
+    download_window = Column(
+        String
+    )  # 每天允许下载的时段 HH:MM-HH:MM,时段结束时暂停、下个时段继续
 
     # 任务状态
     status = Column(SQLEnum(TaskStatus), default=TaskStatus.PENDING, index=True)
@@ -44,24 +66,71 @@ class DownloadTask(Base):
     downloaded_size = Column(Integer, default=0)  # 已下载大小(字节)
     total_size = Column(Integer, default=0)  # 总大小(字节)
     speed = Column(Float, default=0.0)  # 下载速度(KB/s)
+    eta = Column(Float)  # 预计剩余时间(秒),未知时为空
 
     # 文件信息
     file_path = Column(String)  # 保存路径
     temp_path = Column(String)  # 临时文件路径(用于断点续传)
+    content_hash = Column(String, index=True)  # 文件内容SHA-256(下载时增量计算)
 
     # 错误信息
     error_message = Column(Text)  # 错误信息
-    retry_count = Column(Integer, default=0)  # 重试次数
+    retry_count = Column(Integer, default=0)  # 连续失败的重试次数,下载有进展时重新计算
+    recovery_count = Column(Integer, default=0)  # 下载被中断(进程退出)后自动恢复的次数
+    cdn_host = Column(String, index=True)  # 最近一次下载使用的CDN主机
+    worker_id = Column(String)  # 正在下载该任务的进程
+    lease_expires_at = Column(
+        DateTime
+    )  # 下载租约到期时间,进程按心跳续期,过期后由其他进程接管
 
     # 时间戳
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+    # 进入下载队列时间,推迟的任务为可以开始下载的时间
+    queued_at = Column(DateTime, index=True)
     started_at = Column(DateTime)  # 开始下载时间
     completed_at = Column(DateTime)  # 完成时间
 
 
+class TaskCommand(Base):
+    """发给正在下载任务的进程的控制命令"""
+
+    __tablename__ = "task_commands"
+
+    id = Column(Integer, primary_key=True, index=True)
+    task_id = Column(String, index=True, nullable=False)  # 任务ID
+    worker_id = Column(String, index=True, nullable=False)  # 目标进程
+    command = Column(String, nullable=False)  # stop/pause/delete,目标进程执行后删除
+
+    created_at = Column(DateTime, server_default=func.now())
+
+
+class StoredVideo(Base):
+    """去重存储中的视频"""
+
+    __tablename__ = "stored_videos"
+    # 每个视频和画质只有一条记录,并发存入时由唯一索引保证
+    __table_args__ = (
+        Index("ix_stored_videos_video_quality", "video_id", "quality", unique=True),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    video_id = Column(String, index=True, nullable=False)  # 小红书视频ID
+    quality = Column(SQLEnum(VideoQuality), nullable=False)  # 视频质量
+    content_hash = Column(String, index=True, nullable=False)  # 文件内容SHA-256
+    size = Column(Integer, default=0)  # 文件大小(字节)
+    blob_path = Column(String, nullable=False)  # 存储文件路径
+
+    hit_count = Column(Integer, default=0)  # 去重命中次数
+    saved_bytes = Column(Integer, default=0)  # 去重节省的下载流量(字节)
+
+    created_at = Column(DateTime, server_default=func.now())
+    last_used_at = Column(DateTime)  # 最后命中时间
+
+
 class Favorite(Base):
     """收藏夹模型"""
+
     __tablename__ = "favorites"
 
     id = Column(Integer, primary_key=True, index=True)
@@ -72,6 +141,7 @@ class Favorite(Base):
 
     video_count = Column(Integer, default=0)  # 视频数量
     invalid_count = Column(Integer, default=0)  # 失效视频数量
+    download_window = Column(String)  # 批量下载任务默认的下载时段 HH:MM-HH:MM
 
     last_sync_at = Column(DateTime)  # 最后同步时间
     created_at = Column(DateTime, server_default=func.now())
@@ -80,6 +150,7 @@ class Favorite(Base):
 
 class FavoriteVideo(Base):
     """收藏夹视频模型"""
+
     __tablename__ = "favorite_videos"
 
     id = Column(Integer, primary_key=True, index=True)
@@ -99,6 +170,7 @@ class FavoriteVideo(Base):
 
 class UserAuth(Base):
     """用户认证信息模型"""
+
     __tablename__ = "user_auth"
 
     id = Column(Integer, primary_key=True, index=True)
@@ -115,6 +187,7 @@ class UserAuth(Base):
 
 class Item(Base):
     """示例Item模型(可删除)"""
+
     __tablename__ = "items"
 
     id = Column(Integer, primary_key=True, index=True)
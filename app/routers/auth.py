@@ -1,6 +1,7 @@
 """
 用户认证路由
 """
+
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from ..database import get_db
@@ -31,9 +32,9 @@ async def login(auth_data: UserAuthCreate, db: Session = Depends(get_db)):
         user_id = hashlib.md5(auth_data.cookies.encode()).hexdigest()[:16]
 
         # 查询是否已存在
-        existing_auth = db.query(UserAuthModel).filter(
-            UserAuthModel.user_id == user_id
-        ).first()
+        existing_auth = (
+            db.query(UserAuthModel).filter(UserAuthModel.user_id == user_id).first()
+        )
 
         if existing_auth:
             # 更新Cookie
@@ -49,7 +50,7 @@ async def login(auth_data: UserAuthCreate, db: Session = Depends(get_db)):
                 user_id=user_id,
                 cookies=auth_data.cookies,
                 is_valid=1,
-                last_validated_at=datetime.now()
+                last_validated_at=datetime.now(),
             )
             db.add(new_auth)
             db.commit()
@@ -71,13 +72,7 @@ async def validate_cookies(auth_data: UserAuthCreate):
         xhs_api = XiaohongshuAPI(auth_data.cookies)
         is_valid = await xhs_api.validate_cookies()
 
-        return {
-            "code": 200,
-            "message": "success",
-            "data": {
-                "is_valid": is_valid
-            }
-        }
+        return {"code": 200, "message": "success", "data": {"is_valid": is_valid}}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -87,9 +82,7 @@ async def get_current_user(user_id: str, db: Session = Depends(get_db)):
     """
     获取当前用户信息
     """
-    user_auth = db.query(UserAuthModel).filter(
-        UserAuthModel.user_id == user_id
-    ).first()
+    user_auth = db.query(UserAuthModel).filter(UserAuthModel.user_id == user_id).first()
 
     if not user_auth:
         raise HTTPException(status_code=404, detail="用户不存在")
@@ -102,9 +95,7 @@ async def logout(user_id: str, db: Session = Depends(get_db)):
     """
     登出(删除Cookie)
     """
-    user_auth = db.query(UserAuthModel).filter(
-        UserAuthModel.user_id == user_id
-    ).first()
+    user_auth = db.query(UserAuthModel).filter(UserAuthModel.user_id == user_id).first()
 
     if not user_auth:
         raise HTTPException(status_code=404, detail="用户不存在")
@@ -112,8 +103,4 @@ async def logout(user_id: str, db: Session = Depends(get_db)):
     db.delete(user_auth)
     db.commit()
 
-    return {
-        "code": 200,
-        "message": "已登出",
-        "data": {"user_id": user_id}
-    }
+    return {"code": 200, "message": "已登出", "data": {"user_id": user_id}}
@@ -1,16 +1,24 @@
 """
 收藏夹路由
 """
+
 from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Query
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime
 from ..database import get_db
-from ..schemas import Favorite, FavoriteCreate, FavoriteVideo, FavoriteVideoCreate
+from ..schemas import (
+    Favorite,
+    FavoriteCreate,
+    FavoriteVideo,
+    FavoriteVideoCreate,
+    FavoriteWindow,
+)
 from ..models import Favorite as FavoriteModel, FavoriteVideo as FavoriteVideoModel
 from ..services.xiaohongshu_api import XiaohongshuAPI
 from ..services.task_manager import task_manager
-from ..schemas import DownloadTaskCreate, VideoQuality
+from ..services.windows import DownloadWindow
+from ..schemas import DownloadTaskCreate, VideoQuality, WINDOW_PATTERN
 
 router = APIRouter(prefix="/api/favorites", tags=["收藏夹管理"])
 
@@ -21,9 +29,11 @@ async def create_favorite(favorite_data: FavoriteCreate, db: Session = Depends(g
     创建收藏夹
     """
     # 检查是否已存在
-    existing = db.query(FavoriteModel).filter(
-        FavoriteModel.favorite_id == favorite_data.favorite_id
-    ).first()
+    existing = (
+        db.query(FavoriteModel)
+        .filter(FavoriteModel.favorite_id == favorite_data.favorite_id)
+        .first()
+    )
 
     if existing:
         raise HTTPException(status_code=400, detail="收藏夹已存在")
@@ -37,11 +47,7 @@ async def create_favorite(favorite_data: FavoriteCreate, db: Session = Depends(g
 
 
 @router.get("/", response_model=List[Favorite])
-async def get_favorites(
-    skip: int = 0,
-    limit: int = 100,
-    db: Session = Depends(get_db)
-):
+async def get_favorites(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
     """
     获取收藏夹列表
     """
@@ -54,29 +60,54 @@ async def get_favorite(favorite_id: str, db: Session = Depends(get_db)):
     """
     获取收藏夹详情
     """
-    favorite = db.query(FavoriteModel).filter(
-        FavoriteModel.favorite_id == favorite_id
-    ).first()
+    favorite = (
+        db.query(FavoriteModel).filter(FavoriteModel.favorite_id == favorite_id).first()
+    )
+
+    if not favorite:
+        raise HTTPException(status_code=404, detail="收藏夹不存在")
+
+    return favorite
+
 
+@router.put("/{favorite_id}/window", response_model=Favorite)
+async def set_download_window(
+    favorite_id: str, data: FavoriteWindow, db: Session = Depends(get_db)
+):
+    """
+    设置收藏夹批量下载的默认下载时段,为空时不限制
+    """
+    favorite = (
+        db.query(FavoriteModel).filter(FavoriteModel.favorite_id == favorite_id).first()
+    )
     if not favorite:
         raise HTTPException(status_code=404, detail="收藏夹不存在")
 
+    if data.download_window:
+        try:
+            DownloadWindow.parse(data.download_window)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    favorite.download_window = data.download_window
+    db.commit()
+    db.refresh(favorite)
     return favorite
 
 
 @router.post("/{favorite_id}/sync")
 async def sync_favorite(
-    favorite_id: str,
-    cookies: Optional[str] = None,
-    db: Session = Depends(get_db)
+    favorite_id: str, cookies: Optional[str] = None, db: Session = Depends(get_db)
 ):
     """
     同步收藏夹(从小红书获取最新视频列表)
     """
     try:
-        favorite = db.query(FavoriteModel).filter(
-            FavoriteModel.favorite_id == favorite_id
-        ).first()
+        favorite = (
+            db.query(FavoriteModel)
+            .filter(FavoriteModel.favorite_id == favorite_id)
+            .first()
+        )
 
         if not favorite:
             raise HTTPException(status_code=404, detail="收藏夹不存在")
@@ -85,19 +116,23 @@ async def sync_favorite(
         xhs_api = XiaohongshuAPI(cookies)
         videos_data = await xhs_api.get_favorite_videos(favorite_id)
 
-        video_list = videos_data.get('list', [])
+        video_list = videos_data.get("list", [])
         synced_count = 0
 
         for video in video_list:
-            video_id = video.get('note_id') or video.get('id')
+            video_id = video.get("note_id") or video.get("id")
             if not video_id:
                 continue
 
             # 检查是否已存在
-            existing = db.query(FavoriteVideoModel).filter(
-                FavoriteVideoModel.favorite_id == favorite_id,
-                FavoriteVideoModel.video_id == video_id
-            ).first()
+            existing = (
+                db.query(FavoriteVideoModel)
+                .filter(
+                    FavoriteVideoModel.favorite_id == favorite_id,
+                    FavoriteVideoModel.video_id == video_id,
+                )
+                .first()
+            )
 
             if not existing:
                 # 添加新视频
@@ -105,19 +140,21 @@ async def sync_favorite(
                     favorite_id=favorite_id,
                     video_id=video_id,
                     video_url=f"https://www.xiaohongshu.com/explore/{video_id}",
-                    title=video.get('title') or video.get('display_title', ''),
-                    author=video.get('user', {}).get('nickname', ''),
-                    cover_url=video.get('cover', {}).get('url', ''),
+                    title=video.get("title") or video.get("display_title", ""),
+                    author=video.get("user", {}).get("nickname", ""),
+                    cover_url=video.get("cover", {}).get("url", ""),
                     is_valid=1,
-                    is_downloaded=0
+                    is_downloaded=0,
                 )
                 db.add(new_video)
                 synced_count += 1
 
         # 更新收藏夹信息
-        favorite.video_count = db.query(FavoriteVideoModel).filter(
-            FavoriteVideoModel.favorite_id == favorite_id
-        ).count()
+        favorite.video_count = (
+            db.query(FavoriteVideoModel)
+            .filter(FavoriteVideoModel.favorite_id == favorite_id)
+            .count()
+        )
         favorite.last_sync_at = datetime.now()
 
         db.commit()
@@ -128,8 +165,8 @@ async def sync_favorite(
             "data": {
                 "favorite_id": favorite_id,
                 "synced_count": synced_count,
-                "total_count": favorite.video_count
-            }
+                "total_count": favorite.video_count,
+            },
         }
 
     except Exception as e:
@@ -142,7 +179,7 @@ async def get_favorite_videos(
     valid_only: bool = Query(True, description="仅显示有效视频"),
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
 ):
     """
     获取收藏夹中的视频列表
@@ -163,16 +200,19 @@ async def check_invalid_videos(
     favorite_id: str,
     background_tasks: BackgroundTasks,
     cookies: Optional[str] = None,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
 ):
     """
     检测收藏夹中的失效视频
     """
+
     async def check_task():
         xhs_api = XiaohongshuAPI(cookies)
-        videos = db.query(FavoriteVideoModel).filter(
-            FavoriteVideoModel.favorite_id == favorite_id
-        ).all()
+        videos = (
+            db.query(FavoriteVideoModel)
+            .filter(FavoriteVideoModel.favorite_id == favorite_id)
+            .all()
+        )
 
         invalid_count = 0
         for video in videos:
@@ -182,9 +222,11 @@ async def check_invalid_videos(
                 invalid_count += 1
 
         # 更新收藏夹失效计数
-        favorite = db.query(FavoriteModel).filter(
-            FavoriteModel.favorite_id == favorite_id
-        ).first()
+        favorite = (
+            db.query(FavoriteModel)
+            .filter(FavoriteModel.favorite_id == favorite_id)
+            .first()
+        )
         if favorite:
             favorite.invalid_count = invalid_count
 
@@ -195,7 +237,7 @@ async def check_invalid_videos(
     return {
         "code": 200,
         "message": "检测任务已启动",
-        "data": {"favorite_id": favorite_id}
+        "data": {"favorite_id": favorite_id},
     }
 
 
@@ -204,16 +246,21 @@ async def download_all_videos(
     favorite_id: str,
     quality: VideoQuality = VideoQuality.HD,
     valid_only: bool = True,
+    scheduled_at: Optional[datetime] = None,
+    download_window: Optional[str] = Query(None, pattern=WINDOW_PATTERN),
     cookies: Optional[str] = None,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
 ):
     """
     批量下载收藏夹中的所有视频
+    任务在后台并发获取视频信息后批量创建,立即返回批次ID,
+    通过 GET /api/tasks/batches/{batch_id} 查询进度;
+    指定预定时间或下载时段(默认使用收藏夹的下载时段)时,任务创建后自动入队,到时开始下载
     """
     try:
         query = db.query(FavoriteVideoModel).filter(
             FavoriteVideoModel.favorite_id == favorite_id,
-            FavoriteVideoModel.is_downloaded == 0
+            FavoriteVideoModel.is_downloaded == 0,
         )
 
         if valid_only:
@@ -222,31 +269,37 @@ async def download_all_videos(
         videos = query.all()
 
         if not videos:
-            return {
-                "code": 200,
-                "message": "没有需要下载的视频",
-                "data": {"count": 0}
-            }
+            return {"code": 200, "message": "没有需要下载的视频", "data": {"count": 0}}
+
+        if download_window is None:
+            favorite = (
+                db.query(FavoriteModel)
+                .filter(FavoriteModel.favorite_id == favorite_id)
+                .first()
+            )
+            download_window = favorite.download_window if favorite else None
 
         # 为每个视频创建下载任务
-        created_tasks = []
-        for video in videos:
-            task_data = DownloadTaskCreate(
+        tasks_data = [
+            DownloadTaskCreate(
                 video_url=video.video_url,
                 quality=quality,
-                parts=None
+                parts=None,
+                scheduled_at=scheduled_at,
+                download_window=download_window,
             )
-            task = await task_manager.create_task(db, task_data, cookies)
-            created_tasks.append(task.task_id)
+            for video in videos
+        ]
+        job = task_manager.create_tasks_batch(tasks_data, cookies)
 
         return {
             "code": 200,
-            "message": f"已创建 {len(created_tasks)} 个下载任务",
+            "message": f"正在创建 {len(tasks_data)} 个下载任务",
             "data": {
                 "favorite_id": favorite_id,
-                "task_count": len(created_tasks),
-                "task_ids": created_tasks
-            }
+                "batch_id": job.batch_id,
+                "task_count": len(tasks_data),
+            },
         }
 
     except Exception as e:
@@ -258,9 +311,9 @@ async def delete_favorite(favorite_id: str, db: Session = Depends(get_db)):
     """
     删除收藏夹
     """
-    favorite = db.query(FavoriteModel).filter(
-        FavoriteModel.favorite_id == favorite_id
-    ).first()
+    favorite = (
+        db.query(FavoriteModel).filter(FavoriteModel.favorite_id == favorite_id).first()
+    )
 
     if not favorite:
         raise HTTPException(status_code=404, detail="收藏夹不存在")
@@ -277,5 +330,5 @@ async def delete_favorite(favorite_id: str, db: Session = Depends(get_db)):
     return {
         "code": 200,
         "message": "收藏夹已删除",
-        "data": {"favorite_id": favorite_id}
+        "data": {"favorite_id": favorite_id},
     }
@@ -18,7 +18,12 @@ def get_db():
         db.close()
 
 
-@router.post("/items/", response_model=schemas.Item, summary="Create an item", description="Create an item with all the information.")
+@router.post(
+    "/items/",
+    response_model=schemas.Item,
+    summary="Create an item",
+    description="Create an item with all the information.",
+)
 def create_item(item: schemas.ItemCreate, db: Session = Depends(get_db)):
     db_item = models.Item(name=item.name, description=item.description)
     db.add(db_item)
@@ -27,13 +32,23 @@ def create_item(item: schemas.ItemCreate, db: Session = Depends(get_db)):
     return db_item
 
 
-@router.get("/items/", response_model=list[schemas.Item], summary="Read items", description="Read a list of items.")
+@router.get(
+    "/items/",
+    response_model=list[schemas.Item],
+    summary="Read items",
+    description="Read a list of items.",
+)
 def read_items(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
     items = db.query(models.Item).offset(skip).limit(limit).all()
     return items
 
 
-@router.get("/items/{item_id}", response_model=schemas.Item, summary="Read an item", description="Read an item by its ID.")
+@router.get(
+    "/items/{item_id}",
+    response_model=schemas.Item,
+    summary="Read an item",
+    description="Read an item by its ID.",
+)
 def read_item(item_id: int, db: Session = Depends(get_db)):
     db_item = db.query(models.Item).filter(models.Item.id == item_id).first()
     if db_item is None:
@@ -0,0 +1,144 @@
+"""
+系统设置路由
+"""
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from ..config import settings
+from ..database import get_db
+from ..schemas import BandwidthLimit, ConcurrencyLimit
+from ..services.task_manager import task_manager
+
+router = APIRouter(prefix="/api/system", tags=["系统设置"])
+
+
+def _require_embedded_worker(name: str):
+    """
+    限速和并发数只作用于本进程的下载;由独立的下载进程下载时修改本进程的设置不起作用,返回409
+    Args:
+        name: 设置的名称
+    """
+    if not settings.EMBEDDED_WORKER:
+        raise HTTPException(
+            status_code=409,
+            detail=f"下载由独立的下载进程执行,{name}需要在启动下载进程时设置",
+        )
+
+
+def _bandwidth_data() -> dict:
+    """当前限速配置(KB/s)"""
+    limits = task_manager.rate_limiter.get_limits()
+    return {
+        "global_limit": limits["global_rate"] // 1024,
+        "task_limit": limits["task_rate"] // 1024,
+    }
+
+
+@router.get("/bandwidth")
+async def get_bandwidth_limit():
+    """
+    获取带宽限速设置
+    """
+    return {"code": 200, "message": "success", "data": _bandwidth_data()}
+
+
+@router.put("/bandwidth")
+async def update_bandwidth_limit(limit: BandwidthLimit):
+    """
+    调整带宽限速,立即作用于所有进行中的下载
+    """
+    _require_embedded_worker("限速")
+    task_manager.rate_limiter.configure(
+        global_rate=(
+            limit.global_limit * 1024 if limit.global_limit is not None else None
+        ),
+        task_rate=limit.task_limit * 1024 if limit.task_limit is not None else None,
+    )
+    return {"code": 200, "message": "限速已更新", "data": _bandwidth_data()}
+
+
+@router.get("/write-stats")
+async def get_write_stats():
+    """
+    获取写盘统计: 写入线程阻塞在磁盘上的累计时间,网络读取因写入队列已满而等待的时间,
+    缓冲区复用情况,以及下载进度批量写入数据库的次数
+    """
+    data = task_manager.downloader.write_stats.to_dict()
+    data["buffer_pool"] = task_manager.downloader.buffer_pool.to_dict()
+    data["progress"] = task_manager.progress_buffer.to_dict()
+    return {"code": 200, "message": "success", "data": data}
+
+
+@router.get("/dedup-stats")
+async def get_dedup_stats(db: Session = Depends(get_db)):
+    """
+    获取去重存储统计: 存储的视频数、占用空间、命中次数以及节省的下载流量
+    """
+    return {
+        "code": 200,
+        "message": "success",
+        "data": task_manager.content_store.get_stats(db),
+    }
+
+
+@router.get("/mirrors")
+async def get_mirror_stats():
+    """
+    获取各CDN镜像主机的测量结果: 首字节延迟、单连接吞吐(字节/秒)和连续失败次数
+    """
+    return {
+        "code": 200,
+        "message": "success",
+        "data": task_manager.downloader.mirrors.to_dict(),
+    }
+
+
+@router.get("/url-cache")
+async def get_url_cache_stats():
+    """
+    获取下载链接缓存统计: 缓存的链接数、命中和未命中次数,以及因链接过期或下载失败而失效的次数
+    """
+    return {
+        "code": 200,
+        "message": "success",
+        "data": task_manager.xhs_api.url_cache.to_dict(),
+    }
+
+
+@router.get("/circuits")
+async def get_circuit_stats():
+    """
+    获取各CDN主机的熔断状态: 连续故障次数、是否熔断中和距离恢复的秒数
+    熔断中的主机上的任务会推迟下载,不消耗重试次数
+    """
+    return {
+        "code": 200,
+        "message": "success",
+        "data": task_manager.downloader.breaker.to_dict(),
+    }
+
+
+@router.get("/concurrency")
+async def get_concurrency():
+    """
+    获取调度状态: 最大并发下载数、下载中和排队中的任务数
+    """
+    return {
+        "code": 200,
+        "message": "success",
+        "data": task_manager.get_scheduler_stats(),
+    }
+
+
+@router.put("/concurrency")
+async def update_concurrency(limit: ConcurrencyLimit):
+    """
+    调整最大并发下载数,调大时立即启动排队中的任务,调小时进行中的下载不会被中断
+    """
+    _require_embedded_worker("并发数")
+    task_manager.set_concurrency(limit.max_concurrent_downloads)
+    return {
+        "code": 200,
+        "message": "并发数已更新",
+        "data": task_manager.get_scheduler_stats(),
+    }
@@ -1,11 +1,19 @@
 """
 任务管理路由
 """
+
 from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from ..database import get_db
-from ..schemas import DownloadTask, DownloadTaskCreate, ResponseModel, TaskStatus
+from ..schemas import (
+    DownloadTask,
+    DownloadTaskCreate,
+    ResponseModel,
+    TaskPriority,
+    TaskStatus,
+)
 from ..services.task_manager import task_manager
 
 router = APIRouter(prefix="/api/tasks", tags=["任务管理"])
@@ -15,7 +23,7 @@ router = APIRouter(prefix="/api/tasks", tags=["任务管理"])
 async def create_task(
     task_data: DownloadTaskCreate,
     cookies: Optional[str] = None,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
 ):
     """
     创建下载任务
@@ -27,12 +35,36 @@ async def create_task(
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@router.get("/batches/{batch_id}")
+async def get_batch(batch_id: str):
+    """
+    获取批量创建任务的进度
+    """
+    job = task_manager.get_batch_job(batch_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="批次不存在")
+    return {"code": 200, "message": "success", "data": job.to_dict()}
+
+
+@router.get("/events")
+async def task_events():
+    """
+    订阅任务变化(Server-Sent Events),只推送变化的字段
+    """
+    return StreamingResponse(
+        task_manager.events.stream(),
+        media_type="text/event-stream",
+        # 禁止代理缓冲和缓存,事件立即送达
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.post("/{task_id}/start")
 async def start_task(
     task_id: str,
     background_tasks: BackgroundTasks,
     cookies: Optional[str] = None,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
 ):
     """
     启动下载任务
@@ -73,7 +105,7 @@ async def resume_task(
     task_id: str,
     background_tasks: BackgroundTasks,
     cookies: Optional[str] = None,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
 ):
     """
     恢复下载任务
@@ -90,7 +122,7 @@ async def retry_task(
     task_id: str,
     background_tasks: BackgroundTasks,
     cookies: Optional[str] = None,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
 ):
     """
     重试失败的任务
@@ -102,6 +134,19 @@ async def retry_task(
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@router.put("/{task_id}/priority", response_model=DownloadTask)
+async def set_task_priority(
+    task_id: str, data: TaskPriority, db: Session = Depends(get_db)
+):
+    """
+    调整任务优先级,排队中的任务按新优先级重新排序
+    """
+    try:
+        return await task_manager.set_priority(db, task_id, data.priority)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
 @router.get("/{task_id}", response_model=DownloadTask)
 async def get_task(task_id: str, db: Session = Depends(get_db)):
     """
@@ -118,7 +163,7 @@ async def get_tasks(
     status: Optional[TaskStatus] = None,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
 ):
     """
     获取任务列表
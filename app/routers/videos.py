@@ -1,6 +1,7 @@
 """
 视频下载路由
 """
+
 from fastapi import APIRouter, HTTPException, Query
 from typing import Optional
 from ..schemas import VideoInfo
@@ -12,7 +13,7 @@ router = APIRouter(prefix="/api/videos", tags=["视频信息"])
 @router.get("/info")
 async def get_video_info(
     url: str = Query(..., description="视频URL"),
-    cookies: Optional[str] = Query(None, description="Cookie字符串")
+    cookies: Optional[str] = Query(None, description="Cookie字符串"),
 ):
     """
     获取视频信息
@@ -20,11 +21,7 @@ async def get_video_info(
     try:
         xhs_api = XiaohongshuAPI(cookies)
         video_info = await xhs_api.get_video_info(url)
-        return {
-            "code": 200,
-            "message": "success",
-            "data": video_info
-        }
+        return {"code": 200, "message": "success", "data": video_info}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -33,7 +30,7 @@ async def get_video_info(
 async def get_download_url(
     video_id: str = Query(..., description="视频ID"),
     quality: str = Query("hd", description="视频质量 hd/sd/ld"),
-    cookies: Optional[str] = Query(None, description="Cookie字符串")
+    cookies: Optional[str] = Query(None, description="Cookie字符串"),
 ):
     """
     获取视频下载链接
@@ -51,8 +48,8 @@ async def get_download_url(
             "data": {
                 "video_id": video_id,
                 "quality": quality,
-                "download_url": download_url
-            }
+                "download_url": download_url,
+            },
         }
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -61,7 +58,7 @@ async def get_download_url(
 @router.get("/check-valid")
 async def check_video_valid(
     video_id: str = Query(..., description="视频ID"),
-    cookies: Optional[str] = Query(None, description="Cookie字符串")
+    cookies: Optional[str] = Query(None, description="Cookie字符串"),
 ):
     """
     检查视频是否有效
@@ -73,10 +70,7 @@ async def check_video_valid(
         return {
             "code": 200,
             "message": "success",
-            "data": {
-                "video_id": video_id,
-                "is_valid": is_valid
-            }
+            "data": {"video_id": video_id, "is_valid": is_valid},
         }
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
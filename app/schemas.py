@@ -7,6 +7,7 @@ from enum import Enum
 # ===== 枚举类型 =====
 class TaskStatus(str, Enum):
     """任务状态"""
+
     PENDING = "pending"
     DOWNLOADING = "downloading"
     PAUSED = "paused"
@@ -17,31 +18,58 @@ class TaskStatus(str, Enum):
 
 class VideoQuality(str, Enum):
     """视频质量"""
+
     HD = "hd"
     SD = "sd"
     LD = "ld"
 
 
+# 下载时段 HH:MM-HH:MM
+WINDOW_PATTERN = r"^([01]\d|2[0-3]):[0-5]\d-([01]\d|2[0-3]):[0-5]\d$"
+
+
 # ===== 下载任务相关 =====
 class DownloadTaskCreate(BaseModel):
     """创建下载任务"""
+
     video_url: str = Field(..., description="视频URL")
     quality: VideoQuality = Field(VideoQuality.HD, description="视频质量")
     parts: Optional[List[int]] = Field(None, description="选择下载的分P,null表示全部")
+    priority: int = Field(0, description="优先级,数值大的先下载")
+    allow_duplicate: bool = Field(
+        False, description="同一视频和画质已有任务时仍新建任务"
+    )
+    scheduled_at: Optional[datetime] = Field(
+        None, description="预定开始时间,设置后任务自动入队,到时开始下载"
+    )
+    download_window: Optional[str] = Field(
+        None,
+        pattern=WINDOW_PATTERN,
+        description="每天允许下载的时段,如 23:00-07:00;设置后任务自动入队,只在时段内下载",
+    )
+
+
+class TaskPriority(BaseModel):
+    """调整任务优先级"""
+
+    priority: int = Field(..., description="优先级,数值大的先下载")
 
 
 class DownloadTaskUpdate(BaseModel):
     """更新下载任务"""
+
     status: Optional[TaskStatus] = None
     progress: Optional[float] = None
     downloaded_size: Optional[int] = None
     total_size: Optional[int] = None
     speed: Optional[float] = None
+    eta: Optional[float] = None
     error_message: Optional[str] = None
 
 
 class DownloadTask(BaseModel):
     """下载任务响应"""
+
     id: int
     task_id: str
     video_url: str
@@ -52,19 +80,26 @@ class DownloadTask(BaseModel):
 
     quality: VideoQuality
     parts: Optional[List[int]] = None
+    priority: int = 0
+    scheduled_at: Optional[datetime] = None
+    download_window: Optional[str] = None
 
     status: TaskStatus
+    queue_position: Optional[int] = None  # 排队中的位置,从1开始
     progress: float
     downloaded_size: int
     total_size: int
     speed: float
+    eta: Optional[float] = None
 
     file_path: Optional[str] = None
+    content_hash: Optional[str] = None
     error_message: Optional[str] = None
     retry_count: int
 
     created_at: datetime
     updated_at: datetime
+    queued_at: Optional[datetime] = None
     started_at: Optional[datetime] = None
     completed_at: Optional[datetime] = None
 
@@ -75,14 +110,29 @@ class DownloadTask(BaseModel):
 # ===== 收藏夹相关 =====
 class FavoriteCreate(BaseModel):
     """创建收藏夹"""
+
     favorite_id: str = Field(..., description="收藏夹ID")
     name: str = Field(..., description="收藏夹名称")
     description: Optional[str] = None
     cover_url: Optional[str] = None
+    download_window: Optional[str] = Field(
+        None, pattern=WINDOW_PATTERN, description="批量下载任务默认的下载时段"
+    )
+
+
+class FavoriteWindow(BaseModel):
+    """设置收藏夹的下载时段"""
+
+    download_window: Optional[str] = Field(
+        None,
+        pattern=WINDOW_PATTERN,
+        description="每天允许下载的时段,如 23:00-07:00,为空时不限制",
+    )
 
 
 class Favorite(BaseModel):
     """收藏夹响应"""
+
     id: int
     favorite_id: str
     name: str
@@ -90,6 +140,7 @@ class Favorite(BaseModel):
     cover_url: Optional[str] = None
     video_count: int
     invalid_count: int
+    download_window: Optional[str] = None
     last_sync_at: Optional[datetime] = None
     created_at: datetime
     updated_at: datetime
@@ -100,6 +151,7 @@ class Favorite(BaseModel):
 
 class FavoriteVideoCreate(BaseModel):
     """添加收藏夹视频"""
+
     favorite_id: str
     video_id: str
     video_url: str
@@ -110,6 +162,7 @@ class FavoriteVideoCreate(BaseModel):
 
 class FavoriteVideo(BaseModel):
     """收藏夹视频响应"""
+
     id: int
     favorite_id: str
     video_id: str
@@ -129,11 +182,13 @@ class FavoriteVideo(BaseModel):
 # ===== 用户认证相关 =====
 class UserAuthCreate(BaseModel):
     """创建用户认证"""
+
     cookies: str = Field(..., description="Cookie JSON字符串")
 
 
 class UserAuth(BaseModel):
     """用户认证响应"""
+
     id: int
     user_id: Optional[str] = None
     username: Optional[str] = None
@@ -146,9 +201,28 @@ class UserAuth(BaseModel):
         from_attributes = True
 
 
+# ===== 系统设置相关 =====
+class BandwidthLimit(BaseModel):
+    """带宽限速设置"""
+
+    global_limit: Optional[int] = Field(
+        None, ge=0, description="全局限速(KB/s),0表示不限速,null表示不修改"
+    )
+    task_limit: Optional[int] = Field(
+        None, ge=0, description="单任务限速(KB/s),0表示不限速,null表示不修改"
+    )
+
+
+class ConcurrencyLimit(BaseModel):
+    """并发下载设置"""
+
+    max_concurrent_downloads: int = Field(..., ge=1, description="最大并发下载数")
+
+
 # ===== 通用响应 =====
 class ResponseModel(BaseModel):
     """通用响应模型"""
+
     code: int = Field(200, description="状态码")
     message: str = Field("success", description="消息")
     data: Optional[dict] = Field(None, description="数据")
@@ -156,13 +230,16 @@ class ResponseModel(BaseModel):
 
 class VideoInfo(BaseModel):
     """视频信息"""
+
     video_id: str
     title: str
     author: str
     cover_url: Optional[str] = None
     duration: Optional[int] = None
     parts: List[dict] = Field(default_factory=list, description="分P信息")
-    available_qualities: List[VideoQuality] = Field(default_factory=list, description="可用画质")
+    available_qualities: List[VideoQuality] = Field(
+        default_factory=list, description="可用画质"
+    )
 
 
 # ===== 示例Item (可删除) =====
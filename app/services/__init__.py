@@ -1,8 +1,39 @@
 """
 服务层模块
 """
+
 from .xiaohongshu_api import XiaohongshuAPI
 from .downloader import VideoDownloader
 from .task_manager import TaskManager
+from .http_pool import DownloadClientPool
+from .rate_limiter import BandwidthLimiter
+from .file_writer import ChunkWriter
+from .content_store import ContentStore
+from .mirrors import MirrorSelector
+from .circuit import HostCircuitBreaker
+from .speed import SpeedEstimator
+from .scheduler import DownloadScheduler
+from .progress import ProgressBuffer
+from .live_state import LiveTaskRegistry
+from .events import TaskEventBus
+from .windows import DownloadWindow
+from .url_cache import DownloadUrlCache
 
-__all__ = ["XiaohongshuAPI", "VideoDownloader", "TaskManager"]
+__all__ = [
+    "XiaohongshuAPI",
+    "VideoDownloader",
+    "TaskManager",
+    "DownloadClientPool",
+    "BandwidthLimiter",
+    "ChunkWriter",
+    "ContentStore",
+    "MirrorSelector",
+    "HostCircuitBreaker",
+    "SpeedEstimator",
+    "DownloadScheduler",
+    "ProgressBuffer",
+    "LiveTaskRegistry",
+    "TaskEventBus",
+    "DownloadWindow",
+    "DownloadUrlCache",
+]
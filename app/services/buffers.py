@@ -0,0 +1,91 @@
+"""
+下载缓冲区复用与自适应块大小
+"""
+
+from typing import Dict, List
+
+
+def _floor_power_of_two(value: int) -> int:
+    return 1 << (max(int(value), 1).bit_length() - 1)
+
+
+class BufferPool:
+    """
+    按大小分级复用的bytearray缓冲区
+    网络数据拷贝进复用的缓冲区后以memoryview交给写入线程,避免每个数据块都分配新的bytes;
+    空闲缓冲区的总字节数不超过max_free_bytes,超出时归还的缓冲区直接释放
+    """
+
+    def __init__(self, max_free_bytes: int):
+        """
+        Args:
+            max_free_bytes: 最多保留的空闲缓冲区总字节数
+        """
+        self.max_free_bytes = max_free_bytes
+        self._free: Dict[int, List[bytearray]] = {}
+        self.free_bytes = 0
+        self.allocated = 0
+        self.reused = 0
+
+    def acquire(self, size: int) -> bytearray:
+        """取一个大小为size的缓冲区"""
+        free = self._free.get(size)
+        if free:
+            self.reused += 1
+            self.free_bytes -= size
+            return free.pop()
+        self.allocated += 1
+        return bytearray(size)
+
+    def release(self, buffer: bytearray):
+        """归还缓冲区"""
+        if self.free_bytes + len(buffer) > self.max_free_bytes:
+            return
+        self._free.setdefault(len(buffer), []).append(buffer)
+        self.free_bytes += len(buffer)
+
+    def to_dict(self) -> dict:
+        return {
+            "allocated": self.allocated,
+            "reused": self.reused,
+            "free_bytes": self.free_bytes,
+            "max_free_bytes": self.max_free_bytes,
+        }
+
+
+class AdaptiveChunkSizer:
+    """
+    根据实测吞吐调整读写块大小
+    块大小取约target_seconds内能收到的数据量(2的幂),
+    高速连接用大块减少写盘次数和回调,低速连接用小块保证进度和停止响应及时
+    """
+
+    def __init__(
+        self, initial: int, minimum: int, maximum: int, target_seconds: float = 0.25
+    ):
+        self.minimum = _floor_power_of_two(minimum)
+        self.maximum = _floor_power_of_two(maximum)
+        self.target_seconds = target_seconds
+        self.size = min(max(_floor_power_of_two(initial), self.minimum), self.maximum)
+        self._throughput = 0.0  # 字节/秒, 指数加权平均
+
+    def update(self, size: int, elapsed: float):
+        """
+        记录一个块的接收耗时并调整块大小
+        Args:
+            size: 块大小(字节)
+            elapsed: 接收该块耗时(秒)
+        """
+        if elapsed <= 0:
+            # 缓冲区瞬间填满,说明数据已在内核缓冲中积压,直接放大
+            self.size = min(self.size * 2, self.maximum)
+            return
+
+        throughput = size / elapsed
+        self._throughput = (
+            throughput
+            if not self._throughput
+            else 0.7 * self._throughput + 0.3 * throughput
+        )
+        target = _floor_power_of_two(self._throughput * self.target_seconds)
+        self.size = min(max(target, self.minimum), self.maximum)
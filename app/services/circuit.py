@@ -0,0 +1,134 @@
+"""
+CDN主机熔断
+"""
+
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+from ..config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class HostCircuit:
+    """单个主机的熔断状态"""
+
+    failures: int = 0  # 连续失败次数
+    opened_at: Optional[float] = None  # 熔断开始时间,未熔断为空
+    open_seconds: float = 0.0  # 本次熔断时长
+    trial_at: Optional[float] = None  # 半开状态下放行试探请求的时间
+
+    def to_dict(self) -> dict:
+        return {
+            "failures": self.failures,
+            "open": self.opened_at is not None,
+            "open_seconds": self.open_seconds,
+        }
+
+
+def _host(url_or_host: str) -> str:
+    return urlsplit(url_or_host).netloc or url_or_host
+
+
+class HostCircuitBreaker:
+    """
+    按CDN主机熔断
+    同一主机连续失败达到threshold次后熔断,期间不再向该主机发请求;
+    到期后放行一个试探请求(半开),成功则恢复,失败则再次熔断且时长加倍(不超过max_open_seconds)
+    """
+
+    def __init__(
+        self,
+        threshold: Optional[int] = None,
+        open_seconds: Optional[float] = None,
+        max_open_seconds: Optional[float] = None,
+    ):
+        """
+        Args:
+            threshold: 熔断前允许的连续失败次数
+            open_seconds: 首次熔断时长(秒)
+            max_open_seconds: 最长熔断时长(秒)
+        """
+        self.threshold = threshold or settings.CIRCUIT_FAILURE_THRESHOLD
+        self.open_seconds = open_seconds or settings.CIRCUIT_OPEN_SECONDS
+        self.max_open_seconds = max_open_seconds or settings.CIRCUIT_MAX_OPEN_SECONDS
+        self._hosts: Dict[str, HostCircuit] = {}
+
+    def retry_after(self, url: str) -> float:
+        """
+        距离可以再次请求该主机的秒数,未熔断或可以试探时为0
+        Args:
+            url: 链接或主机名
+        """
+        circuit = self._hosts.get(_host(url))
+        if circuit is None or circuit.opened_at is None:
+            return 0.0
+
+        now = time.monotonic()
+        remaining = circuit.opened_at + circuit.open_seconds - now
+        if remaining > 0:
+            return remaining
+        # 试探请求进行中,超过一个熔断时长仍无结果时允许再次试探
+        if (
+            circuit.trial_at is not None
+            and now - circuit.trial_at < circuit.open_seconds
+        ):
+            return circuit.trial_at + circuit.open_seconds - now
+        return 0.0
+
+    def allow(self, url: str) -> bool:
+        """
+        是否可以向该主机发请求,熔断到期时占用试探名额
+        Args:
+            url: 链接或主机名
+        """
+        if self.retry_after(url) > 0:
+            return False
+
+        circuit = self._hosts.get(_host(url))
+        if circuit is not None and circuit.opened_at is not None:
+            circuit.trial_at = time.monotonic()
+            logger.info(f"主机熔断到期,放行试探请求: {_host(url)}")
+        return True
+
+    def record_success(self, url: str):
+        """请求成功,恢复主机"""
+        circuit = self._hosts.get(_host(url))
+        if circuit is None:
+            return
+        if circuit.opened_at is not None:
+            logger.info(f"主机已恢复: {_host(url)}")
+        self._hosts.pop(_host(url), None)
+
+    def record_failure(self, url: str):
+        """记录主机故障(连接失败、超时、5xx等),达到阈值或试探失败时熔断"""
+        host = _host(url)
+        circuit = self._hosts.setdefault(host, HostCircuit())
+        circuit.failures += 1
+
+        if circuit.opened_at is not None:
+            if circuit.trial_at is None:
+                return
+            # 试探失败,熔断时长加倍
+            open_seconds = min(circuit.open_seconds * 2, self.max_open_seconds)
+        elif circuit.failures >= self.threshold:
+            open_seconds = self.open_seconds
+        else:
+            return
+
+        circuit.opened_at = time.monotonic()
+        circuit.open_seconds = open_seconds
+        circuit.trial_at = None
+        logger.warning(
+            f"主机连续失败 {circuit.failures} 次,熔断 {open_seconds:.0f} 秒: {host}"
+        )
+
+    def to_dict(self) -> dict:
+        """各主机的熔断状态"""
+        return {
+            host: {**circuit.to_dict(), "retry_after": round(self.retry_after(host), 1)}
+            for host, circuit in self._hosts.items()
+        }
@@ -0,0 +1,276 @@
+"""
+下载内容去重存储
+"""
+
+import asyncio
+import errno
+import os
+import shutil
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from ..models import DownloadTask, StoredVideo, VideoQuality
+from ..config import settings
+import logging
+
+try:
+    import fcntl
+except ImportError:  # Windows没有fcntl,不使用reflink
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Linux FICLONE ioctl, btrfs/xfs等文件系统上创建写时复制的副本
+FICLONE = 0x40049409
+
+
+class ContentStore:
+    """
+    按内容哈希存放已下载的视频
+    同一视频(video_id + 画质)再次下载时,直接从存储中链接出文件,不再走网络
+    """
+
+    def __init__(self, store_dir: Optional[str] = None):
+        # 存储目录需要和下载目录在同一文件系统,才能使用硬链接
+        self.store_dir = (
+            store_dir
+            or settings.CONTENT_STORE_DIR
+            or os.path.join(settings.DOWNLOAD_DIR, ".store")
+        )
+
+    def _blob_path(self, content_hash: str) -> str:
+        return os.path.join(self.store_dir, content_hash[:2], content_hash)
+
+    def lookup(
+        self, db: Session, video_id: str, quality: VideoQuality
+    ) -> Optional[StoredVideo]:
+        """
+        查找已存储的视频,存储文件丢失时删除记录
+        Args:
+            db: 数据库会话
+            video_id: 视频ID
+            quality: 画质
+        Returns:
+            存储记录
+        """
+        if not video_id:
+            return None
+
+        stored = (
+            db.query(StoredVideo)
+            .filter(
+                StoredVideo.video_id == video_id,
+                StoredVideo.quality == quality,
+            )
+            .first()
+        )
+        if stored and not os.path.exists(stored.blob_path):
+            logger.warning(f"存储文件已丢失: {stored.blob_path}")
+            db.delete(stored)
+            db.commit()
+            return None
+        return stored
+
+    async def materialize(
+        self, db: Session, stored: StoredVideo, file_path: str
+    ) -> str:
+        """
+        把存储的视频链接到目标路径,并计入去重节省的流量
+        Args:
+            db: 数据库会话
+            stored: 存储记录
+            file_path: 目标路径
+        Returns:
+            使用的方式 reflink/hardlink/copy
+        """
+        method = await asyncio.to_thread(self._link, stored.blob_path, file_path)
+        stored.hit_count += 1
+        stored.saved_bytes += stored.size
+        stored.last_used_at = datetime.now()
+        db.commit()
+        logger.info(f"去重命中({method}): {stored.video_id} -> {file_path}")
+        return method
+
+    async def ingest(
+        self,
+        db: Session,
+        video_id: str,
+        quality: VideoQuality,
+        file_path: str,
+        content_hash: str,
+        size: int,
+    ):
+        """
+        把下载完成的文件存入存储
+        内容已存在(不同视频ID或画质下载到了相同文件)时,用存储中的文件替换刚下载的副本;
+        写入冲突时会回滚会话,调用方应先提交自己的修改
+        Args:
+            db: 数据库会话
+            video_id: 视频ID
+            quality: 画质
+            file_path: 下载完成的文件
+            content_hash: 文件SHA-256
+            size: 文件大小
+        """
+        if not video_id or not content_hash:
+            return
+
+        blob_path = self._blob_path(content_hash)
+        try:
+            if os.path.exists(blob_path):
+                await asyncio.to_thread(self._link, blob_path, file_path)
+            else:
+                os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+                os.link(file_path, blob_path)
+        except OSError as e:
+            logger.warning(f"存入去重存储失败: {e}")
+            return
+
+        # 其他进程可能同时存入同一视频和画质,唯一索引冲突时改为更新对方写入的记录
+        for _ in range(2):
+            stored = (
+                db.query(StoredVideo)
+                .filter(
+                    StoredVideo.video_id == video_id,
+                    StoredVideo.quality == quality,
+                )
+                .first()
+            )
+            if stored is None:
+                stored = StoredVideo(
+                    video_id=video_id, quality=quality, hit_count=0, saved_bytes=0
+                )
+                db.add(stored)
+            stored.content_hash = content_hash
+            stored.size = size
+            stored.blob_path = blob_path
+            stored.last_used_at = datetime.now()
+            try:
+                db.commit()
+                return
+            except IntegrityError:
+                db.rollback()
+        logger.warning(f"写入去重存储记录失败: {video_id}")
+
+    def release(self, db: Session, content_hash: Optional[str]) -> bool:
+        """
+        任务删除后释放它引用的存储文件
+        没有任务再引用同一内容时删除存储记录和存储文件,回收磁盘空间
+        Args:
+            db: 数据库会话(任务的删除应已提交)
+            content_hash: 被删除任务的文件SHA-256
+        Returns:
+            是否删除了存储文件
+        """
+        if not content_hash:
+            return False
+
+        referenced = (
+            db.query(DownloadTask.id)
+            .filter(DownloadTask.content_hash == content_hash)
+            .first()
+        )
+        if referenced:
+            return False
+
+        stored = (
+            db.query(StoredVideo).filter(StoredVideo.content_hash == content_hash).all()
+        )
+        blob_paths = {self._blob_path(content_hash)} | {s.blob_path for s in stored}
+        for row in stored:
+            db.delete(row)
+        db.commit()
+
+        removed = False
+        for blob_path in blob_paths:
+            try:
+                os.remove(blob_path)
+                removed = True
+            except FileNotFoundError:
+                continue
+            except OSError as e:
+                logger.warning(f"删除存储文件失败: {e}")
+                continue
+            try:
+                os.rmdir(os.path.dirname(blob_path))
+            except OSError:
+                pass  # 目录中还有其他存储文件
+        if removed:
+            logger.info(f"已删除不再引用的存储文件: {content_hash}")
+        return removed
+
+    async def link(self, source_path: str, file_path: str) -> str:
+        """
+        从已下载的文件创建目标文件
+        Args:
+            source_path: 已下载的文件
+            file_path: 目标路径
+        Returns:
+            使用的方式 reflink/hardlink/copy
+        """
+        return await asyncio.to_thread(self._link, source_path, file_path)
+
+    def _link(self, blob_path: str, file_path: str) -> str:
+        """
+        从存储文件创建目标文件: 优先reflink,其次硬链接,都不支持时复制
+        先写入临时路径再替换,目标文件已存在时不会出现半成品
+        """
+        if os.path.exists(file_path) and os.path.samefile(blob_path, file_path):
+            return "hardlink"
+
+        os.makedirs(os.path.dirname(os.path.abspath(file_path)), exist_ok=True)
+        temp_path = f"{file_path}.link"
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+        try:
+            method = self._reflink(blob_path, temp_path)
+            if method is None:
+                try:
+                    os.link(blob_path, temp_path)
+                    method = "hardlink"
+                except OSError as e:
+                    if e.errno not in (
+                        errno.EXDEV,
+                        errno.EPERM,
+                        errno.EMLINK,
+                        errno.ENOTSUP,
+                    ):
+                        raise
+                    shutil.copyfile(blob_path, temp_path)
+                    method = "copy"
+            os.replace(temp_path, file_path)
+            return method
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def _reflink(self, blob_path: str, temp_path: str) -> Optional[str]:
+        """尝试创建写时复制副本,平台或文件系统不支持时返回None"""
+        if fcntl is None:
+            return None
+        with open(blob_path, "rb") as src, open(temp_path, "wb") as dst:
+            try:
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+                return "reflink"
+            except OSError:
+                pass
+        os.remove(temp_path)
+        return None
+
+    def get_stats(self, db: Session) -> dict:
+        """去重统计"""
+        blobs = db.query(StoredVideo.content_hash, StoredVideo.size).distinct().all()
+        hit_count, saved_bytes = db.query(
+            func.coalesce(func.sum(StoredVideo.hit_count), 0),
+            func.coalesce(func.sum(StoredVideo.saved_bytes), 0),
+        ).one()
+        return {
+            "stored_videos": db.query(StoredVideo).count(),
+            "blob_count": len(blobs),
+            "stored_bytes": sum(size or 0 for _, size in blobs),
+            "hit_count": hit_count,
+            "saved_bytes": saved_bytes,
+        }
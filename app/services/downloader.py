@@ -1,27 +1,118 @@
 """
 视频下载服务
 """
+
 import asyncio
 import httpx
+import json
 import os
+import random
+import re
 import time
-from typing import Optional, Callable
+from dataclasses import dataclass, field
+from typing import List, Optional, Callable
 from pathlib import Path
+from urllib.parse import urlsplit
 from ..config import settings
+from .http_pool import DownloadClientPool
+from .rate_limiter import BandwidthLimiter
+from .file_writer import ChunkWriter, WriteStats, preallocate
+from .buffers import AdaptiveChunkSizer, BufferPool
+from .mirrors import MirrorSelector
+from .circuit import HostCircuitBreaker
+from .speed import SpeedEstimator
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+class UrlExpiredError(Exception):
+    """下载链接已失效(CDN返回403/410),需要重新获取链接"""
+
+
+class MirrorSlowError(Exception):
+    """当前镜像吞吐过低,需要切换镜像"""
+
+
+class HostUnavailableError(Exception):
+    """所有镜像所在的主机都处于熔断中,下载应推迟到retry_after秒后,不计入重试次数"""
+
+    def __init__(self, host: str, retry_after: float):
+        super().__init__(f"CDN主机暂时不可用: {host}, {retry_after:.0f}秒后重试")
+        self.host = host
+        self.retry_after = retry_after
+
+
+class CancelToken:
+    """
+    下载取消句柄
+    每个下载持有自己的句柄,停止一个任务不会影响其他正在进行的下载
+    """
+
+    def __init__(self):
+        self._cancelled = False
+
+    def cancel(self):
+        """请求停止下载"""
+        self._cancelled = True
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+
+@dataclass
+class _DownloadJob:
+    """单次下载的上下文"""
+
+    url: str  # 当前使用的链接
+    file_path: str
+    temp_file: str
+    task_key: str
+    cancel_token: CancelToken
+    progress_callback: Optional[Callable] = None
+    total_size: int = 0  # 服务器声明的文件大小,未知为0
+    content_hash: Optional[str] = None  # 下载过程中增量计算的SHA-256
+    url_resolver: Optional[Callable] = None
+    url_refreshes: int = 0  # 已重新获取链接的次数
+    urls: List[str] = field(default_factory=list)  # 同一文件的全部镜像,按优先级排序
+    mirror_switches: int = 0  # 已切换镜像的次数
+    speed: SpeedEstimator = field(default_factory=SpeedEstimator)  # 本次下载的实时速度
+    retry_count: int = 0  # 连续失败的次数(包括之前的下载),有进展的尝试后重新计算
+    error_callback: Optional[Callable] = None
+
+
 class VideoDownloader:
     """视频下载器"""
 
-    def __init__(self):
+    def __init__(
+        self,
+        client_pool: Optional[DownloadClientPool] = None,
+        rate_limiter: Optional[BandwidthLimiter] = None,
+        mirror_selector: Optional[MirrorSelector] = None,
+        circuit_breaker: Optional[HostCircuitBreaker] = None,
+    ):
+        self.client_pool = client_pool or DownloadClientPool()
+        self.rate_limiter = rate_limiter or BandwidthLimiter(
+            settings.GLOBAL_BANDWIDTH_LIMIT * 1024,
+            settings.TASK_BANDWIDTH_LIMIT * 1024,
+        )
         self.download_dir = Path(settings.DOWNLOAD_DIR)
         self.chunk_size = settings.CHUNK_SIZE
+        self.min_chunk_size = settings.MIN_CHUNK_SIZE
+        self.max_chunk_size = settings.MAX_CHUNK_SIZE
+        self.buffer_pool = BufferPool(settings.BUFFER_POOL_BYTES)
         self.retry_times = settings.RETRY_TIMES
         self.timeout = settings.TIMEOUT
-        self._stop_flag = False
+        self.segments = settings.DOWNLOAD_SEGMENTS
+        self.segment_min_size = settings.SEGMENT_MIN_SIZE
+        self.write_queue_bytes = settings.WRITE_QUEUE_BYTES
+        self.write_stats = WriteStats()
+        self.mirrors = mirror_selector or MirrorSelector()
+        self.mirror_check_interval = settings.MIRROR_CHECK_INTERVAL
+        self.breaker = circuit_breaker or HostCircuitBreaker()
+        self.backoff_base = settings.RETRY_BACKOFF_BASE
+        self.backoff_max = settings.RETRY_BACKOFF_MAX
 
     async def download_video(
         self,
@@ -29,111 +120,742 @@ class VideoDownloader:
         file_path: str,
         progress_callback: Optional[Callable] = None,
         resume: bool = True,
+        task_key: Optional[str] = None,
+        cancel_token: Optional[CancelToken] = None,
+        complete_callback: Optional[Callable] = None,
+        url_resolver: Optional[Callable] = None,
+        mirror_urls: Optional[List[str]] = None,
+        speed_estimator: Optional[SpeedEstimator] = None,
+        retry_count: int = 0,
+        error_callback: Optional[Callable] = None,
     ) -> bool:
         """
         下载视频
+        文件足够大且服务器支持Range请求时,按字节区间分段并行下载
+        写入时增量计算SHA-256,重命名前校验文件大小
+        续传时用If-Range校验服务器文件未变化,文件已变化则从头下载
+        有多个镜像时先选出最快的,镜像出错或吞吐崩溃时中途切换到下一个镜像续传
+        出错时区分可重试(网络错误、超时、429/5xx等)和不可重试(404等)的错误,
+        可重试的错误按带随机抖动的指数退避重试;主机连续故障时熔断,不再向该主机发请求
         Args:
             url: 视频URL
             file_path: 保存路径
-            progress_callback: 进度回调函数 callback(downloaded, total, speed)
+            progress_callback: 进度回调函数 callback(downloaded, total, speed),speed为滑动窗口速度(字节/秒)
             resume: 是否支持断点续传
+            task_key: 限速使用的任务标识,默认为保存路径
+            cancel_token: 取消句柄,调用其cancel()停止本次下载
+            complete_callback: 完成回调函数 callback(size, content_hash),无法计算校验值时content_hash为None
+            url_resolver: 链接过期(403/410)时重新获取下载链接的回调
+                async callback() -> 新链接或镜像链接列表
+            mirror_urls: 同一文件的其他CDN镜像链接
+            speed_estimator: 速度估计器,传入时调用方可随时读取本次下载的速度
+            retry_count: 之前连续失败的次数,与本次下载的失败合计达到RETRY_TIMES时停止重试;
+                有进展的尝试后重新计算
+            error_callback: 每次出错时的回调 callback(retry_count, error),调用方可据此持久化重试次数
         Returns:
             是否下载成功
+        Raises:
+            HostUnavailableError: 所有镜像的主机都在熔断中,调用方应推迟下载
         """
-        self._stop_flag = False
-        temp_file = f"{file_path}.tmp"
-
         # 确保目录存在
         os.makedirs(os.path.dirname(file_path), exist_ok=True)
 
+        if not resume:
+            self.clean_temp_files(file_path)
+
+        job = _DownloadJob(
+            url=url,
+            file_path=file_path,
+            temp_file=f"{file_path}.tmp",
+            task_key=task_key or file_path,
+            cancel_token=cancel_token or CancelToken(),
+            progress_callback=progress_callback,
+            url_resolver=url_resolver,
+            urls=list(dict.fromkeys([url, *(mirror_urls or [])])),
+            speed=speed_estimator or SpeedEstimator(),
+            retry_count=retry_count,
+            error_callback=error_callback,
+        )
+        try:
+            success = await self._download_with_retry(job)
+        finally:
+            self.rate_limiter.release(job.task_key)
+
+        if success and complete_callback:
+            await complete_callback(os.path.getsize(file_path), job.content_hash)
+        return success
+
+    async def _download_with_retry(self, job: _DownloadJob) -> bool:
+        """按重试次数执行下载"""
+        await self._rank_mirrors(job)
+        while True:
+            if job.cancel_token.cancelled:
+                logger.info("下载已停止")
+                return False
+
+            self._ensure_available(job)
+            downloaded = self.get_downloaded_size(job.file_path)
+            try:
+                # 优先沿用已有的分段进度
+                segment_state = self._load_segment_state(job.temp_file)
+                if segment_state is None and self.segments > 1:
+                    segment_state = await self._plan_segments(job)
+
+                if segment_state is not None:
+                    finished = await self._download_segmented(job, segment_state)
+                else:
+                    finished = await self._download_stream(job)
+
+                if not finished:
+                    return False
+
+                self.breaker.record_success(job.url)
+
+                # 下载完成,校验大小后重命名文件
+                self._verify_size(job)
+                self._finalize(job.temp_file, job.file_path)
+                logger.info(f"下载完成: {job.file_path}")
+                return True
+
+            except Exception as e:
+                if isinstance(e, UrlExpiredError) and await self._refresh_url(job):
+                    # 换用新链接立即续传,不计入重试次数
+                    continue
+
+                if isinstance(e, MirrorSlowError) and self._switch_mirror(
+                    job, failed=False
+                ):
+                    continue
+
+                if self._is_host_failure(e):
+                    self.breaker.record_failure(job.url)
+
+                retryable = self._is_retryable(e)
+                if retryable:
+                    # 本次尝试下载到了新数据时重新计算,只有连续无进展的失败才会用完重试次数
+                    if self.get_downloaded_size(job.file_path) > downloaded:
+                        job.retry_count = 0
+                    job.retry_count += 1
+                if job.error_callback:
+                    await job.error_callback(job.retry_count, e)
+
+                if not retryable:
+                    logger.error(f"下载失败,错误不可重试: {e}")
+                    return False
+
+                logger.error(
+                    f"下载失败 (尝试 {job.retry_count}/{self.retry_times}): {e}"
+                )
+                if job.retry_count >= self.retry_times:
+                    logger.error(f"下载失败,已达到最大重试次数: {job.url}")
+                    return False
+
+                # 下次重试换一个镜像
+                self._switch_mirror(
+                    job, failed=isinstance(e, (httpx.HTTPError, UrlExpiredError))
+                )
+                await asyncio.sleep(self._backoff(job.retry_count, e))
+
+    def _is_retryable(self, e: Exception) -> bool:
+        """
+        错误是否值得重试
+        网络错误、超时、408/429/5xx、连接中断导致的不完整可以重试;
+        其他4xx(如404)、链接过期且无法重新获取、本地磁盘错误重试也不会成功
+        """
+        if isinstance(e, httpx.HTTPStatusError):
+            status = e.response.status_code
+            return status in (408, 425, 429) or status >= 500
+        if isinstance(e, UrlExpiredError):
+            return False
+        # 网络错误(httpx.HTTPError)不是OSError,可以重试
+        return not isinstance(e, OSError)
+
+    def _is_host_failure(self, e: Exception) -> bool:
+        """错误是否说明CDN主机本身有故障(计入熔断),404、链接过期等只与单个文件有关"""
+        if isinstance(e, httpx.HTTPStatusError):
+            status = e.response.status_code
+            return status == 429 or status >= 500
+        return isinstance(
+            e, (httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError)
+        )
+
+    def _backoff(self, retry_count: int, e: Exception) -> float:
+        """
+        重试前的等待时间(秒)
+        在 [0, min(RETRY_BACKOFF_MAX, RETRY_BACKOFF_BASE * 2^n)] 之间随机取值,避免大量任务同时重试;
+        服务器返回Retry-After时至少等待该时间
+        """
+        delay = random.uniform(
+            0, min(self.backoff_max, self.backoff_base * 2**retry_count)
+        )
+        if isinstance(e, httpx.HTTPStatusError):
+            retry_after = e.response.headers.get("retry-after", "")
+            if retry_after.isdigit():
+                delay = max(delay, min(float(retry_after), self.backoff_max))
+        return delay
+
+    def _ensure_available(self, job: _DownloadJob):
+        """
+        当前镜像的主机熔断时换用可用的镜像
+        Raises:
+            HostUnavailableError: 所有镜像的主机都在熔断中
+        """
+        if self.breaker.allow(job.url):
+            return
+
+        for url in job.urls:
+            if url != job.url and self.breaker.allow(url):
+                logger.info(f"主机熔断中,切换镜像: {urlsplit(url).netloc}")
+                job.url = url
+                return
+
+        retry_after = min(
+            self.breaker.retry_after(url) for url in job.urls or [job.url]
+        )
+        raise HostUnavailableError(urlsplit(job.url).netloc, retry_after)
+
+    async def _refresh_url(self, job: _DownloadJob) -> bool:
+        """
+        链接过期后重新获取下载链接
+        Returns:
+            是否获取到新链接
+        """
+        if job.url_resolver is None or job.url_refreshes >= self.retry_times:
+            return False
+
+        job.url_refreshes += 1
+        try:
+            urls = await job.url_resolver()
+        except Exception as e:
+            logger.error(f"重新获取下载链接失败: {e}")
+            return False
+
+        if isinstance(urls, str):
+            urls = [urls]
+        if not urls:
+            return False
+        logger.info(
+            f"下载链接已过期,使用新链接续传 ({job.url_refreshes}/{self.retry_times})"
+        )
+        job.urls = list(dict.fromkeys(urls))
+        job.url = job.urls[0]
+        await self._rank_mirrors(job)
+        return True
+
+    async def _rank_mirrors(self, job: _DownloadJob):
+        """有多个镜像时按测量结果排序,使用最优的镜像"""
+        if len(job.urls) < 2:
+            return
+
+        async def probe(url: str):
+            async with self.client_pool.stream(
+                "GET", url, headers={"Range": "bytes=0-0"}
+            ) as response:
+                if response.status_code >= 400:
+                    raise ValueError(f"状态码: {response.status_code}")
+
+        job.urls = await self.mirrors.rank(job.urls, probe)
+        job.url = job.urls[0]
+
+    def _switch_mirror(self, job: _DownloadJob, failed: bool = True) -> bool:
+        """
+        切换到下一个镜像
+        Args:
+            failed: 当前镜像是否请求失败(计入主机失败次数)
+        Returns:
+            是否切换成功
+        """
+        if failed:
+            self.mirrors.record_failure(job.url)
+        if len(job.urls) < 2 or job.mirror_switches >= len(job.urls) * self.retry_times:
+            return False
+
+        job.mirror_switches += 1
+        index = job.urls.index(job.url) if job.url in job.urls else -1
+        job.url = job.urls[(index + 1) % len(job.urls)]
+        logger.info(f"切换镜像: {urlsplit(job.url).netloc}")
+        return True
+
+    async def _download_stream(self, job: _DownloadJob) -> bool:
+        """
+        单连接流式下载,顺序写入临时文件
+        已知文件大小时预分配临时文件,并按单段记录落盘进度,重试时走分段续传
+        Returns:
+            是否下载完成(被停止时返回False)
+        """
         # 检查是否有未完成的下载
+        temp_file = job.temp_file
         downloaded_size = 0
-        if resume and os.path.exists(temp_file):
+        if os.path.exists(temp_file):
             downloaded_size = os.path.getsize(temp_file)
             logger.info(f"断点续传: 已下载 {downloaded_size} 字节")
 
-        retry_count = 0
-        while retry_count < self.retry_times:
-            try:
-                # 设置请求头支持断点续传
-                headers = {}
-                if downloaded_size > 0:
-                    headers['Range'] = f'bytes={downloaded_size}-'
-
-                async with httpx.AsyncClient(timeout=self.timeout, follow_redirects=True) as client:
-                    async with client.stream('GET', url, headers=headers) as response:
-                        # 检查是否支持断点续传
-                        if response.status_code not in [200, 206]:
-                            logger.warning(f"服务器返回状态码: {response.status_code}")
-                            if response.status_code == 416:  # Range Not Satisfiable
-                                # 可能文件已下载完成
-                                if os.path.exists(temp_file):
-                                    os.rename(temp_file, file_path)
-                                return True
-                            response.raise_for_status()
-
-                        # 获取文件总大小
-                        content_length = response.headers.get('content-length')
-                        if content_length:
-                            total_size = int(content_length) + downloaded_size
-                        else:
-                            total_size = 0
-
-                        # 开始下载
-                        mode = 'ab' if downloaded_size > 0 else 'wb'
-                        start_time = time.time()
-                        last_update_time = start_time
-
-                        with open(temp_file, mode) as f:
-                            async for chunk in response.aiter_bytes(chunk_size=self.chunk_size):
-                                if self._stop_flag:
-                                    logger.info("下载已停止")
-                                    return False
-
-                                f.write(chunk)
-                                downloaded_size += len(chunk)
-
-                                # 更新进度
-                                current_time = time.time()
-                                if current_time - last_update_time >= 0.5:  # 每0.5秒更新一次
-                                    elapsed_time = current_time - start_time
-                                    speed = downloaded_size / elapsed_time if elapsed_time > 0 else 0
-
-                                    if progress_callback:
-                                        await progress_callback(downloaded_size, total_size, speed)
-
-                                    last_update_time = current_time
-
-                        # 下载完成,重命名文件
-                        if os.path.exists(temp_file):
-                            if os.path.exists(file_path):
-                                os.remove(file_path)
-                            os.rename(temp_file, file_path)
-
-                        logger.info(f"下载完成: {file_path}")
+        # 设置请求头支持断点续传
+        headers = {}
+        if downloaded_size > 0:
+            headers["Range"] = f"bytes={downloaded_size}-"
+
+        async with self.client_pool.stream("GET", job.url, headers=headers) as response:
+            self._check_url_expired(response)
+
+            # 检查是否支持断点续传
+            if response.status_code not in [200, 206]:
+                logger.warning(f"服务器返回状态码: {response.status_code}")
+                if response.status_code == 416:  # Range Not Satisfiable
+                    # 分段进度显示已全部写入时才算下载完成;预分配的临时文件可能大部分是空洞
+                    if self._temp_complete(job):
                         return True
+                    self._discard_segment_state(temp_file)
+                    raise ValueError("临时文件无法续传,已丢弃,重新下载")
+                response.raise_for_status()
 
-            except Exception as e:
-                retry_count += 1
-                logger.error(f"下载失败 (尝试 {retry_count}/{self.retry_times}): {e}")
+            if downloaded_size > 0 and response.status_code == 200:
+                # 服务器忽略了Range,返回的是完整文件,从头写入,不能拼接在旧数据后面
+                logger.warning("服务器不支持续传,从头下载")
+                os.truncate(temp_file, 0)
+                downloaded_size = 0
+            elif downloaded_size > 0:
+                self._check_resume_offset(response, downloaded_size, temp_file)
 
-                if retry_count < self.retry_times:
-                    await asyncio.sleep(2 ** retry_count)  # 指数退避
-                else:
-                    logger.error(f"下载失败,已达到最大重试次数: {url}")
+            # 获取文件总大小
+            content_length = response.headers.get("content-length")
+            if content_length:
+                total_size = int(content_length) + downloaded_size
+            else:
+                total_size = 0
+
+            # 开始下载
+            last_update_time = time.time()
+
+            writer = ChunkWriter(
+                temp_file,
+                self.write_queue_bytes,
+                self.write_stats,
+                written_ranges=[(0, downloaded_size)],
+            )
+            job.total_size = total_size
+            state = None
+            if total_size:
+                # 先记录进度再预分配: 中途退出时不会留下没有进度记录的满尺寸临时文件
+                state = {
+                    "total_size": total_size,
+                    "segments": [[0, total_size - 1, downloaded_size]],
+                    **self._get_validators(response, job.url),
+                }
+                self._save_segment_state(temp_file, state)
+                await writer.preallocate(total_size)
+
+            def on_written(size: int):
+                if state is not None:
+                    state["segments"][0][2] += size
+
+            try:
+                async for chunk, buffer in self._iter_chunks(job, response):
+                    await self.rate_limiter.acquire(job.task_key, len(chunk))
+                    await writer.write(
+                        chunk, downloaded_size, self._release_after(buffer, on_written)
+                    )
+                    downloaded_size += len(chunk)
+                    job.speed.add(len(chunk))
+
+                    # 更新进度
+                    current_time = time.time()
+                    if current_time - last_update_time >= 0.5:  # 每0.5秒更新一次
+                        if state is not None:
+                            self._save_segment_state(temp_file, state)
+
+                        if job.progress_callback:
+                            await job.progress_callback(
+                                downloaded_size, total_size, job.speed.speed
+                            )
+
+                        last_update_time = current_time
+
+                if job.cancel_token.cancelled:
+                    logger.info("下载已停止")
                     return False
+            finally:
+                try:
+                    await writer.close()
+                finally:
+                    if state is not None and os.path.exists(temp_file):
+                        self._save_segment_state(temp_file, state)
+
+        if total_size and downloaded_size != total_size:
+            # 连接提前断开,已写入的数据由分段进度记录,重试时续传
+            raise ValueError(f"下载不完整: {downloaded_size}/{total_size}")
+
+        if writer.hashed_size == downloaded_size:
+            job.content_hash = writer.hexdigest()
+        return True
+
+    async def _plan_segments(self, job: _DownloadJob) -> Optional[dict]:
+        """
+        探测文件大小并规划分段
+        已有单连接下载的临时文件、服务器不支持Range或文件过小时返回None,走单连接下载
+        """
+        temp_file = job.temp_file
+        if os.path.exists(temp_file):
+            return None
+
+        async with self.client_pool.stream(
+            "GET", job.url, headers={"Range": "bytes=0-0"}
+        ) as response:
+            self._check_url_expired(response)
+            if response.status_code != 206:
+                return None
+            content_range = response.headers.get("content-range", "")
+            validators = self._get_validators(response, job.url)
+
+        # Content-Range: bytes 0-0/12345
+        match = re.match(r"bytes\s+0-0/(\d+)", content_range)
+        if not match:
+            return None
+
+        total_size = int(match.group(1))
+        count = min(self.segments, total_size // self.segment_min_size)
+        if count < 2:
+            return None
+
+        segment_size = total_size // count
+        segments = []
+        for i in range(count):
+            start = i * segment_size
+            end = total_size - 1 if i == count - 1 else start + segment_size - 1
+            segments.append([start, end, 0])  # [起始偏移, 结束偏移, 已下载字节]
+
+        # 先记录进度再预分配文件大小(各分段按偏移写入),
+        # 中途退出时不会留下没有进度记录的满尺寸临时文件
+        state = {"total_size": total_size, "segments": segments, **validators}
+        self._save_segment_state(temp_file, state)
+        fd = os.open(temp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            await asyncio.to_thread(preallocate, fd, total_size)
+        finally:
+            os.close(fd)
+        logger.info(f"分段下载: {total_size} 字节, {count} 段")
+        return state
+
+    async def _download_segmented(self, job: _DownloadJob, state: dict) -> bool:
+        """
+        多连接分段下载,每段按字节区间请求并写入对应偏移
+        进度文件只记录已落盘的字节,进程中断后各段从落盘位置续传
+        Returns:
+            是否下载完成(被停止时返回False)
+        """
+        temp_file = job.temp_file
+        total_size = state["total_size"]
+        segments = state["segments"]
+        # 已落盘字节数;segments中的计数为已从网络读取的字节数
+        persisted = [done for _, _, done in segments]
+        last_update_time = time.time()
+
+        def downloaded_size() -> int:
+            return sum(done for _, _, done in segments)
+
+        def save_state():
+            self._save_segment_state(
+                temp_file,
+                {
+                    **state,
+                    "segments": [
+                        [start, end, persisted[i]]
+                        for i, (start, end, _) in enumerate(segments)
+                    ],
+                },
+            )
+
+        async def report():
+            nonlocal last_update_time
+            current_time = time.time()
+            if current_time - last_update_time < 0.5:  # 每0.5秒更新一次
+                return
+            last_update_time = current_time
+            save_state()
+
+            if job.progress_callback:
+                await job.progress_callback(
+                    downloaded_size(), total_size, job.speed.speed
+                )
+
+        async def fetch_segment(writer: ChunkWriter, index: int) -> bool:
+            segment = segments[index]
+            start, end, done = segment
+            if start + done > end:
+                return True
+
+            def on_written(size: int):
+                persisted[index] += size
+
+            headers = {"Range": f"bytes={start + done}-{end}"}
+            if_range = self._get_if_range(state, job.url)
+            if if_range:
+                headers["If-Range"] = if_range
+
+            async with self.client_pool.stream(
+                "GET", job.url, headers=headers
+            ) as response:
+                self._check_url_expired(response)
+                if response.status_code >= 400:
+                    # 服务器错误时保留分段进度,按错误类型决定是否重试
+                    response.raise_for_status()
+                if response.status_code != 206:
+                    # If-Range不匹配(文件已变化)或服务器不再支持区间请求,
+                    # 丢弃分段进度和已下载数据,下次重试时重新规划
+                    self._discard_segment_state(temp_file)
+                    raise ValueError(f"分段请求返回状态码: {response.status_code}")
+                self._check_unchanged(response, state, job.url, temp_file)
+
+                async for chunk, buffer in self._iter_chunks(job, response):
+                    await self.rate_limiter.acquire(job.task_key, len(chunk))
+                    await writer.write(
+                        chunk,
+                        start + segment[2],
+                        self._release_after(buffer, on_written),
+                    )
+                    segment[2] += len(chunk)
+                    job.speed.add(len(chunk))
+                    await report()
+
+            return not job.cancel_token.cancelled
+
+        writer = ChunkWriter(
+            temp_file,
+            self.write_queue_bytes,
+            self.write_stats,
+            written_ranges=[
+                (start, done) for (start, _, _), done in zip(segments, persisted)
+            ],
+        )
+        job.total_size = total_size
+        tasks = [
+            asyncio.create_task(fetch_segment(writer, i)) for i in range(len(segments))
+        ]
+        try:
+            results = await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            try:
+                await writer.close()
+            finally:
+                if os.path.exists(temp_file):
+                    save_state()
+
+        if not all(results):
+            logger.info("下载已停止")
+            return False
 
-        return False
+        if sum(persisted) < total_size:
+            raise ValueError(f"分段下载不完整: {sum(persisted)}/{total_size}")
 
-    def stop_download(self):
-        """停止当前下载"""
-        self._stop_flag = True
+        if writer.hashed_size == total_size:
+            job.content_hash = writer.hexdigest()
+        return True
+
+    async def _iter_chunks(self, job: _DownloadJob, response):
+        """
+        读取响应数据,拷贝到复用的缓冲区中,按实测吞吐决定的块大小聚合后产出
+        产出 (数据视图, 缓冲区),缓冲区应在数据落盘后归还缓冲池;下载被取消时提前结束
+        """
+        sizer = AdaptiveChunkSizer(
+            self.chunk_size, self.min_chunk_size, self.max_chunk_size
+        )
+        buffer = self.buffer_pool.acquire(sizer.size)
+        filled = 0
+        started = time.monotonic()
+        # 镜像吞吐检测窗口,扣除数据交给调用方后等待限速和写盘的时间
+        window_start = started
+        window_bytes = 0
+        paused = 0.0
+
+        async for piece in response.aiter_bytes():
+            if job.cancel_token.cancelled:
+                break
+
+            window_bytes += len(piece)
+            now = time.monotonic()
+            if now - window_start >= self.mirror_check_interval:
+                throughput = window_bytes / max(now - window_start - paused, 1e-6)
+                slow = len(job.urls) > 1 and self.mirrors.is_slow(job.url, throughput)
+                self.mirrors.record_throughput(job.url, throughput)
+                if slow:
+                    self.buffer_pool.release(buffer)
+                    raise MirrorSlowError(
+                        f"镜像吞吐过低: {urlsplit(job.url).netloc} {throughput / 1024:.1f}KB/s"
+                    )
+                window_start, window_bytes, paused = now, 0, 0.0
+
+            view = memoryview(piece)
+            while view:
+                size = min(len(view), len(buffer) - filled)
+                buffer[filled : filled + size] = view[:size]
+                filled += size
+                view = view[size:]
+
+                if filled == len(buffer):
+                    now = time.monotonic()
+                    sizer.update(filled, now - started)
+                    started = now
+                    yield memoryview(buffer), buffer
+                    paused += time.monotonic() - now
+                    buffer = self.buffer_pool.acquire(sizer.size)
+                    filled = 0
+
+        if filled and not job.cancel_token.cancelled:
+            yield memoryview(buffer)[:filled], buffer
+        else:
+            self.buffer_pool.release(buffer)
+
+    def _release_after(self, buffer: bytearray, on_written: Callable) -> Callable:
+        """数据落盘后归还缓冲区,再执行原有的落盘回调"""
+
+        def callback(size: int):
+            self.buffer_pool.release(buffer)
+            on_written(size)
+
+        return callback
+
+    def _temp_complete(self, job: _DownloadJob) -> bool:
+        """临时文件是否已完整写入: 需要分段进度记录每段都已落盘,且文件大小一致"""
+        state = self._load_segment_state(job.temp_file)
+        if state is None:
+            return False
+        complete = all(start + done > end for start, end, done in state["segments"])
+        if not complete or os.path.getsize(job.temp_file) != state["total_size"]:
+            return False
+        job.total_size = state["total_size"]
+        return True
+
+    def _verify_size(self, job: _DownloadJob):
+        """重命名前校验临时文件大小与服务器声明的大小一致"""
+        if not job.total_size or not os.path.exists(job.temp_file):
+            return
+
+        actual_size = os.path.getsize(job.temp_file)
+        if actual_size != job.total_size:
+            # 进度记录已不可信,丢弃后重新下载
+            self._discard_segment_state(job.temp_file)
+            raise ValueError(f"文件大小校验失败: {actual_size}/{job.total_size}")
+
+    def _check_url_expired(self, response):
+        """CDN签名链接过期时返回403/410"""
+        if response.status_code in (403, 410):
+            raise UrlExpiredError(f"下载链接已失效: {response.status_code}")
+
+    def _get_validators(self, response, url: str) -> dict:
+        """
+        记录响应的校验信息,续传时用于确认服务器上的文件没有变化
+        不同CDN镜像的ETag格式可能不同,同时记录来源主机
+        """
+        return {
+            "etag": response.headers.get("etag"),
+            "last_modified": response.headers.get("last-modified"),
+            "host": urlsplit(url).netloc,
+        }
+
+    def _same_origin(self, state: dict, url: str) -> bool:
+        """校验信息是否来自url所在的主机(旧进度文件没有记录主机时视为同一主机)"""
+        return state.get("host", urlsplit(url).netloc) == urlsplit(url).netloc
+
+    def _get_if_range(self, state: dict, url: str) -> Optional[str]:
+        """
+        续传请求的If-Range值
+        If-Range只接受强ETag,弱ETag时改用Last-Modified;切换到其他镜像后只校验文件总大小
+        """
+        if not self._same_origin(state, url):
+            return None
+
+        etag = state.get("etag")
+        if etag and not etag.startswith("W/"):
+            return etag
+        return state.get("last_modified")
+
+    def _check_unchanged(self, response, state: dict, url: str, temp_file: str):
+        """
+        校验206响应与进度文件记录的是同一个文件
+        服务器未处理If-Range或进度文件没有校验信息时,仍可通过文件总大小和ETag发现变化
+        """
+        match = re.match(
+            r"bytes\s+\d+-\d+/(\d+)", response.headers.get("content-range", "")
+        )
+        changed = bool(match) and int(match.group(1)) != state["total_size"]
+
+        etag = response.headers.get("etag")
+        if (
+            etag
+            and state.get("etag")
+            and etag != state["etag"]
+            and self._same_origin(state, url)
+        ):
+            changed = True
+
+        if changed:
+            # 已下载的数据来自旧文件,丢弃后重新下载
+            self._discard_segment_state(temp_file)
+            raise ValueError("服务器上的文件已变化")
+
+    def _check_resume_offset(self, response, downloaded_size: int, temp_file: str):
+        """
+        校验续传响应从已下载的位置开始
+        单连接续传没有进度文件和If-Range校验信息时,Content-Range的起始位置不对(或缺失)
+        说明返回的数据不能拼接在已有数据后面,丢弃临时文件后重新下载
+        """
+        match = re.match(r"bytes\s+(\d+)-", response.headers.get("content-range", ""))
+        if match and int(match.group(1)) == downloaded_size:
+            return
+        self._discard_segment_state(temp_file)
+        raise ValueError(
+            f"续传位置不匹配: {response.headers.get('content-range')}, 已下载 {downloaded_size}"
+        )
+
+    def _finalize(self, temp_file: str, file_path: str):
+        """下载完成后将临时文件重命名为目标文件"""
+        if os.path.exists(temp_file):
+            if os.path.exists(file_path):
+                os.remove(file_path)
+            os.rename(temp_file, file_path)
+        self._discard_segment_state(temp_file, keep_temp=True)
+
+    def _load_segment_state(self, temp_file: str) -> Optional[dict]:
+        """读取分段进度,不存在或已损坏时返回None"""
+        state_file = f"{temp_file}.state"
+        if not (os.path.exists(state_file) and os.path.exists(temp_file)):
+            return None
+
+        try:
+            with open(state_file, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            logger.info(f"分段续传: 已下载 {sum(s[2] for s in state['segments'])} 字节")
+            return state
+        except (OSError, ValueError, KeyError, IndexError) as e:
+            logger.warning(f"分段进度文件损坏,重新下载: {e}")
+            self._discard_segment_state(temp_file)
+            return None
+
+    def _save_segment_state(self, temp_file: str, state: dict):
+        """保存分段进度"""
+        state_file = f"{temp_file}.state"
+        with open(f"{state_file}.part", "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(f"{state_file}.part", state_file)
+
+    def _discard_segment_state(self, temp_file: str, keep_temp: bool = False):
+        """删除分段进度(以及预分配的临时文件)"""
+        paths = [f"{temp_file}.state"]
+        if not keep_temp:
+            paths.append(temp_file)
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
 
     async def download_multi_parts(
         self,
         urls: list,
         output_dir: str,
         progress_callback: Optional[Callable] = None,
+        cancel_token: Optional[CancelToken] = None,
     ) -> list:
         """
         下载多个分P视频
@@ -141,6 +863,7 @@ class VideoDownloader:
             urls: URL列表 [(part_num, url), ...]
             output_dir: 输出目录
             progress_callback: 进度回调
+            cancel_token: 取消句柄,所有分P共用
         Returns:
             下载成功的文件列表
         """
@@ -150,7 +873,11 @@ class VideoDownloader:
         for part_num, url in urls:
             file_name = f"part_{part_num:02d}.mp4"
             file_path = os.path.join(output_dir, file_name)
-            tasks.append(self.download_video(url, file_path, progress_callback))
+            tasks.append(
+                self.download_video(
+                    url, file_path, progress_callback, cancel_token=cancel_token
+                )
+            )
 
         results = await asyncio.gather(*tasks, return_exceptions=True)
 
@@ -166,6 +893,9 @@ class VideoDownloader:
     def get_downloaded_size(self, file_path: str) -> int:
         """获取已下载文件大小"""
         temp_file = f"{file_path}.tmp"
+        state = self._load_segment_state(temp_file)
+        if state is not None:
+            return sum(done for _, _, done in state["segments"])
         if os.path.exists(temp_file):
             return os.path.getsize(temp_file)
         elif os.path.exists(file_path):
@@ -175,9 +905,9 @@ class VideoDownloader:
     def clean_temp_files(self, file_path: str):
         """清理临时文件"""
         temp_file = f"{file_path}.tmp"
-        if os.path.exists(temp_file):
+        if os.path.exists(temp_file) or os.path.exists(f"{temp_file}.state"):
             try:
-                os.remove(temp_file)
+                self._discard_segment_state(temp_file)
                 logger.info(f"已清理临时文件: {temp_file}")
             except Exception as e:
                 logger.error(f"清理临时文件失败: {e}")
@@ -187,9 +917,9 @@ class VideoDownloader:
         if os.path.exists(file_path):
             stat = os.stat(file_path)
             return {
-                'exists': True,
-                'size': stat.st_size,
-                'created_at': stat.st_ctime,
-                'modified_at': stat.st_mtime,
+                "exists": True,
+                "size": stat.st_size,
+                "created_at": stat.st_ctime,
+                "modified_at": stat.st_mtime,
             }
-        return {'exists': False}
+        return {"exists": False}
@@ -0,0 +1,277 @@
+"""
+任务变更推送
+"""
+
+import asyncio
+import json
+import threading
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+)
+from pydantic_core import to_jsonable_python
+from sqlalchemy import event, inspect
+from .. import database
+from ..models import DownloadTask, TaskStatus
+from .. import schemas
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 推送给客户端的字段,与任务接口返回的字段一致
+TASK_FIELDS = frozenset(schemas.DownloadTask.model_fields)
+# 由其他进程下载时需要跟踪变化的任务状态
+ACTIVE_STATUSES = (TaskStatus.PENDING, TaskStatus.DOWNLOADING)
+
+
+class _Subscriber:
+    """一个客户端连接,尚未发出的变化按任务合并,积压的大小不超过任务数"""
+
+    def __init__(self):
+        self.pending: Dict[str, Optional[dict]] = {}  # 任务ID -> 变化字段,已删除为None
+        self.ready = asyncio.Event()
+
+    def merge(self, changes: Dict[str, Optional[dict]]):
+        for task_id, fields in changes.items():
+            if fields is None:
+                self.pending[task_id] = None
+            elif task_id in self.pending and self.pending[task_id] is None:
+                continue
+            else:
+                self.pending.setdefault(task_id, {}).update(fields)
+        self.ready.set()
+
+    def take(self) -> Dict[str, Optional[dict]]:
+        changes, self.pending = self.pending, {}
+        self.ready.clear()
+        return changes
+
+
+class TaskEventBus:
+    """
+    任务变更事件总线
+    任务的变化字段先合并在内存中,每隔interval秒推送一次,同一任务在一个间隔内只推送合并后的字段;
+    客户端消费跟不上时,未发出的变化继续按任务合并,不会无限积压;
+    没有订阅者时不记录变化,也不产生额外开销
+    """
+
+    def __init__(
+        self,
+        interval: float,
+        heartbeat: float = 15.0,
+        snapshot: Optional[Callable[[Iterable[str]], Dict[str, dict]]] = None,
+        positions: Optional[Callable[[], Dict[str, int]]] = None,
+    ):
+        """
+        Args:
+            interval: 推送间隔(秒)
+            heartbeat: 没有变化时发送心跳的间隔(秒),避免代理断开空闲连接
+            snapshot: 由其他进程下载时读取任务状态的函数 snapshot(上次进行中的任务ID),
+                返回当前进行中任务和这些任务的字段,与上次的结果比较得到变化
+            positions: 读取排队位置的函数,返回 {任务ID: 位置},与上次的结果比较得到变化
+        """
+        self.interval = interval
+        self.heartbeat = heartbeat
+        self._snapshot = snapshot
+        self._last_snapshot: Dict[str, dict] = {}
+        self._positions = positions
+        self._last_positions: Dict[str, int] = {}
+        self._pending: Dict[str, Optional[dict]] = {}
+        self._lock = threading.Lock()  # 会话提交可能发生在其他线程
+        self._subscribers: List[_Subscriber] = []
+        self._runner: Optional[asyncio.Task] = None
+        self._listeners: List[Tuple[Any, str, Callable]] = []  # 已注册的会话事件监听
+        self.published = 0  # 收到的变化次数
+        self.pushes = 0  # 推送给客户端的消息数
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def publish(self, task_id: str, fields: Optional[Dict[str, Any]]):
+        """
+        记录任务的变化,下一次推送时发出(可以在其他线程中调用)
+        Args:
+            task_id: 任务ID
+            fields: 变化的字段,任务已删除时为None
+        """
+        if not self._subscribers:
+            return
+        if fields is not None:
+            fields = {key: value for key, value in fields.items() if key in TASK_FIELDS}
+        with self._lock:
+            self.published += 1
+            if fields is None:
+                self._pending[task_id] = None
+                return
+            current = self._pending.get(task_id, {})
+            if fields and current is not None:
+                self._pending[task_id] = {**current, **fields}
+
+    def subscribe(self) -> _Subscriber:
+        """新增订阅者,开始定时推送"""
+        subscriber = _Subscriber()
+        self._subscribers.append(subscriber)
+        if self._runner is None or self._runner.done():
+            self._runner = asyncio.create_task(self._run())
+        return subscriber
+
+    def unsubscribe(self, subscriber: _Subscriber):
+        if subscriber in self._subscribers:
+            self._subscribers.remove(subscriber)
+        if not self._subscribers:
+            with self._lock:
+                self._pending = {}
+            self._last_snapshot = {}
+            self._last_positions = {}
+
+    async def _run(self):
+        """定时推送,没有订阅者时退出"""
+        while self._subscribers:
+            await asyncio.sleep(self.interval)
+            if self._snapshot is not None:
+                try:
+                    await self._poll()
+                except Exception as e:
+                    logger.error(f"读取任务状态失败: {e}")
+            if self._positions is not None:
+                self._publish_positions()
+            self.flush()
+
+    async def _poll(self):
+        """比较两次读取的任务状态,把变化的字段作为事件发出"""
+        snapshot = await asyncio.to_thread(self._snapshot, list(self._last_snapshot))
+        previous = self._last_snapshot
+        # 结束的任务发出最终状态后不再跟踪,删除由本进程的会话提交发出
+        self._last_snapshot = {
+            task_id: fields
+            for task_id, fields in snapshot.items()
+            if fields.get("status") in ACTIVE_STATUSES
+        }
+        for task_id, fields in snapshot.items():
+            old = previous.get(task_id, {})
+            changed = {
+                key: value for key, value in fields.items() if old.get(key) != value
+            }
+            if changed:
+                self.publish(task_id, changed)
+        for task_id in previous.keys() - snapshot.keys():
+            self.publish(task_id, None)
+
+    def _publish_positions(self):
+        """比较两次读取的排队位置,把变化的位置作为事件发出,离开队列的任务位置为None"""
+        positions = self._positions()
+        previous, self._last_positions = self._last_positions, positions
+        for task_id in previous.keys() | positions.keys():
+            position = positions.get(task_id)
+            if previous.get(task_id) != position:
+                self.publish(task_id, {"queue_position": position})
+
+    def flush(self):
+        """把合并后的变化分发给所有订阅者"""
+        with self._lock:
+            if not self._pending:
+                return
+            changes, self._pending = self._pending, {}
+        for subscriber in self._subscribers:
+            subscriber.merge(changes)
+
+    async def stream(self) -> AsyncIterator[str]:
+        """
+        订阅任务变化,按SSE格式输出
+        每条消息为 event: tasks,data 为 {任务ID: 变化的字段},已删除的任务为null;
+        连接建立后先发送 event: ready,客户端据此重新加载一次完整列表
+        """
+        subscriber = self.subscribe()
+        try:
+            yield "event: ready\ndata: {}\n\n"
+            while True:
+                try:
+                    await asyncio.wait_for(
+                        subscriber.ready.wait(), timeout=self.heartbeat
+                    )
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                changes = subscriber.take()
+                if changes:
+                    self.pushes += 1
+                    yield f"event: tasks\ndata: {json.dumps(to_jsonable_python(changes), ensure_ascii=False)}\n\n"
+        finally:
+            self.unsubscribe(subscriber)
+
+    def watch(self, session_factory=None):
+        """
+        监听会话提交,把DownloadTask的新增、修改和删除作为事件发出;已在监听时不重复注册
+        Args:
+            session_factory: 要监听的会话工厂,默认为调用时的database.SessionLocal
+        """
+        if self._listeners:
+            return
+        session_factory = session_factory or database.SessionLocal
+
+        def after_flush(session, flush_context):
+            if not self._subscribers:
+                return
+            changes = session.info.setdefault("task_events", {})
+            for obj in session.new:
+                if isinstance(obj, DownloadTask):
+                    changes[obj.task_id] = _task_fields(obj)
+            for obj in session.dirty:
+                if (
+                    isinstance(obj, DownloadTask)
+                    and changes.get(obj.task_id, {}) is not None
+                ):
+                    changes.setdefault(obj.task_id, {}).update(
+                        _task_fields(obj, changed_only=True)
+                    )
+            for obj in session.deleted:
+                if isinstance(obj, DownloadTask):
+                    changes[obj.task_id] = None
+
+        def after_commit(session):
+            for task_id, fields in session.info.pop("task_events", {}).items():
+                self.publish(task_id, fields)
+
+        def after_rollback(session):
+            session.info.pop("task_events", None)
+
+        for name, listener in (
+            ("after_flush", after_flush),
+            ("after_commit", after_commit),
+            ("after_rollback", after_rollback),
+        ):
+            event.listen(session_factory, name, listener)
+            self._listeners.append((session_factory, name, listener))
+
+    def unwatch(self):
+        """停止监听会话提交"""
+        for target, name, listener in self._listeners:
+            event.remove(target, name, listener)
+        self._listeners = []
+
+    def to_dict(self) -> dict:
+        return {
+            "subscribers": len(self._subscribers),
+            "published": self.published,
+            "pushes": self.pushes,
+            "pending": len(self._pending),
+        }
+
+
+def _task_fields(task: DownloadTask, changed_only: bool = False) -> dict:
+    """任务记录中要推送的字段,changed_only时只取本次修改过的字段"""
+    # 只读取已加载的值,不在flush过程中触发查询
+    state = inspect(task)
+    return {
+        key: value
+        for key, value in state.dict.items()
+        if key in TASK_FIELDS
+        and (not changed_only or state.attrs[key].history.has_changes())
+    }
@@ -0,0 +1,253 @@
+"""
+后台文件写入
+"""
+
+import asyncio
+import errno
+import hashlib
+import os
+import queue
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def preallocate(fd: int, size: int) -> bool:
+    """
+    为文件预分配磁盘空间,减少碎片和元数据更新
+    文件系统不支持fallocate时退化为ftruncate(稀疏文件)
+    Args:
+        fd: 文件描述符
+        size: 文件大小
+    Returns:
+        是否真正分配了磁盘空间
+    """
+    if hasattr(os, "posix_fallocate"):
+        try:
+            os.posix_fallocate(fd, 0, size)
+            return True
+        except OSError as e:
+            if e.errno not in (errno.EOPNOTSUPP, errno.ENOSYS, errno.EINVAL):
+                raise
+            logger.debug(f"文件系统不支持fallocate,使用ftruncate: {e}")
+
+    if os.fstat(fd).st_size < size:
+        os.ftruncate(fd, size)
+    return False
+
+
+class WriteStats:
+    """写盘耗时统计(所有下载累计)"""
+
+    def __init__(self):
+        self.bytes_written = 0
+        self.disk_seconds = 0.0  # 写入线程阻塞在磁盘写入上的时间
+        self.backpressure_seconds = 0.0  # 网络读取因写入队列已满而等待的时间
+
+    def to_dict(self) -> dict:
+        return {
+            "bytes_written": self.bytes_written,
+            "disk_seconds": round(self.disk_seconds, 3),
+            "backpressure_seconds": round(self.backpressure_seconds, 3),
+        }
+
+
+class ChunkWriter:
+    """
+    文件写入器
+    数据块放入按字节计量的有界队列,由独立线程用os.pwrite按偏移写盘,事件循环不会阻塞在磁盘IO上;
+    排队的数据达到上限时write()等待,对网络读取形成反压,内存占用与块大小无关
+
+    写入线程同时按文件顺序增量计算SHA-256: 写在已校验位置的数据直接计算,
+    分段下载中提前到达的后续区间在前面的空缺补齐后从磁盘(通常仍在页缓存中)读回计算
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_pending_bytes: int,
+        stats: Optional[WriteStats] = None,
+        written_ranges: Iterable[Tuple[int, int]] = (),
+    ):
+        """
+        Args:
+            path: 文件路径,不存在时创建,已有内容保留
+            max_pending_bytes: 队列中最多等待写入的字节数,单个更大的数据块在队列为空时仍可写入
+            stats: 累计统计,为None时只统计本文件
+            written_ranges: 断点续传时文件中已有数据的区间 [(偏移, 长度), ...],会计入校验值
+        """
+        self.path = path
+        self.stats = stats or WriteStats()
+        self.disk_seconds = 0.0
+        self.backpressure_seconds = 0.0
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        # 顺序写入的位置,从文件末尾开始
+        self._position = os.fstat(self._fd).st_size
+        self._loop = asyncio.get_running_loop()
+        self._queue: queue.Queue = queue.Queue()
+        self.max_pending_bytes = max_pending_bytes
+        self._pending_bytes = 0  # 已提交、尚未写盘的字节数
+        self._drained = asyncio.Event()  # 有数据写盘后置位,唤醒等待的write()
+        self._error: Optional[BaseException] = None
+        # 增量校验: _hashed之前的数据已计入校验值,_unhashed记录其后已写入的区间 {起始: 结束}
+        self._hasher = hashlib.sha256()
+        self._hashed = 0
+        self._unhashed: Dict[int, int] = {
+            offset: offset + length for offset, length in written_ranges if length > 0
+        }
+        self._thread = threading.Thread(
+            target=self._run, name=f"writer:{path}", daemon=True
+        )
+        self._thread.start()
+
+    async def preallocate(self, size: int) -> bool:
+        """
+        预分配文件大小
+        Args:
+            size: 文件总大小
+        Returns:
+            是否真正分配了磁盘空间(False表示退化为稀疏文件)
+        """
+        return await asyncio.to_thread(preallocate, self._fd, size)
+
+    async def write(
+        self,
+        data: bytes,
+        offset: Optional[int] = None,
+        on_written: Optional[Callable[[int], None]] = None,
+    ):
+        """
+        提交一个数据块
+        Args:
+            data: 数据
+            offset: 写入偏移,None表示接着上一次顺序写入的位置
+            on_written: 数据落盘后在事件循环中回调 on_written(len(data))
+        """
+        self._raise_error()
+
+        if not self._has_room(len(data)):
+            start = time.perf_counter()
+            while not self._has_room(len(data)):
+                self._drained.clear()
+                await self._drained.wait()
+                self._raise_error()
+            waited = time.perf_counter() - start
+            self.backpressure_seconds += waited
+            self.stats.backpressure_seconds += waited
+        self._pending_bytes += len(data)
+
+        if offset is None:
+            offset = self._position
+        self._position = offset + len(data)
+        self._queue.put((data, offset, on_written))
+
+    def _has_room(self, size: int) -> bool:
+        return (
+            not self._pending_bytes
+            or self._pending_bytes + size <= self.max_pending_bytes
+        )
+
+    def _release(self, size: int):
+        """数据块写盘完成(在事件循环中执行),释放队列中的名额"""
+        self._pending_bytes -= size
+        self._drained.set()
+
+    @property
+    def hashed_size(self) -> int:
+        """已计入校验值的字节数(从文件开头连续)"""
+        return self._hashed
+
+    def hexdigest(self) -> str:
+        """已校验部分的SHA-256,应在close()之后读取"""
+        return self._hasher.hexdigest()
+
+    def _run(self):
+        """写入线程"""
+        try:
+            self._update_hash()
+        except BaseException as e:
+            self._error = e
+
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+
+            data, offset, on_written = item
+            try:
+                if self._error is None:
+                    start = time.perf_counter()
+                    self._pwrite(data, offset)
+                    elapsed = time.perf_counter() - start
+                    self._update_hash(data, offset)
+                    self._loop.call_soon_threadsafe(
+                        self._written, len(data), elapsed, on_written
+                    )
+            except BaseException as e:
+                self._error = e
+            finally:
+                self._loop.call_soon_threadsafe(self._release, len(data))
+
+        try:
+            os.close(self._fd)
+        except BaseException as e:
+            self._error = self._error or e
+
+    def _pwrite(self, data: bytes, offset: int):
+        """按偏移写入全部数据"""
+        view = memoryview(data)
+        while view:
+            written = os.pwrite(self._fd, view, offset)
+            view = view[written:]
+            offset += written
+
+    def _update_hash(self, data: Optional[bytes] = None, offset: int = 0):
+        """把新写入的数据以及因此变得连续的已写入区间计入校验值"""
+        if data is not None:
+            if offset == self._hashed:
+                self._hasher.update(data)
+                self._hashed += len(data)
+            elif offset > self._hashed:
+                self._unhashed[offset] = max(
+                    self._unhashed.get(offset, 0), offset + len(data)
+                )
+
+        while self._hashed in self._unhashed:
+            end = self._unhashed.pop(self._hashed)
+            while self._hashed < end:
+                block = os.pread(
+                    self._fd, min(end - self._hashed, 1024 * 1024), self._hashed
+                )
+                if not block:
+                    raise IOError(f"读取已写入数据失败: {self.path}@{self._hashed}")
+                self._hasher.update(block)
+                self._hashed += len(block)
+
+    def _written(
+        self, size: int, elapsed: float, on_written: Optional[Callable[[int], None]]
+    ):
+        """写入完成(在事件循环中执行)"""
+        self.disk_seconds += elapsed
+        self.stats.disk_seconds += elapsed
+        self.stats.bytes_written += size
+        if on_written:
+            on_written(size)
+
+    def _raise_error(self):
+        if self._error is not None:
+            raise IOError(f"写入文件失败: {self.path}: {self._error}")
+
+    async def close(self):
+        """等待队列写完并关闭文件,写入出错时抛出异常"""
+        self._queue.put(None)
+        await asyncio.to_thread(self._thread.join)
+        # 让写入完成的回调先执行完
+        await asyncio.sleep(0)
+        logger.debug(
+            f"写入完成: {self.path}, 磁盘耗时 {self.disk_seconds:.3f}s, "
+            f"反压等待 {self.backpressure_seconds:.3f}s"
+        )
+        self._raise_error()
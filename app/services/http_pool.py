@@ -0,0 +1,79 @@
+"""
+下载连接池
+"""
+
+import asyncio
+import importlib.util
+import httpx
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+from ..config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class DownloadClientPool:
+    """
+    进程内共享的CDN下载客户端
+    所有下载复用同一个httpx.AsyncClient,保持长连接,避免每次下载/重试都重新做DNS、TCP和TLS握手
+    """
+
+    def __init__(self):
+        self.timeout = settings.TIMEOUT
+        self.http2 = (
+            settings.DOWNLOAD_HTTP2 and importlib.util.find_spec("h2") is not None
+        )
+        self.per_host_connections = settings.DOWNLOAD_PER_HOST_CONNECTIONS
+        self.limits = httpx.Limits(
+            max_connections=settings.DOWNLOAD_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.DOWNLOAD_MAX_CONNECTIONS,
+            keepalive_expiry=settings.DOWNLOAD_KEEPALIVE_EXPIRY,
+        )
+        self._client: Optional[httpx.AsyncClient] = None
+        self._host_slots: Dict[str, asyncio.Semaphore] = {}
+
+        if settings.DOWNLOAD_HTTP2 and not self.http2:
+            logger.warning(
+                "未安装h2,下载连接池使用HTTP/1.1 (pip install 'httpx[http2]')"
+            )
+
+    def get_client(self) -> httpx.AsyncClient:
+        """获取共享客户端,首次使用或关闭后重新创建"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                http2=self.http2,
+                limits=self.limits,
+                timeout=self.timeout,
+                follow_redirects=True,
+            )
+        return self._client
+
+    def _host_slot(self, url: str) -> asyncio.Semaphore:
+        """获取目标主机的连接槽位"""
+        host = urlsplit(url).netloc
+        if host not in self._host_slots:
+            self._host_slots[host] = asyncio.Semaphore(self.per_host_connections)
+        return self._host_slots[host]
+
+    @asynccontextmanager
+    async def stream(self, method: str, url: str, headers: Optional[dict] = None):
+        """
+        发起流式请求,同一主机的并发请求数受DOWNLOAD_PER_HOST_CONNECTIONS限制
+        Args:
+            method: 请求方法
+            url: 请求URL
+            headers: 请求头
+        """
+        async with self._host_slot(url):
+            async with self.get_client().stream(
+                method, url, headers=headers
+            ) as response:
+                yield response
+
+    async def close(self):
+        """关闭客户端及其所有连接"""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
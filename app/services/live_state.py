@@ -0,0 +1,130 @@
+"""
+任务实时状态
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+from sqlalchemy import event
+from .. import database
+from ..models import DownloadTask
+from .. import schemas
+
+
+class LiveTaskRegistry:
+    """
+    进行中任务的实时状态和任务读缓存
+    下载进度在内存中更新,读接口把实时进度合并到缓存的任务记录上,轮询时不查询数据库;
+    DownloadTask有提交的修改(创建、删除、状态变化等)时缓存失效,下次读取重新查询;
+    其他进程的修改不经过本进程的会话,缓存最长保留ttl秒
+    """
+
+    def __init__(self, cache_size: int = 64, ttl: Optional[float] = None):
+        """
+        Args:
+            cache_size: 最多缓存的查询结果数
+            ttl: 缓存的最长有效期(秒),为空时只在提交时失效
+        """
+        self.cache_size = cache_size
+        self.ttl = ttl
+        self._live: Dict[str, Dict[str, Any]] = {}
+        self._listeners: List[Tuple[Any, str, Callable]] = []  # 已注册的会话事件监听
+        self._cache: "OrderedDict[Hashable, Tuple[float, Any]]" = (
+            OrderedDict()
+        )  # key -> (缓存时间, 结果)
+        self.hits = 0
+        self.misses = 0
+
+    def update(self, task_id: str, **fields):
+        """更新任务的实时字段"""
+        self._live.setdefault(task_id, {}).update(fields)
+
+    def remove(self, task_id: str):
+        """任务结束后移除实时状态"""
+        self._live.pop(task_id, None)
+
+    def get(self, task_id: str) -> Dict[str, Any]:
+        """任务的实时字段,不在进行中时为空"""
+        return self._live.get(task_id, {})
+
+    def merge(self, task: schemas.DownloadTask, **extra) -> schemas.DownloadTask:
+        """
+        把实时字段合并到任务记录上
+        Args:
+            task: 任务记录
+            extra: 额外覆盖的字段
+        Returns:
+            合并后的任务(新对象,缓存中的记录不变)
+        """
+        fields = {**self.get(task.task_id), **extra}
+        return task.model_copy(update=fields) if fields else task
+
+    def cached(self, key: Hashable) -> Optional[Any]:
+        """读取缓存的查询结果"""
+        entry = self._cache.get(key)
+        if (
+            entry is not None
+            and self.ttl is not None
+            and time.monotonic() - entry[0] >= self.ttl
+        ):
+            del self._cache[key]
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self._cache.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def store(self, key: Hashable, value: Any):
+        """缓存查询结果"""
+        self._cache[key] = (time.monotonic(), value)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def invalidate(self):
+        """清空读缓存"""
+        self._cache.clear()
+
+    def watch(self, session_factory=None):
+        """
+        监听会话提交,DownloadTask有修改时清空读缓存;已在监听时不重复注册
+        Args:
+            session_factory: 要监听的会话工厂,默认为调用时的database.SessionLocal
+        """
+        if self._listeners:
+            return
+        session_factory = session_factory or database.SessionLocal
+
+        def after_flush(session, flush_context):
+            if any(
+                isinstance(obj, DownloadTask)
+                for obj in (*session.new, *session.dirty, *session.deleted)
+            ):
+                session.info["download_tasks_changed"] = True
+
+        def after_commit(session):
+            if session.info.pop("download_tasks_changed", False):
+                self.invalidate()
+
+        for name, listener in (
+            ("after_flush", after_flush),
+            ("after_commit", after_commit),
+        ):
+            event.listen(session_factory, name, listener)
+            self._listeners.append((session_factory, name, listener))
+
+    def unwatch(self):
+        """停止监听会话提交"""
+        for target, name, listener in self._listeners:
+            event.remove(target, name, listener)
+        self._listeners = []
+
+    def to_dict(self) -> dict:
+        return {
+            "live_tasks": len(self._live),
+            "cached_queries": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
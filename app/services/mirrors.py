@@ -0,0 +1,139 @@
+"""
+CDN镜像选择
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional
+from urllib.parse import urlsplit
+from ..config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class HostStats:
+    """单个CDN主机的测量结果"""
+
+    latency: Optional[float] = None  # 首字节延迟(秒), 指数加权平均
+    throughput: float = 0.0  # 单连接吞吐(字节/秒), 指数加权平均
+    failures: int = 0  # 连续失败次数
+    updated_at: float = 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "latency_ms": (
+                round(self.latency * 1000, 1) if self.latency is not None else None
+            ),
+            "throughput": round(self.throughput),
+            "failures": self.failures,
+        }
+
+
+def _host(url: str) -> str:
+    return urlsplit(url).netloc
+
+
+class MirrorSelector:
+    """
+    在masterUrl和backupUrls之间选择镜像
+    记录各主机的延迟、吞吐和失败次数(进程内跨任务共享),
+    没有近期测量数据的候选先并发探测延迟,再按 失败次数 -> 吞吐 -> 延迟 排序
+    """
+
+    def __init__(self):
+        self.stats_ttl = settings.MIRROR_STATS_TTL
+        self.probe_timeout = settings.MIRROR_PROBE_TIMEOUT
+        self.min_speed = settings.MIRROR_MIN_SPEED * 1024
+        self._hosts: Dict[str, HostStats] = {}
+
+    def _get(self, url: str) -> HostStats:
+        host = _host(url)
+        if host not in self._hosts:
+            self._hosts[host] = HostStats()
+        return self._hosts[host]
+
+    def _is_fresh(self, url: str) -> bool:
+        stats = self._hosts.get(_host(url))
+        return (
+            stats is not None and time.monotonic() - stats.updated_at < self.stats_ttl
+        )
+
+    async def rank(
+        self, urls: List[str], probe: Callable[[str], Awaitable[None]]
+    ) -> List[str]:
+        """
+        对候选链接排序,最优的在前
+        Args:
+            urls: 候选链接
+            probe: 探测函数 probe(url),请求失败时抛出异常
+        Returns:
+            排序后的链接
+        """
+        if len(urls) < 2:
+            return list(urls)
+
+        stale = [url for url in urls if not self._is_fresh(url)]
+        if stale:
+            await asyncio.gather(*(self._probe(url, probe) for url in stale))
+
+        def sort_key(url: str):
+            stats = self._get(url)
+            latency = stats.latency if stats.latency is not None else float("inf")
+            return (stats.failures, -stats.throughput, latency)
+
+        ranked = sorted(urls, key=sort_key)
+        logger.debug(f"镜像排序: {[_host(url) for url in ranked]}")
+        return ranked
+
+    async def _probe(self, url: str, probe: Callable[[str], Awaitable[None]]):
+        """测量一个候选的首字节延迟"""
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(probe(url), self.probe_timeout)
+        except Exception as e:
+            logger.info(f"镜像探测失败 {_host(url)}: {e}")
+            self.record_failure(url)
+            return
+        self.record_latency(url, time.monotonic() - start)
+
+    def record_latency(self, url: str, latency: float):
+        """记录首字节延迟"""
+        stats = self._get(url)
+        stats.latency = (
+            latency if stats.latency is None else 0.7 * stats.latency + 0.3 * latency
+        )
+        stats.failures = 0
+        stats.updated_at = time.monotonic()
+
+    def record_throughput(self, url: str, throughput: float):
+        """记录单连接吞吐(字节/秒)"""
+        stats = self._get(url)
+        stats.throughput = (
+            throughput
+            if not stats.throughput
+            else 0.7 * stats.throughput + 0.3 * throughput
+        )
+        stats.failures = 0
+        stats.updated_at = time.monotonic()
+
+    def record_failure(self, url: str):
+        """记录请求失败"""
+        stats = self._get(url)
+        stats.failures += 1
+        stats.updated_at = time.monotonic()
+
+    def is_slow(self, url: str, throughput: float) -> bool:
+        """
+        判断连接吞吐是否已经崩溃
+        低于MIRROR_MIN_SPEED,或低于该主机历史吞吐的1/5时视为过慢
+        """
+        stats = self._hosts.get(_host(url))
+        threshold = max(self.min_speed, stats.throughput / 5 if stats else 0)
+        return throughput < threshold
+
+    def to_dict(self) -> dict:
+        """各主机的测量结果"""
+        return {host: stats.to_dict() for host, stats in self._hosts.items()}
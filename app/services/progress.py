@@ -0,0 +1,108 @@
+"""
+下载进度批量写入
+"""
+
+import asyncio
+from typing import Callable, Dict, Optional
+from sqlalchemy import update
+from ..database import SessionLocal
+from ..models import DownloadTask, TaskStatus
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ProgressBuffer:
+    """
+    下载进度写缓冲
+    进度更新先合并在内存中,按固定间隔在一个事务里批量写入,同一任务在一个间隔内只写最后一次;
+    只更新仍处于下载中的任务,不会覆盖已写入的完成/失败/暂停状态
+    """
+
+    def __init__(self, interval: float, session_factory: Callable = SessionLocal):
+        """
+        Args:
+            interval: 写入间隔(秒)
+            session_factory: 数据库会话工厂
+        """
+        self.interval = interval
+        self._session_factory = session_factory
+        self._pending: Dict[str, dict] = {}
+        self._flusher: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+        self.updates = 0  # 收到的更新次数
+        self.flushes = 0  # 写入事务数
+        self.rows_written = 0  # 写入的任务行数
+
+    def update(self, task_id: str, **fields):
+        """
+        记录任务的进度字段,下一次写入时生效
+        Args:
+            task_id: 任务ID
+            fields: 要更新的列
+        """
+        self._pending.setdefault(task_id, {}).update(fields)
+        self.updates += 1
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._run())
+
+    def pop(self, task_id: str) -> dict:
+        """
+        取出任务尚未写入的字段,由调用方随状态变更一起同步写入
+        Args:
+            task_id: 任务ID
+        Returns:
+            尚未写入的字段
+        """
+        return self._pending.pop(task_id, {})
+
+    async def _run(self):
+        """定时写入,没有待写入的更新时退出"""
+        while self._pending:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+    async def flush(self):
+        """把当前缓存的更新在一个事务中写入数据库"""
+        async with self._lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, {}
+            try:
+                await asyncio.to_thread(self._write, pending)
+            except Exception as e:
+                logger.error(f"写入下载进度失败: {e}")
+                return
+            self.flushes += 1
+            self.rows_written += len(pending)
+
+    def _write(self, pending: Dict[str, dict]):
+        db = self._session_factory()
+        try:
+            for task_id, fields in pending.items():
+                db.execute(
+                    update(DownloadTask)
+                    .where(
+                        DownloadTask.task_id == task_id,
+                        DownloadTask.status == TaskStatus.DOWNLOADING,
+                    )
+                    .values(**fields)
+                )
+            db.commit()
+        finally:
+            db.close()
+
+    async def close(self):
+        """停止定时写入并写入剩余的更新"""
+        if self._flusher is not None and not self._flusher.done():
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+        await self.flush()
+
+    def to_dict(self) -> dict:
+        return {
+            "updates": self.updates,
+            "flushes": self.flushes,
+            "rows_written": self.rows_written,
+            "pending": len(self._pending),
+        }
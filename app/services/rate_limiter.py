@@ -0,0 +1,147 @@
+"""
+下载带宽限速
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+class TokenBucket:
+    """
+    令牌桶,rate为每秒字节数,0表示不限速
+    允许透支: 一次可以取走超过桶容量的字节,之后的请求等待透支补齐
+    """
+
+    def __init__(self, rate: int = 0):
+        self.rate = rate
+        self.tokens = 0.0
+        self.updated_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        # 桶容量为1秒的流量
+        self.tokens = min(self.rate, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def set_rate(self, rate: int):
+        """调整速率"""
+        self._refill()
+        self.rate = rate
+        self.tokens = min(self.tokens, rate)
+
+    def delay(self) -> float:
+        """距离可以再次取令牌还需等待的秒数"""
+        if not self.rate:
+            return 0.0
+        self._refill()
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def consume(self, amount: int):
+        """取走令牌"""
+        if self.rate:
+            self._refill()
+            self.tokens -= amount
+
+    async def wait(self, amount: int):
+        """等待令牌可用后取走"""
+        while (delay := self.delay()) > 0:
+            # 分段等待,速率在等待期间被调整时能及时生效
+            await asyncio.sleep(min(delay, 0.5))
+        self.consume(amount)
+
+
+class BandwidthLimiter:
+    """
+    全局带宽限速器
+    每个任务有独立的限速桶;全局桶按公平队列在任务之间分配: 每个请求按所属任务已获得的
+    字节数打上虚拟时间标签,标签最小的先发放,分段下载的多条连接也只占一个任务的份额
+    """
+
+    def __init__(self, global_rate: int = 0, task_rate: int = 0):
+        """
+        Args:
+            global_rate: 全局限速(字节/秒),0表示不限速
+            task_rate: 单任务限速(字节/秒),0表示不限速
+        """
+        self.task_rate = task_rate
+        self._global = TokenBucket(global_rate)
+        self._task_buckets: Dict[str, TokenBucket] = {}
+        self._waiters: List[Tuple[float, int, asyncio.Future, int]] = []
+        self._finish_tags: Dict[str, float] = {}
+        self._virtual_time = 0.0
+        self._sequence = itertools.count()
+        self._dispatcher: Optional[asyncio.Task] = None
+
+    @property
+    def global_rate(self) -> int:
+        return self._global.rate
+
+    def configure(
+        self, global_rate: Optional[int] = None, task_rate: Optional[int] = None
+    ):
+        """
+        运行时调整限速
+        Args:
+            global_rate: 全局限速(字节/秒),None表示不修改
+            task_rate: 单任务限速(字节/秒),None表示不修改
+        """
+        if global_rate is not None:
+            self._global.set_rate(global_rate)
+        if task_rate is not None:
+            self.task_rate = task_rate
+            for bucket in self._task_buckets.values():
+                bucket.set_rate(task_rate)
+
+    async def acquire(self, task_key: str, amount: int):
+        """
+        为任务申请amount字节的带宽,超出限速时等待
+        Args:
+            task_key: 任务标识
+            amount: 字节数
+        """
+        if self.task_rate:
+            if task_key not in self._task_buckets:
+                self._task_buckets[task_key] = TokenBucket(self.task_rate)
+            await self._task_buckets[task_key].wait(amount)
+
+        if not self._global.rate:
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        tag = max(self._virtual_time, self._finish_tags.get(task_key, 0.0)) + amount
+        self._finish_tags[task_key] = tag
+        heapq.heappush(self._waiters, (tag, next(self._sequence), future, amount))
+
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+
+        await future
+
+    def release(self, task_key: str):
+        """任务结束后释放其限速桶"""
+        self._task_buckets.pop(task_key, None)
+        self._finish_tags.pop(task_key, None)
+
+    async def _dispatch(self):
+        """按虚拟时间标签发放全局令牌"""
+        while self._waiters:
+            tag, _, future, amount = heapq.heappop(self._waiters)
+            if future.done():  # 等待方已取消
+                continue
+
+            await self._global.wait(amount)
+            self._virtual_time = tag
+            if not future.done():
+                future.set_result(None)
+                # 让被唤醒的任务先重新排队,再发放下一份令牌
+                await asyncio.sleep(0)
+
+    def get_limits(self) -> dict:
+        """当前限速配置(字节/秒)"""
+        return {
+            "global_rate": self.global_rate,
+            "task_rate": self.task_rate,
+        }
@@ -0,0 +1,180 @@
+"""
+下载任务调度
+"""
+
+import asyncio
+import heapq
+import itertools
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class DownloadScheduler:
+    """
+    有界并发的下载调度器
+    排队的任务按 优先级(数值大的在前) -> 入队顺序 出队,同时运行的下载数不超过concurrency;
+    一个下载结束后立即从队列中取下一个,并发数可以在运行时调整
+    """
+
+    def __init__(self, launch: Callable[[str, Any], asyncio.Task], concurrency: int):
+        """
+        Args:
+            launch: 启动下载的函数 launch(task_id, payload),返回下载的asyncio.Task
+            concurrency: 最大并发下载数
+        """
+        self._launch = launch
+        self.concurrency = max(1, concurrency)
+        self._heap: List[Tuple[int, int, str]] = []  # (-优先级, 入队序号, 任务ID)
+        self._queued: Dict[str, Tuple[int, int, Any]] = (
+            {}
+        )  # 任务ID -> (优先级, 入队序号, payload)
+        # 按下载协程计数: 任务被停止后立即重新入队时,旧的下载可能还没退出
+        self._running: Set[asyncio.Task] = set()
+        # 让出名额后等待重新占用的下载,先于排队的任务获得名额
+        self._waiting: Deque[Tuple[asyncio.Task, asyncio.Future]] = deque()
+        self._sequence = itertools.count()
+        self._closed = False
+
+    @property
+    def running_count(self) -> int:
+        return len(self._running)
+
+    @property
+    def queued_count(self) -> int:
+        return len(self._queued)
+
+    def is_queued(self, task_id: str) -> bool:
+        return task_id in self._queued
+
+    def queued_ids(self) -> List[str]:
+        """排队中的任务ID"""
+        return list(self._queued)
+
+    def submit(self, task_id: str, priority: int = 0, payload: Any = None):
+        """
+        任务入队,有空闲名额时立即开始
+        Args:
+            task_id: 任务ID
+            priority: 优先级,数值大的先下载
+            payload: 启动下载时原样传给launch
+        """
+        if task_id in self._queued:
+            raise ValueError(f"任务已在队列中: {task_id}")
+
+        sequence = next(self._sequence)
+        self._queued[task_id] = (priority, sequence, payload)
+        heapq.heappush(self._heap, (-priority, sequence, task_id))
+        self._pump()
+
+    def remove(self, task_id: str) -> bool:
+        """
+        从队列中移除任务(堆中的条目在出队时跳过)
+        Returns:
+            任务是否在队列中
+        """
+        return self._queued.pop(task_id, None) is not None
+
+    def reprioritize(self, task_id: str, priority: int) -> bool:
+        """
+        调整排队任务的优先级,同一优先级内仍按原入队顺序
+        Returns:
+            任务是否在队列中
+        """
+        entry = self._queued.get(task_id)
+        if entry is None:
+            return False
+
+        _, sequence, payload = entry
+        self._queued[task_id] = (priority, sequence, payload)
+        heapq.heappush(self._heap, (-priority, sequence, task_id))
+        self._pump()
+        return True
+
+    def release(self, download_task: asyncio.Task) -> bool:
+        """
+        下载暂时让出名额(如等待其他下载的结果),空出的名额立即分给排队的任务
+        Returns:
+            下载是否占用着名额
+        """
+        if download_task not in self._running:
+            return False
+        self._running.discard(download_task)
+        download_task.remove_done_callback(self._finished)
+        self._pump()
+        return True
+
+    async def reacquire(self, download_task: asyncio.Task):
+        """让出名额的下载重新占用名额,没有空闲名额时等待"""
+        if not self._waiting and len(self._running) < self.concurrency:
+            self._claim(download_task)
+            return
+        granted = asyncio.get_running_loop().create_future()
+        self._waiting.append((download_task, granted))
+        await granted
+
+    def positions(self) -> Dict[str, int]:
+        """排队任务的位置,从1开始"""
+        order = sorted(self._queued.items(), key=lambda item: (-item[1][0], item[1][1]))
+        return {task_id: index + 1 for index, (task_id, _) in enumerate(order)}
+
+    def set_concurrency(self, concurrency: int):
+        """
+        调整最大并发数
+        调小时已在运行的下载不会被中断,结束后不再补位
+        """
+        self.concurrency = max(1, concurrency)
+        self._pump()
+
+    def _pop(self) -> Optional[Tuple[str, Any]]:
+        """取出下一个有效的排队任务"""
+        while self._heap:
+            neg_priority, sequence, task_id = heapq.heappop(self._heap)
+            entry = self._queued.get(task_id)
+            # 已移除或优先级已调整的旧条目
+            if entry is None or (entry[0], entry[1]) != (-neg_priority, sequence):
+                continue
+            del self._queued[task_id]
+            return task_id, entry[2]
+        return None
+
+    def _pump(self):
+        """有空闲名额时启动排队的任务"""
+        while (
+            not self._closed and self._waiting and len(self._running) < self.concurrency
+        ):
+            download_task, granted = self._waiting.popleft()
+            # 等待期间被取消的跳过
+            if not granted.done():
+                self._claim(download_task)
+                granted.set_result(None)
+
+        while not self._closed and len(self._running) < self.concurrency:
+            item = self._pop()
+            if item is None:
+                break
+
+            task_id, payload = item
+            try:
+                download_task = self._launch(task_id, payload)
+            except Exception as e:
+                logger.error(f"启动下载失败 {task_id}: {e}")
+                continue
+
+            self._claim(download_task)
+
+    def _claim(self, download_task: asyncio.Task):
+        self._running.add(download_task)
+        download_task.add_done_callback(self._finished)
+
+    def _finished(self, download_task: asyncio.Task):
+        self._running.discard(download_task)
+        self._pump()
+
+    def close(self):
+        """停止调度并清空队列"""
+        self._closed = True
+        self._queued.clear()
+        self._heap.clear()
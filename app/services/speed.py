@@ -0,0 +1,56 @@
+"""
+下载速度估计
+"""
+
+import time
+from collections import deque
+from typing import Deque, Optional, Tuple
+
+
+class SpeedEstimator:
+    """
+    滑动窗口下载速度
+    只统计本次下载实际收到的字节,断点续传时已在磁盘上的数据不计入;
+    没有数据到达时窗口内的字节逐渐移出,速度随之下降,可以反映下载停滞
+    """
+
+    def __init__(self, window: float = 10.0):
+        """
+        Args:
+            window: 窗口长度(秒)
+        """
+        self.window = window
+        self._samples: Deque[Tuple[float, int]] = deque()  # (时间, 字节数)
+        self._window_bytes = 0
+        self._started = time.monotonic()
+
+    def add(self, size: int):
+        """记录收到的字节数"""
+        self._samples.append((time.monotonic(), size))
+        self._window_bytes += size
+
+    def _trim(self, now: float):
+        while self._samples and now - self._samples[0][0] >= self.window:
+            _, size = self._samples.popleft()
+            self._window_bytes -= size
+
+    @property
+    def speed(self) -> float:
+        """当前速度(字节/秒)"""
+        now = time.monotonic()
+        self._trim(now)
+        span = min(self.window, now - self._started)
+        return self._window_bytes / span if span > 0 else 0.0
+
+    def eta(self, remaining: int) -> Optional[float]:
+        """
+        预计剩余时间(秒),速度为0或剩余大小未知时返回None
+        Args:
+            remaining: 剩余字节数
+        """
+        if remaining < 0:
+            return None
+        if remaining == 0:
+            return 0.0
+        speed = self.speed
+        return remaining / speed if speed > 0 else None
@@ -1,15 +1,32 @@
 """
 任务管理服务
 """
+
 import asyncio
+import socket
+import time
 import uuid
-from datetime import datetime
-from typing import Optional, Dict, List
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Optional, Dict, Iterable, List, Tuple
+from urllib.parse import urlsplit
+from sqlalchemy import and_, or_, update
 from sqlalchemy.orm import Session
-from ..models import DownloadTask, TaskStatus, VideoQuality
+from ..models import DownloadTask, TaskCommand, TaskStatus, UserAuth, VideoQuality
+from .. import schemas
 from ..schemas import DownloadTaskCreate, DownloadTaskUpdate
 from .xiaohongshu_api import XiaohongshuAPI
-from .downloader import VideoDownloader
+from .downloader import VideoDownloader, CancelToken, HostUnavailableError
+from .speed import SpeedEstimator
+from .http_pool import DownloadClientPool
+from .rate_limiter import BandwidthLimiter
+from .content_store import ContentStore
+from .scheduler import DownloadScheduler
+from .progress import ProgressBuffer
+from .live_state import LiveTaskRegistry
+from .events import TaskEventBus, ACTIVE_STATUSES
+from .windows import DownloadWindow
 from ..config import settings
 import logging
 import os
@@ -17,12 +34,108 @@ import os
 logger = logging.getLogger(__name__)
 
 
+@dataclass
+class BatchJob:
+    """批量创建任务的进度"""
+
+    batch_id: str
+    total: int
+    resolved: int = 0  # 已获取视频信息的数量(由下载进程获取时为已处理的数量)
+    failed: int = 0  # 获取视频信息失败的数量(仍会创建任务)
+    duplicates: int = 0  # 已有相同视频和画质的任务,不再重复创建的数量
+    status: str = "running"  # running/completed/failed
+    task_ids: List[str] = field(default_factory=list)
+    error: Optional[str] = None
+    created_at: datetime = field(default_factory=datetime.now)
+    runner: Optional[asyncio.Task] = field(default=None, repr=False)
+
+    def to_dict(self) -> dict:
+        return {
+            "batch_id": self.batch_id,
+            "status": self.status,
+            "total": self.total,
+            "resolved": self.resolved,
+            "failed": self.failed,
+            "duplicates": self.duplicates,
+            "task_count": len(self.task_ids),
+            "task_ids": self.task_ids,
+            "error": self.error,
+            "created_at": self.created_at.isoformat(),
+        }
+
+
+@dataclass
+class SharedDownload:
+    """同一视频和画质正在进行的下载,其他任务等待它的结果,不再单独下载"""
+
+    key: Tuple[str, VideoQuality]
+    leader_id: str
+    result: (
+        asyncio.Future
+    )  # 成功时为 {'file_path', 'size', 'content_hash'},失败或取消时为None
+    followers: set = field(default_factory=set)  # 等待中的任务ID
+
+
+# 这些状态的任务已经或即将下载到同一视频,创建任务时不再重复创建
+DEDUP_STATUSES = (TaskStatus.PENDING, TaskStatus.DOWNLOADING, TaskStatus.COMPLETED)
+
+
 class TaskManager:
     """任务管理器"""
 
-    def __init__(self):
-        self.downloader = VideoDownloader()
+    def __init__(self, worker_id: Optional[str] = None):
+        """
+        Args:
+            worker_id: 下载进程ID,为空时表示API进程(EMBEDDED_WORKER为True时在进程内下载)
+        """
+        self.is_worker = worker_id is not None
+        # 进程ID记录在领取的任务上,uvicorn多进程时每个API进程各不相同
+        self.worker_id = worker_id or f"api-{socket.gethostname()}-{os.getpid()}"
+        self.client_pool = DownloadClientPool()
+        self.rate_limiter = BandwidthLimiter(
+            settings.GLOBAL_BANDWIDTH_LIMIT * 1024,
+            settings.TASK_BANDWIDTH_LIMIT * 1024,
+        )
+        self.downloader = VideoDownloader(self.client_pool, self.rate_limiter)
+        self.content_store = ContentStore()
         self.active_tasks: Dict[str, asyncio.Task] = {}
+        self.cancel_tokens: Dict[str, CancelToken] = {}
+        self.speed_estimators: Dict[str, SpeedEstimator] = {}  # 进行中任务的实时速度
+        self.scheduler = DownloadScheduler(
+            self._launch_download, settings.MAX_CONCURRENT_DOWNLOADS
+        )
+        self.progress_buffer = ProgressBuffer(settings.PROGRESS_FLUSH_INTERVAL)
+        # 由其他进程下载时,任务记录的修改不经过本进程的会话,无法据此让缓存失效
+        self.live_state = LiveTaskRegistry(
+            cache_size=64 if settings.EMBEDDED_WORKER else 0,
+            ttl=settings.TASK_CACHE_TTL,
+        )
+        # 任务变化推送给订阅的页面;由其他进程下载时,定时读取进行中任务的状态得到变化
+        self.events = TaskEventBus(
+            settings.TASK_EVENT_INTERVAL,
+            snapshot=None if settings.EMBEDDED_WORKER else self._snapshot_tasks,
+            positions=self._queue_positions,
+        )
+        self.batch_jobs: "OrderedDict[str, BatchJob]" = (
+            OrderedDict()
+        )  # 最近的批量创建任务
+        self._metadata_slots = asyncio.Semaphore(
+            settings.METADATA_CONCURRENCY
+        )  # 并发获取视频信息的名额
+        self._enrichments: set = set()  # 进行中的后台信息补全
+        self.shared_downloads: Dict[Tuple[str, VideoQuality], SharedDownload] = (
+            {}
+        )  # 进行中的下载
+        self.leased_tasks: set = set()  # 本进程持有租约、正在下载的任务
+        self.parked_tasks: set = set()  # 等待相同视频的下载结果、不占用下载名额的任务
+        self.deferred_tasks: Dict[str, asyncio.TimerHandle] = (
+            {}
+        )  # 推迟开始(预定时间、下载时段、CDN主机熔断),到期后入队的任务
+        self.window_timers: Dict[str, asyncio.TimerHandle] = (
+            {}
+        )  # 下载时段结束时暂停下载的定时器
+        self._control_loop: Optional[asyncio.Task] = None
+        self._last_heartbeat = 0.0
         self.xhs_api = XiaohongshuAPI()
 
     async def create_task(
@@ -33,42 +146,167 @@ class TaskManager:
     ) -> DownloadTask:
         """
         创建下载任务
+        只从URL中提取视频ID后立即返回,标题、作者和封面由后台补全(补全前为空);
+        同一视频和画质已有等待中、下载中或已完成的任务时返回该任务(allow_duplicate为True时仍新建)
         Args:
             db: 数据库会话
             task_data: 任务数据
             cookies: Cookie字符串
         Returns:
-            创建的任务
+            创建的任务,或已有的相同任务
         """
         # 设置Cookie
         if cookies:
             self.xhs_api.set_cookies(cookies)
 
-        # 获取视频信息
+        if task_data.download_window:
+            DownloadWindow.parse(task_data.download_window)
+
+        video_id = self.xhs_api.extract_video_id(task_data.video_url)
+        if not task_data.allow_duplicate:
+            existing = self._find_duplicates(db, [(video_id, task_data.quality)])
+            if existing:
+                task = next(iter(existing.values()))
+                logger.info(f"已有相同视频的任务,不再重复创建: {task.task_id}")
+                # 新请求的优先级更高时提升已有任务的优先级
+                if task_data.priority > (task.priority or 0):
+                    task.priority = task_data.priority
+                    db.commit()
+                    self.scheduler.reprioritize(task.task_id, task.priority)
+                return task
+
+        db_task = self._build_task(task_data, {"video_id": video_id})
+        db.add(db_task)
+        db.commit()
+        db.refresh(db_task)
+
+        # 由下载进程下载时,视频信息在领取任务后获取,API进程不请求页面
+        if self.fetches_metadata:
+            enrichment = asyncio.create_task(
+                self._enrich_task(db_task.task_id, db_task.video_url)
+            )
+            self._enrichments.add(enrichment)
+            enrichment.add_done_callback(self._enrichments.discard)
+
+        # 设置了预定时间或下载时段的任务直接入队,到时自动开始
+        if db_task.scheduled_at or db_task.download_window:
+            await self.start_task(db, db_task.task_id, cookies)
+
+        return db_task
+
+    @property
+    def fetches_metadata(self) -> bool:
+        """本进程是否获取视频信息;由下载进程下载时,API进程只解析URL中的视频ID"""
+        return self.is_worker or settings.EMBEDDED_WORKER
+
+    def _find_duplicates(
+        self,
+        db: Session,
+        keys: Iterable[Tuple[Optional[str], VideoQuality]],
+    ) -> Dict[Tuple[str, VideoQuality], DownloadTask]:
+        """
+        查找已有的相同任务
+        已完成但文件已被删除的任务不算,需要重新下载
+        Args:
+            db: 数据库会话
+            keys: (视频ID, 画质) 列表
+        Returns:
+            (视频ID, 画质) -> 最近创建的相同任务
+        """
+        keys = {key for key in keys if key[0]}
+        if not keys:
+            return {}
+
+        candidates = (
+            db.query(DownloadTask)
+            .filter(
+                DownloadTask.video_id.in_({video_id for video_id, _ in keys}),
+                DownloadTask.status.in_(DEDUP_STATUSES),
+            )
+            .order_by(DownloadTask.created_at.desc())
+            .all()
+        )
+
+        existing = {}
+        for task in candidates:
+            key = (task.video_id, task.quality)
+            if key not in keys or key in existing:
+                continue
+            if task.status == TaskStatus.COMPLETED and not (
+                task.file_path and os.path.exists(task.file_path)
+            ):
+                continue
+            existing[key] = task
+        return existing
+
+    async def _enrich_task(self, task_id: str, video_url: str):
+        """
+        后台补全任务的视频信息
+        解析结果由XiaohongshuAPI缓存,开始下载时获取下载链接不再重复请求页面
+        """
+        from ..database import SessionLocal
+
+        video_info = await self._resolve_video_info(video_url)
+
+        db = SessionLocal()
+        try:
+            task = (
+                db.query(DownloadTask).filter(DownloadTask.task_id == task_id).first()
+            )
+            # 下载开始时可能已经补全
+            if task and task.title is None:
+                self._apply_video_info(task, video_info)
+                db.commit()
+        except Exception as e:
+            logger.error(f"补全任务信息失败: {e}")
+        finally:
+            db.close()
+
+    def _apply_video_info(self, task: DownloadTask, video_info: dict):
+        """把视频信息写入任务"""
+        task.video_id = video_info.get("video_id") or task.video_id
+        task.title = video_info.get("title") or "未知"
+        task.author = video_info.get("author") or "未知"
+        task.cover_url = video_info.get("cover_url")
+
+    async def _resolve_video_info(self, video_url: str) -> dict:
+        """获取视频信息(复用最近解析过的页面),失败时返回默认信息"""
         try:
-            video_info = await self.xhs_api.get_video_info(task_data.video_url)
+            async with self._metadata_slots:
+                return await self.xhs_api.get_video_info(video_url, use_cache=True)
         except Exception as e:
             logger.error(f"获取视频信息失败: {e}")
-            video_info = {
-                'video_id': None,
-                'title': '未知',
-                'author': '未知',
-                'cover_url': None,
+            return {
+                "video_id": None,
+                "title": "未知",
+                "author": "未知",
+                "cover_url": None,
             }
 
+    def _build_task(
+        self, task_data: DownloadTaskCreate, video_info: dict
+    ) -> DownloadTask:
+        """根据视频信息构建任务记录"""
         # 生成任务ID
         task_id = str(uuid.uuid4())
+        # 带时区的预定时间转换为本地时间,与其他时间列一致
+        scheduled_at = task_data.scheduled_at
+        if scheduled_at and scheduled_at.tzinfo:
+            scheduled_at = scheduled_at.astimezone().replace(tzinfo=None)
 
         # 创建任务
-        db_task = DownloadTask(
+        return DownloadTask(
             task_id=task_id,
             video_url=task_data.video_url,
-            video_id=video_info.get('video_id'),
-            title=video_info.get('title', '未知'),
-            author=video_info.get('author', '未知'),
-            cover_url=video_info.get('cover_url'),
+            video_id=video_info.get("video_id"),
+            title=video_info.get("title"),
+            author=video_info.get("author"),
+            cover_url=video_info.get("cover_url"),
             quality=task_data.quality,
             parts=task_data.parts,
+            priority=task_data.priority,
+            scheduled_at=scheduled_at,
+            download_window=task_data.download_window,
             status=TaskStatus.PENDING,
             progress=0.0,
             downloaded_size=0,
@@ -76,15 +314,158 @@ class TaskManager:
             speed=0.0,
         )
 
-        db.add(db_task)
-        db.commit()
-        db.refresh(db_task)
+    def create_tasks_batch(
+        self,
+        tasks_data: List[DownloadTaskCreate],
+        cookies: Optional[str] = None,
+    ) -> BatchJob:
+        """
+        批量创建下载任务
+        在后台以METADATA_CONCURRENCY的并发获取视频信息,全部完成后在一个事务中写入所有任务
+        (由下载进程下载时不获取,下载进程领取任务后再获取);
+        批次内和数据库中已有的相同视频和画质不再重复创建(allow_duplicate为True的除外);
+        立即返回批次,通过get_batch_job查询进度
+        Args:
+            tasks_data: 任务数据列表
+            cookies: Cookie字符串
+        Returns:
+            批次
+        """
+        for window in {
+            task_data.download_window
+            for task_data in tasks_data
+            if task_data.download_window
+        }:
+            DownloadWindow.parse(window)
 
-        return db_task
+        if cookies:
+            self.xhs_api.set_cookies(cookies)
+
+        job = BatchJob(batch_id=str(uuid.uuid4()), total=len(tasks_data))
+        self.batch_jobs[job.batch_id] = job
+        while len(self.batch_jobs) > 100:
+            self.batch_jobs.popitem(last=False)
+
+        job.runner = asyncio.create_task(self._run_batch(job, tasks_data, cookies))
+        return job
+
+    def get_batch_job(self, batch_id: str) -> Optional[BatchJob]:
+        """获取批次进度"""
+        return self.batch_jobs.get(batch_id)
+
+    async def _run_batch(
+        self,
+        job: BatchJob,
+        tasks_data: List[DownloadTaskCreate],
+        cookies: Optional[str] = None,
+    ):
+        """并发获取视频信息并批量写入任务,设置了预定时间或下载时段的任务同时入队"""
+        from ..database import SessionLocal
+
+        existing_ids: List[str] = []  # 已有的相同任务
+
+        def split_duplicates(db: Session, items: List[tuple]) -> List[tuple]:
+            """去掉已有相同任务的条目 (key, task_data, ...),已有的任务计入批次"""
+            existing = self._find_duplicates(
+                db, [item[0] for item in items if not item[1].allow_duplicate]
+            )
+            fresh = []
+            for item in items:
+                task = None if item[1].allow_duplicate else existing.get(item[0])
+                if task:
+                    job.duplicates += 1
+                    existing_ids.append(task.task_id)
+                else:
+                    fresh.append(item)
+            return fresh
+
+        async def resolve(key: tuple, task_data: DownloadTaskCreate) -> DownloadTask:
+            if not self.fetches_metadata:
+                job.resolved += 1
+                return self._build_task(task_data, {"video_id": key[0]})
+            video_info = await self._resolve_video_info(task_data.video_url)
+            if not video_info.get("video_id"):
+                job.failed += 1
+            job.resolved += 1
+            return self._build_task(task_data, video_info)
+
+        try:
+            # 先按URL中的视频ID去重,相同的视频不再获取视频信息
+            items, seen = [], set()
+            for task_data in tasks_data:
+                key = (
+                    self.xhs_api.extract_video_id(task_data.video_url),
+                    task_data.quality,
+                )
+                if key[0] and not task_data.allow_duplicate and key in seen:
+                    job.duplicates += 1
+                    continue
+                seen.add(key)
+                items.append((key, task_data))
 
-    async def start_task(self, db: Session, task_id: str, cookies: Optional[str] = None):
+            db = SessionLocal()
+            try:
+                items = split_duplicates(db, items)
+            finally:
+                db.close()
+            job.resolved = job.duplicates
+
+            db_tasks = await asyncio.gather(
+                *(resolve(key, task_data) for key, task_data in items)
+            )
+
+            db = SessionLocal()
+            try:
+                # 获取视频信息期间可能已有其他请求创建了相同的任务
+                fresh = split_duplicates(
+                    db,
+                    [
+                        ((db_task.video_id, db_task.quality), task_data, db_task)
+                        for db_task, (_, task_data) in zip(db_tasks, items)
+                    ],
+                )
+                db_tasks = [db_task for _, _, db_task in fresh]
+                task_ids = [task.task_id for task in db_tasks]
+                scheduled = [
+                    task
+                    for task in db_tasks
+                    if task.scheduled_at or task.download_window
+                ]
+                for task in scheduled:
+                    task.queued_at = self._release_time(task)
+                    self._hold_queued(task)
+                dispatch = [
+                    (task.task_id, task.priority or 0, task.queued_at)
+                    for task in scheduled
+                ]
+                db.add_all(db_tasks)
+                db.commit()
+            finally:
+                db.close()
+
+            for task_id, priority, release_at in dispatch:
+                self._dispatch(task_id, priority, cookies, release_at)
+
+            job.task_ids = task_ids + existing_ids
+            job.status = "completed"
+            logger.info(
+                f"批量创建任务完成: {len(db_tasks)} 个, 已有相同任务 {job.duplicates} 个"
+            )
+        except asyncio.CancelledError:
+            logger.info(f"批量创建任务已取消: {job.batch_id}")
+            job.status = "failed"
+            job.error = "已取消"
+            raise
+        except Exception as e:
+            logger.error(f"批量创建任务失败: {e}")
+            job.status = "failed"
+            job.error = str(e)
+
+    async def start_task(
+        self, db: Session, task_id: str, cookies: Optional[str] = None
+    ):
         """
-        启动下载任务
+        启动下载任务: 任务进入调度队列,同时下载数未达到MAX_CONCURRENT_DOWNLOADS时立即开始
         Args:
             db: 数据库会话
             task_id: 任务ID
@@ -98,18 +479,110 @@ class TaskManager:
         if task.status == TaskStatus.DOWNLOADING:
             raise ValueError(f"任务正在下载中: {task_id}")
 
-        # 更新任务状态
-        task.status = TaskStatus.DOWNLOADING
-        task.started_at = datetime.now()
+        if self.scheduler.is_queued(task_id):
+            raise ValueError(f"任务已在队列中: {task_id}")
+
+        if (
+            not settings.EMBEDDED_WORKER
+            and task.status == TaskStatus.PENDING
+            and task.queued_at
+        ):
+            raise ValueError(f"任务已在队列中: {task_id}")
+
+        # 更新任务状态,开始下载时再改为下载中;未到预定时间或不在下载时段内时入队时间为可以开始的时间
+        task.status = TaskStatus.PENDING
+        task.queued_at = self._release_time(task)
+        self._hold_queued(task)
         db.commit()
 
+        self._dispatch(task_id, task.priority or 0, cookies, task.queued_at)
+
+    def _release_time(
+        self, task: DownloadTask, after: Optional[datetime] = None
+    ) -> datetime:
+        """
+        任务最早可以开始下载的时间: 不早于预定时间,且在下载时段内
+        Args:
+            task: 任务
+            after: 从该时间起计算,默认为当前时间
+        Returns:
+            可以开始的时间,现在就可以开始时为当前时间
+        """
+        release_at = max(after or datetime.now(), task.scheduled_at or datetime.min)
+        if task.download_window:
+            release_at = DownloadWindow.parse(task.download_window).next_open(
+                release_at
+            )
+        return release_at
+
+    def _hold_queued(self, task: DownloadTask):
+        """
+        记录排队任务的所有者: 放入本进程调度器的任务由本进程持有租约,随下载租约一起续期,
+        进程异常退出后租约过期,由其他API进程接管;由下载进程从数据库队列领取时不记录
+        Args:
+            task: 排队中的任务
+        """
+        if self.is_worker or not settings.EMBEDDED_WORKER:
+            task.worker_id = None
+            task.lease_expires_at = None
+        else:
+            task.worker_id = self.worker_id
+            task.lease_expires_at = self._lease_deadline()
+
+    def _dispatch(
+        self, task_id: str, priority: int, cookies: Optional[str], release_at: datetime
+    ):
+        """
+        排队中的任务交给调度器,未到开始时间的到时再入队
+        由下载进程从数据库队列中领取时不需要处理,领取时跳过未到开始时间的任务
+        Args:
+            task_id: 任务ID
+            priority: 优先级
+            cookies: Cookie字符串
+            release_at: 可以开始下载的时间
+        """
+        if self.is_worker or not settings.EMBEDDED_WORKER:
+            return
+
+        previous = self.deferred_tasks.pop(task_id, None)
+        if previous:
+            previous.cancel()
+
+        delay = (release_at - datetime.now()).total_seconds()
+        if delay <= 0:
+            self.scheduler.submit(task_id, priority, cookies)
+            return
+        handle = asyncio.get_running_loop().call_later(
+            delay, self._resubmit_deferred, task_id, priority, cookies
+        )
+        self.deferred_tasks[task_id] = handle
+
+    def _launch_download(
+        self, task_id: str, cookies: Optional[str] = None
+    ) -> asyncio.Task:
+        """
+        调度器分配到名额后启动下载
+        Args:
+            task_id: 任务ID
+            cookies: Cookie字符串
+        Returns:
+            下载协程
+        """
         # 创建下载任务 - 传递task_id而不是task对象和db对象
+        cancel_token = CancelToken()
         download_task = asyncio.create_task(
-            self._download_task_wrapper(task_id, cookies)
+            self._download_task_wrapper(task_id, cookies, cancel_token)
         )
         self.active_tasks[task_id] = download_task
+        self.cancel_tokens[task_id] = cancel_token
+        return download_task
 
-    async def _download_task_wrapper(self, task_id: str, cookies: Optional[str] = None):
+    async def _download_task_wrapper(
+        self,
+        task_id: str,
+        cookies: Optional[str] = None,
+        cancel_token: Optional[CancelToken] = None,
+    ):
         """
         下载任务包装器 - 创建独立的数据库会话
         """
@@ -117,81 +590,472 @@ class TaskManager:
 
         # 创建新的数据库会话
         db = SessionLocal()
+        cancel_token = cancel_token or CancelToken()
         try:
             # 查询任务
-            task = db.query(DownloadTask).filter(DownloadTask.task_id == task_id).first()
+            task = (
+                db.query(DownloadTask).filter(DownloadTask.task_id == task_id).first()
+            )
             if not task:
                 logger.error(f"任务不存在: {task_id}")
                 return
 
+            # 下载进程已在领取时取得租约;API进程在这里领取,其他进程已开始下载同一任务时跳过
+            claimed = (
+                task.status == TaskStatus.DOWNLOADING
+                and task.worker_id == self.worker_id
+            )
+
+            # 未到预定时间、不在下载时段内,或上次使用的CDN主机熔断中时推迟,不占用下载名额也不消耗重试次数
+            if claimed or task.status == TaskStatus.PENDING:
+                release_at = self._release_time(task)
+                if release_at > datetime.now():
+                    self._defer_task(
+                        db,
+                        task,
+                        release_at,
+                        cookies,
+                        f"预定 {release_at:%m-%d %H:%M} 开始下载",
+                    )
+                    return
+                delay = (
+                    self.downloader.breaker.retry_after(task.cdn_host)
+                    if task.cdn_host
+                    else 0
+                )
+                if delay > 0:
+                    self._defer_task(
+                        db, task, datetime.now() + timedelta(seconds=delay), cookies
+                    )
+                    return
+
+            if not claimed and not (
+                task.status == TaskStatus.PENDING and self._acquire_lease(db, task_id)
+            ):
+                # 排队期间已被停止/暂停,或已被其他进程领取
+                logger.info(f"任务已不在等待状态,跳过: {task_id}")
+                return
+            db.refresh(task)
+            self.leased_tasks.add(task_id)
+
+            # 下载时段结束时暂停,下个时段继续
+            if task.download_window:
+                closing = DownloadWindow.parse(task.download_window).next_close(
+                    datetime.now()
+                )
+                self.window_timers[task_id] = asyncio.get_running_loop().call_later(
+                    (closing - datetime.now()).total_seconds(),
+                    self._close_window,
+                    task_id,
+                    closing,
+                    cookies,
+                )
+
             # 执行下载
-            await self._download_task(db, task, cookies)
+            await self._download_task(db, task, cookies, cancel_token)
         finally:
             db.close()
+            # 从活动任务中移除(任务可能已被停止后重新启动,只移除本次下载的记录)
+            if self.cancel_tokens.get(task_id) is cancel_token:
+                self.cancel_tokens.pop(task_id, None)
+                self.active_tasks.pop(task_id, None)
+                self.speed_estimators.pop(task_id, None)
+                self.live_state.remove(task_id)
+                self.leased_tasks.discard(task_id)
+                window_timer = self.window_timers.pop(task_id, None)
+                if window_timer:
+                    window_timer.cancel()
+
+    def _lease_deadline(self) -> datetime:
+        return datetime.now() + timedelta(seconds=settings.LEASE_TTL)
+
+    def _acquire_lease(self, db: Session, task_id: str) -> bool:
+        """
+        领取排队中的任务: 条件更新,其他进程已领取时影响行数为0
+        Returns:
+            是否领取成功
+        """
+        values = {
+            "status": TaskStatus.DOWNLOADING,
+            "worker_id": self.worker_id,
+            "lease_expires_at": self._lease_deadline(),
+            "started_at": datetime.now(),
+        }
+        result = db.execute(
+            update(DownloadTask)
+            .where(
+                DownloadTask.task_id == task_id,
+                DownloadTask.status == TaskStatus.PENDING,
+            )
+            .values(**values)
+        )
+        db.commit()
+        if not result.rowcount:
+            return False
+        self._tasks_updated([task_id], values)
+        return True
+
+    def _tasks_updated(self, task_ids: List[str], values: Dict[str, Any]):
+        """
+        条件更新不经过会话的修改跟踪,单独让读缓存失效并发出状态变化
+        Args:
+            task_ids: 被更新的任务ID列表
+            values: 更新的字段
+        """
+        if not task_ids:
+            return
+        self.live_state.invalidate()
+        for task_id in task_ids:
+            self.events.publish(task_id, values)
 
-    async def _download_task(self, db: Session, task: DownloadTask, cookies: Optional[str] = None):
+    async def _download_task(
+        self,
+        db: Session,
+        task: DownloadTask,
+        cookies: Optional[str] = None,
+        cancel_token: Optional[CancelToken] = None,
+    ):
         """
         执行下载任务
         """
+        cancel_token = cancel_token or CancelToken()
+        shared: Optional[SharedDownload] = None
+        shared_result = None
         try:
+            if task.title is None:
+                # 后台补全尚未完成,先获取视频信息(获取下载链接时复用解析结果)
+                self._apply_video_info(
+                    task, await self._resolve_video_info(task.video_url)
+                )
+                db.commit()
+
+            # 构建文件路径
+            safe_title = "".join(
+                c for c in task.title if c.isalnum() or c in (" ", "-", "_")
+            ).strip()
+            # 文件名带画质和任务ID,同一视频的多个任务各自有独立的文件和临时文件
+            file_name = (
+                f"{safe_title}_{task.video_id}_{task.quality.value}"
+                f"_{task.task_id[:8]}.mp4"
+            )
+            file_path = os.path.join(settings.DOWNLOAD_DIR, file_name)
+
+            task.file_path = file_path
+            task.temp_path = f"{file_path}.tmp"
+            task.error_message = None
+            db.commit()
+
+            # 已下载过同一视频和画质时直接从去重存储链接,不再请求网络
+            if settings.CONTENT_STORE_ENABLED:
+                stored = self.content_store.lookup(db, task.video_id, task.quality)
+                if stored:
+                    await self.content_store.materialize(db, stored, file_path)
+                    task.downloaded_size = stored.size
+                    task.total_size = stored.size
+                    task.content_hash = stored.content_hash
+                    task.status = TaskStatus.COMPLETED
+                    task.completed_at = datetime.now()
+                    task.progress = 100.0
+                    db.commit()
+                    return
+
+            # 其他任务正在下载同一视频和画质时等待其结果,共用一个下载连接
+            if task.video_id:
+                key = (task.video_id, task.quality)
+                while key in self.shared_downloads:
+                    if await self._follow_download(
+                        db, task, self.shared_downloads[key]
+                    ):
+                        return
+                shared = SharedDownload(
+                    key, task.task_id, asyncio.get_running_loop().create_future()
+                )
+                self.shared_downloads[key] = shared
+
             # 设置Cookie
             if cookies:
                 self.xhs_api.set_cookies(cookies)
 
-            # 获取下载链接
-            download_url = await self.xhs_api.get_download_url(
-                task.video_id or task.video_url,
-                task.quality.value
+            # 获取下载链接(masterUrl及其backupUrls镜像)
+            download_urls = await self.xhs_api.get_download_urls(
+                task.video_id or task.video_url, task.quality.value
             )
 
-            if not download_url:
+            if not download_urls:
                 raise ValueError("无法获取下载链接")
-
-            # 构建文件路径
-            safe_title = "".join(c for c in task.title if c.isalnum() or c in (' ', '-', '_')).strip()
-            file_name = f"{safe_title}_{task.video_id}.mp4"
-            file_path = os.path.join(settings.DOWNLOAD_DIR, file_name)
-
-            task.file_path = file_path
-            db.commit()
+            task.cdn_host = urlsplit(download_urls[0]).netloc
 
             # 进度回调
+            speed_estimator = SpeedEstimator()
+            self.speed_estimators[task.task_id] = speed_estimator
+
             async def progress_callback(downloaded, total, speed):
                 task.downloaded_size = downloaded
                 task.total_size = total
                 task.speed = speed / 1024  # 转换为KB/s
+                task.eta = (
+                    speed_estimator.eta(total - downloaded) if total > 0 else None
+                )
                 task.progress = (downloaded / total * 100) if total > 0 else 0
+                # 读接口直接使用内存中的进度,数据库由缓冲区定时批量写入
+                fields = {
+                    "downloaded_size": task.downloaded_size,
+                    "total_size": task.total_size,
+                    "speed": task.speed,
+                    "eta": task.eta,
+                    "progress": task.progress,
+                }
+                self.live_state.update(task.task_id, **fields)
+                self.progress_buffer.update(task.task_id, **fields)
+                self.events.publish(task.task_id, fields)
+                # 等待本次下载的任务显示相同的进度
+                for follower_id in (shared.followers if shared else ()):
+                    self.live_state.update(follower_id, **fields)
+                    self.progress_buffer.update(follower_id, **fields)
+                    self.events.publish(follower_id, fields)
+
+            # 完成回调: 记录校验后的文件大小和SHA-256
+            async def complete_callback(size, content_hash):
+                task.downloaded_size = size
+                task.total_size = size
+                task.content_hash = content_hash
+
+            # 出错时记录重试次数,进程重启后继续累计(下载有进展时由下载器重新计算)
+            async def error_callback(retry_count, error):
+                task.retry_count = retry_count
+                task.error_message = str(error)
                 db.commit()
 
+            # 签名链接过期时重新获取,下载从已有进度继续
+            async def url_resolver():
+                return await self.xhs_api.get_download_urls(
+                    task.video_id or task.video_url,
+                    task.quality.value,
+                    use_cache=False,
+                )
+
             # 开始下载
             success = await self.downloader.download_video(
-                url=download_url,
+                url=download_urls[0],
                 file_path=file_path,
                 progress_callback=progress_callback,
                 resume=True,
+                task_key=task.task_id,
+                cancel_token=cancel_token,
+                complete_callback=complete_callback,
+                url_resolver=url_resolver,
+                mirror_urls=download_urls[1:],
+                speed_estimator=speed_estimator,
+                retry_count=task.retry_count or 0,
+                error_callback=error_callback,
             )
 
+            if cancel_token.cancelled:
+                # 已被停止/暂停,状态由对应操作写入
+                return
+
+            # 最新进度随最终状态一起写入
+            self.progress_buffer.pop(task.task_id)
+
             if success:
                 task.status = TaskStatus.COMPLETED
                 task.completed_at = datetime.now()
                 task.progress = 100.0
+                task.eta = 0.0
+
+                if settings.CONTENT_STORE_ENABLED:
+                    # 先提交完成状态,存入存储时的写入冲突回滚不影响任务
+                    db.commit()
+                    await self.content_store.ingest(
+                        db,
+                        task.video_id,
+                        task.quality,
+                        file_path,
+                        task.content_hash,
+                        task.total_size,
+                    )
+                shared_result = {
+                    "file_path": file_path,
+                    "size": task.total_size,
+                    "content_hash": task.content_hash,
+                }
             else:
                 task.status = TaskStatus.FAILED
-                task.error_message = "下载失败"
+                task.error_message = task.error_message or "下载失败"
+                # 链接可能已失效,重试时重新解析
+                self.xhs_api.url_cache.invalidate(
+                    task.video_id or task.video_url, task.quality.value
+                )
 
             db.commit()
 
+        except HostUnavailableError as e:
+            logger.warning(f"{e}: {task.task_id}")
+            self.progress_buffer.pop(task.task_id)
+            task.cdn_host = e.host
+            self._defer_task(
+                db, task, datetime.now() + timedelta(seconds=e.retry_after), cookies
+            )
+
         except Exception as e:
             logger.error(f"下载任务失败: {e}")
+            self.progress_buffer.pop(task.task_id)
             task.status = TaskStatus.FAILED
             task.error_message = str(e)
             task.retry_count += 1
             db.commit()
+        finally:
+            if shared is not None:
+                self._release_shared(shared, shared_result)
+
+    def _defer_task(
+        self,
+        db: Session,
+        task: DownloadTask,
+        release_at: datetime,
+        cookies: Optional[str] = None,
+        reason: Optional[str] = None,
+    ):
+        """
+        把任务放回队列,到release_at再开始(CDN主机熔断、未到预定时间或下载时段)
+        入队时间设为到期时间,下载进程领取时跳过未到期的任务
+        Args:
+            db: 数据库会话
+            task: 任务
+            release_at: 可以再次开始的时间
+            cookies: Cookie字符串
+            reason: 显示在任务上的原因,默认为CDN主机不可用
+        """
+        delay = (release_at - datetime.now()).total_seconds()
+        task.status = TaskStatus.PENDING
+        task.speed = 0.0
+        task.eta = None
+        task.queued_at = release_at
+        self._hold_queued(task)
+        task.error_message = reason or f"CDN主机暂时不可用,{delay:.0f}秒后重试"
+        db.commit()
+        logger.info(f"任务推迟 {delay:.0f} 秒: {task.task_id}")
+
+        self._dispatch(task.task_id, task.priority or 0, cookies, task.queued_at)
+
+    def _close_window(
+        self, task_id: str, closing: datetime, cookies: Optional[str] = None
+    ):
+        """
+        下载时段结束: 停止下载(保留临时文件),任务放回队列,下个时段开始时断点续传
+        Args:
+            task_id: 任务ID
+            closing: 下载时段的结束时间
+            cookies: Cookie字符串
+        """
+        from ..database import SessionLocal
+
+        self.window_timers.pop(task_id, None)
+        if task_id not in self.leased_tasks:
+            return
+
+        db = SessionLocal()
+        try:
+            task = (
+                db.query(DownloadTask).filter(DownloadTask.task_id == task_id).first()
+            )
+            if not task or task.status != TaskStatus.DOWNLOADING:
+                return
 
+            self._cancel_download(task_id)
+            self._apply_pending_progress(task)
+            # 定时器可能比时钟略早触发,从时段结束时间起计算下个时段
+            release_at = self._release_time(task, after=max(datetime.now(), closing))
+            logger.info(f"下载时段已结束,暂停下载: {task_id}")
+            self._defer_task(
+                db,
+                task,
+                release_at,
+                cookies,
+                f"下载时段已结束,{release_at:%m-%d %H:%M}继续",
+            )
         finally:
-            # 从活动任务中移除
-            if task.task_id in self.active_tasks:
-                del self.active_tasks[task.task_id]
+            db.close()
+
+    def _resubmit_deferred(self, task_id: str, priority: int, cookies: Optional[str]):
+        """推迟到期,重新入队(期间被停止/暂停时在开始下载前跳过)"""
+        self.deferred_tasks.pop(task_id, None)
+        if task_id not in self.active_tasks and not self.scheduler.is_queued(task_id):
+            self.scheduler.submit(task_id, priority, cookies)
+
+    async def _follow_download(
+        self, db: Session, task: DownloadTask, shared: SharedDownload
+    ) -> bool:
+        """
+        等待同一视频和画质的下载完成,从它的文件创建本任务自己的文件(路径按任务区分)
+        Args:
+            db: 数据库会话
+            task: 等待的任务
+            shared: 进行中的下载
+        Returns:
+            是否已完成;对方下载失败或被取消时返回False,由调用方自行下载
+        """
+        logger.info(f"等待相同视频的下载: {task.task_id} -> {shared.leader_id}")
+        # 等待期间不占用下载名额,名额分给排队的任务
+        download_task = asyncio.current_task()
+        released = self.scheduler.release(download_task)
+        self.parked_tasks.add(task.task_id)
+        shared.followers.add(task.task_id)
+        try:
+            result = await asyncio.shield(shared.result)
+        finally:
+            shared.followers.discard(task.task_id)
+            self.parked_tasks.discard(task.task_id)
+
+        if result is None:
+            # 对方失败或被取消,重新占用名额后由本任务自行下载
+            if released:
+                await self.scheduler.reacquire(download_task)
+            return False
+
+        await self.content_store.link(result["file_path"], task.file_path)
+        self.progress_buffer.pop(task.task_id)
+        task.downloaded_size = result["size"]
+        task.total_size = result["size"]
+        task.content_hash = result["content_hash"]
+        task.status = TaskStatus.COMPLETED
+        task.completed_at = datetime.now()
+        task.progress = 100.0
+        task.eta = 0.0
+        db.commit()
+        return True
+
+    def _release_shared(self, shared: SharedDownload, result: Optional[dict]):
+        """下载结束,通知等待的任务"""
+        if self.shared_downloads.get(shared.key) is shared:
+            del self.shared_downloads[shared.key]
+        if not shared.result.done():
+            shared.result.set_result(result)
+
+    def _cancel_download(self, task_id: str):
+        """
+        停止指定任务的下载(或将其移出等待队列),不影响其他任务
+        Args:
+            task_id: 任务ID
+        """
+        self.scheduler.remove(task_id)
+        deferred = self.deferred_tasks.pop(task_id, None)
+        if deferred:
+            deferred.cancel()
+        window_timer = self.window_timers.pop(task_id, None)
+        if window_timer:
+            window_timer.cancel()
+
+        cancel_token = self.cancel_tokens.pop(task_id, None)
+        if cancel_token:
+            cancel_token.cancel()
+
+        download_task = self.active_tasks.pop(task_id, None)
+        if download_task:
+            download_task.cancel()
+        self.speed_estimators.pop(task_id, None)
+        self.live_state.remove(task_id)
+        self.leased_tasks.discard(task_id)
 
     async def stop_task(self, db: Session, task_id: str):
         """
@@ -204,15 +1068,15 @@ class TaskManager:
         if not task:
             raise ValueError(f"任务不存在: {task_id}")
 
-        # 停止下载
-        self.downloader.stop_download()
+        # 由其他进程下载时,由该进程停止下载并写入状态
+        if self._send_command(db, task, "stop"):
+            return
 
-        # 取消异步任务
-        if task_id in self.active_tasks:
-            self.active_tasks[task_id].cancel()
-            del self.active_tasks[task_id]
+        # 停止下载
+        self._cancel_download(task_id)
 
         # 更新状态
+        self._apply_pending_progress(task)
         task.status = TaskStatus.STOPPED
         db.commit()
 
@@ -227,17 +1091,100 @@ class TaskManager:
         if not task:
             raise ValueError(f"任务不存在: {task_id}")
 
-        # 停止下载但保留临时文件
-        self.downloader.stop_download()
+        if self._send_command(db, task, "pause"):
+            return
 
-        if task_id in self.active_tasks:
-            self.active_tasks[task_id].cancel()
-            del self.active_tasks[task_id]
+        # 停止下载但保留临时文件
+        self._cancel_download(task_id)
 
+        self._apply_pending_progress(task)
         task.status = TaskStatus.PAUSED
         db.commit()
 
-    async def resume_task(self, db: Session, task_id: str, cookies: Optional[str] = None):
+    def _send_command(self, db: Session, task: DownloadTask, command: str) -> bool:
+        """
+        任务正由其他进程下载且租约未过期时,写入发给该进程的控制命令
+        租约已过期(进程已退出)时由调用方直接修改状态
+        Args:
+            db: 数据库会话
+            task: 任务
+            command: stop/pause/delete
+        Returns:
+            是否已发送命令
+        """
+        if (
+            task.status != TaskStatus.DOWNLOADING
+            or not task.worker_id
+            or task.worker_id == self.worker_id
+        ):
+            return False
+        if not task.lease_expires_at or task.lease_expires_at <= datetime.now():
+            return False
+
+        db.add(
+            TaskCommand(task_id=task.task_id, worker_id=task.worker_id, command=command)
+        )
+        db.commit()
+        logger.info(f"已向 {task.worker_id} 发送控制命令 {command}: {task.task_id}")
+        return True
+
+    async def _handle_commands(self):
+        """执行发给本进程的控制命令"""
+        from ..database import SessionLocal
+
+        commands = await asyncio.to_thread(self._take_commands)
+        if not commands:
+            return
+
+        db = SessionLocal()
+        try:
+            for task_id, command in commands:
+                # 删除命令在下载结束后仍要执行
+                if command == "delete":
+                    self.delete_task(db, task_id)
+                    continue
+                # 命令到达前下载可能已经结束
+                if task_id not in self.active_tasks:
+                    continue
+                logger.info(f"执行控制命令 {command}: {task_id}")
+                try:
+                    if command == "pause":
+                        await self.pause_task(db, task_id)
+                    else:
+                        await self.stop_task(db, task_id)
+                except ValueError as e:
+                    logger.warning(f"执行控制命令失败: {e}")
+        finally:
+            db.close()
+
+    def _take_commands(self) -> List[Tuple[str, str]]:
+        """取出并删除发给本进程的命令"""
+        from ..database import SessionLocal
+
+        db = SessionLocal()
+        try:
+            commands = (
+                db.query(TaskCommand)
+                .filter(TaskCommand.worker_id == self.worker_id)
+                .order_by(TaskCommand.id)
+                .all()
+            )
+            result = [(command.task_id, command.command) for command in commands]
+            for command in commands:
+                db.delete(command)
+            db.commit()
+            return result
+        finally:
+            db.close()
+
+    def _apply_pending_progress(self, task: DownloadTask):
+        """把缓冲中尚未写入的进度合并到任务上,随状态变更一起提交"""
+        for name, value in self.progress_buffer.pop(task.task_id).items():
+            setattr(task, name, value)
+
+    async def resume_task(
+        self, db: Session, task_id: str, cookies: Optional[str] = None
+    ):
         """
         恢复下载任务
         Args:
@@ -254,9 +1201,20 @@ class TaskManager:
 
         await self.start_task(db, task_id, cookies)
 
-    def get_task(self, db: Session, task_id: str) -> Optional[DownloadTask]:
-        """获取任务"""
-        return db.query(DownloadTask).filter(DownloadTask.task_id == task_id).first()
+    def get_task(self, db: Session, task_id: str) -> Optional[schemas.DownloadTask]:
+        """
+        获取任务,合并内存中的实时进度和排队位置
+        任务记录没有变化时使用缓存,不查询数据库
+        """
+        key = ("task", task_id)
+        task = self.live_state.cached(key)
+        if task is None:
+            row = db.query(DownloadTask).filter(DownloadTask.task_id == task_id).first()
+            if not row:
+                return None
+            task = schemas.DownloadTask.model_validate(row)
+            self.live_state.store(key, task)
+        return self._merge_live_state([task])[0]
 
     def get_tasks(
         self,
@@ -264,9 +1222,10 @@ class TaskManager:
         status: Optional[TaskStatus] = None,
         skip: int = 0,
         limit: int = 100,
-    ) -> List[DownloadTask]:
+    ) -> List[schemas.DownloadTask]:
         """
-        获取任务列表
+        获取任务列表,合并内存中的实时进度和排队位置
+        任务记录没有变化时使用缓存,不查询数据库
         Args:
             db: 数据库会话
             status: 任务状态过滤
@@ -275,10 +1234,124 @@ class TaskManager:
         Returns:
             任务列表
         """
-        query = db.query(DownloadTask)
-        if status:
-            query = query.filter(DownloadTask.status == status)
-        return query.order_by(DownloadTask.created_at.desc()).offset(skip).limit(limit).all()
+        key = ("tasks", status, skip, limit)
+        tasks = self.live_state.cached(key)
+        if tasks is None:
+            query = db.query(DownloadTask)
+            if status:
+                query = query.filter(DownloadTask.status == status)
+            rows = (
+                query.order_by(DownloadTask.created_at.desc())
+                .offset(skip)
+                .limit(limit)
+                .all()
+            )
+            tasks = [schemas.DownloadTask.model_validate(row) for row in rows]
+            self.live_state.store(key, tasks)
+        return self._merge_live_state(tasks)
+
+    def _merge_live_state(
+        self, tasks: List[schemas.DownloadTask]
+    ) -> List[schemas.DownloadTask]:
+        """
+        合并实时状态: 下载中任务的进度、按当前速度重新计算的速度和剩余时间,以及排队位置(从1开始)
+        """
+        positions = self._queue_positions()
+        merged = []
+        for task in tasks:
+            extra = {"queue_position": positions.get(task.task_id)}
+            estimator = self.speed_estimators.get(task.task_id)
+            if estimator is not None:
+                live = {
+                    **task.model_dump(include={"downloaded_size", "total_size"}),
+                    **self.live_state.get(task.task_id),
+                }
+                extra["speed"] = estimator.speed / 1024  # 转换为KB/s
+                if live["total_size"]:
+                    extra["eta"] = estimator.eta(
+                        live["total_size"] - live["downloaded_size"]
+                    )
+            merged.append(self.live_state.merge(task, **extra))
+        return merged
+
+    def _queue_positions(self) -> Dict[str, int]:
+        """排队任务的位置(从1开始),没有排队的任务时不排序"""
+        return self.scheduler.positions() if self.scheduler.queued_count else {}
+
+    async def set_priority(
+        self, db: Session, task_id: str, priority: int
+    ) -> schemas.DownloadTask:
+        """
+        调整任务优先级,排队中的任务立即按新优先级重新排序
+        Args:
+            db: 数据库会话
+            task_id: 任务ID
+            priority: 优先级,数值大的先下载
+        Returns:
+            任务
+        """
+        task = db.query(DownloadTask).filter(DownloadTask.task_id == task_id).first()
+        if not task:
+            raise ValueError(f"任务不存在: {task_id}")
+
+        task.priority = priority
+        db.commit()
+        self.scheduler.reprioritize(task_id, priority)
+        return self.get_task(db, task_id)
+
+    def set_concurrency(self, concurrency: int):
+        """
+        运行时调整最大并发下载数
+        Args:
+            concurrency: 最大并发下载数
+        """
+        self.scheduler.set_concurrency(concurrency)
+
+    def get_scheduler_stats(self) -> dict:
+        """调度状态: 并发上限、下载中和排队中的任务数、下载中任务的合计速度(字节/秒),以及共用下载连接的任务数"""
+        return {
+            "max_concurrent_downloads": self.scheduler.concurrency,
+            "running": self.scheduler.running_count,
+            "queued": self.scheduler.queued_count,
+            "shared_downloads": len(self.shared_downloads),
+            "attached_tasks": sum(
+                len(shared.followers) for shared in self.shared_downloads.values()
+            ),
+            "speed": sum(
+                estimator.speed for estimator in self.speed_estimators.values()
+            ),
+        }
+
+    def _snapshot_tasks(self, task_ids: Iterable[str]) -> Dict[str, dict]:
+        """
+        读取进行中任务和指定任务的状态,由其他进程下载时用于推送任务变化
+        Args:
+            task_ids: 上次读取时进行中的任务ID
+        Returns:
+            任务ID -> 字段
+        """
+        from ..database import SessionLocal
+
+        columns = [
+            DownloadTask.task_id,
+            DownloadTask.status,
+            DownloadTask.progress,
+            DownloadTask.downloaded_size,
+            DownloadTask.total_size,
+            DownloadTask.speed,
+            DownloadTask.eta,
+            DownloadTask.error_message,
+        ]
+        db = SessionLocal()
+        try:
+            condition = DownloadTask.status.in_(ACTIVE_STATUSES)
+            task_ids = list(task_ids)
+            if task_ids:
+                condition = or_(condition, DownloadTask.task_id.in_(task_ids))
+            rows = db.query(*columns).filter(condition).all()
+            return {row.task_id: dict(row._mapping) for row in rows}
+        finally:
+            db.close()
 
     def delete_task(self, db: Session, task_id: str) -> bool:
         """
@@ -293,30 +1366,52 @@ class TaskManager:
         if not task:
             return False
 
-        # 如果正在下载,先停止
-        if task.status == TaskStatus.DOWNLOADING and task_id in self.active_tasks:
-            self.downloader.stop_download()
-            self.active_tasks[task_id].cancel()
-            del self.active_tasks[task_id]
+        # 由其他进程下载时,由该进程停止下载、清理临时文件后删除任务记录
+        if self._send_command(db, task, "delete"):
+            return True
 
-        # 删除文件
-        if task.file_path and os.path.exists(task.file_path):
-            try:
-                os.remove(task.file_path)
-            except Exception as e:
-                logger.error(f"删除文件失败: {e}")
+        # 如果正在下载或排队,先停止
+        self._cancel_download(task_id)
+        self._remove_task(db, task)
+        return True
 
-        # 清理临时文件
-        if task.temp_path:
-            self.downloader.clean_temp_files(task.temp_path)
+    def _remove_task(self, db: Session, task: DownloadTask):
+        """
+        删除已停止下载的任务的文件、临时文件和任务记录
+        Args:
+            db: 数据库会话
+            task: 任务
+        """
+        # 删除文件和临时文件
+        if task.file_path and not self._path_in_use(db, task):
+            if os.path.exists(task.file_path):
+                try:
+                    os.remove(task.file_path)
+                except Exception as e:
+                    logger.error(f"删除文件失败: {e}")
+            self.downloader.clean_temp_files(task.file_path)
 
-        # 删除任务记录
+        # 删除任务记录,没有其他任务引用同一内容时回收去重存储中的文件
+        content_hash = task.content_hash
         db.delete(task)
         db.commit()
+        self.content_store.release(db, content_hash)
 
-        return True
+    def _path_in_use(self, db: Session, task: DownloadTask) -> bool:
+        """旧版本的文件名不含画质和任务ID,同一视频的任务可能共用一个文件,删除时需要保留"""
+        return (
+            db.query(DownloadTask.id)
+            .filter(
+                DownloadTask.file_path == task.file_path,
+                DownloadTask.task_id != task.task_id,
+            )
+            .first()
+            is not None
+        )
 
-    async def retry_task(self, db: Session, task_id: str, cookies: Optional[str] = None):
+    async def retry_task(
+        self, db: Session, task_id: str, cookies: Optional[str] = None
+    ):
         """
         重试失败的任务
         Args:
@@ -331,14 +1426,480 @@ class TaskManager:
         if task.status != TaskStatus.FAILED:
             raise ValueError(f"任务未失败,无法重试: {task_id}")
 
-        # 重置任务状态
-        task.status = TaskStatus.PENDING
+        # 重置任务状态,重试次数和中断次数清零(由start_task重新入队)
         task.error_message = None
+        task.retry_count = 0
+        task.recovery_count = 0
         db.commit()
 
         # 重新开始下载
         await self.start_task(db, task_id, cookies)
 
+    async def recover_tasks(self, startup: bool = True):
+        """
+        恢复未完成的任务
+        下载中的任务按临时文件核对进度后重新排队续传,排队中的任务重新入队;
+        被中断超过RECOVERY_MAX_RETRIES次的任务标记为失败。
+        下载进程恢复的任务放回数据库队列,由poll_queue领取
+        Args:
+            startup: 是否为启动时的恢复;否则只接管租约已过期的任务
+        """
+        if not self.is_worker and not settings.EMBEDDED_WORKER:
+            # 下载由下载进程负责
+            return
+
+        try:
+            # 数据库和文件检查在线程中执行,不阻塞事件循环
+            recovered, cookies = await asyncio.to_thread(
+                self._reconcile_interrupted_tasks, startup
+            )
+        except Exception as e:
+            logger.error(f"恢复未完成任务失败: {e}")
+            return
+
+        if self.is_worker:
+            recovered = []
+
+        for task_id, priority in recovered:
+            if task_id in self.active_tasks or self.scheduler.is_queued(task_id):
+                continue
+            self.scheduler.submit(task_id, priority, cookies)
+
+        if recovered:
+            logger.info(f"已恢复 {len(recovered)} 个未完成任务")
+
+    def _reconcile_interrupted_tasks(self, startup: bool = True):
+        """
+        核对未完成任务的状态和临时文件
+        租约已过期的下载中任务(下载进程已退出)总是恢复;启动时还恢复本进程上次领取的任务;
+        API进程还接管没有存活所有者的排队任务(所有者已退出、租约过期,或已被放回队列),
+        定时接管时只接管已到开始时间的
+        Args:
+            startup: 是否为启动时的恢复
+        Returns:
+            ([(任务ID, 优先级), ...], 最近一次有效登录的Cookie)
+        """
+        from ..database import SessionLocal
+
+        db = SessionLocal()
+        try:
+            now = datetime.now()
+            lease_free = or_(
+                DownloadTask.lease_expires_at.is_(None),
+                DownloadTask.lease_expires_at < now,
+            )
+            conditions = [
+                and_(DownloadTask.status == TaskStatus.DOWNLOADING, lease_free)
+            ]
+            if startup:
+                conditions.append(
+                    and_(
+                        DownloadTask.status == TaskStatus.DOWNLOADING,
+                        DownloadTask.worker_id == self.worker_id,
+                    )
+                )
+            if not self.is_worker:
+                queued = [
+                    DownloadTask.status == TaskStatus.PENDING,
+                    DownloadTask.queued_at.isnot(None),
+                    lease_free,
+                ]
+                if not startup:
+                    queued.append(DownloadTask.queued_at <= now)
+                conditions.append(and_(*queued))
+            tasks = (
+                db.query(DownloadTask)
+                .filter(or_(*conditions))
+                .order_by(DownloadTask.queued_at)
+                .all()
+            )
+
+            # 下载进程退出前没来得及执行的停止/暂停/删除命令
+            commands = (
+                dict(
+                    db.query(TaskCommand.task_id, TaskCommand.command)
+                    .filter(TaskCommand.task_id.in_([task.task_id for task in tasks]))
+                    .order_by(TaskCommand.id)
+                    .all()
+                )
+                if tasks
+                else {}
+            )
+
+            recovered = []
+            for task in tasks:
+                if (
+                    task.task_id in self.active_tasks
+                    or self.scheduler.is_queued(task.task_id)
+                    or task.task_id in self.deferred_tasks
+                ):
+                    continue
+
+                if task.status == TaskStatus.PENDING:
+                    # 条件更新,多个进程同时接管时只有一个成功
+                    adopted = db.execute(
+                        update(DownloadTask)
+                        .where(
+                            DownloadTask.task_id == task.task_id,
+                            DownloadTask.status == TaskStatus.PENDING,
+                            lease_free,
+                        )
+                        .values(
+                            worker_id=self.worker_id,
+                            lease_expires_at=self._lease_deadline(),
+                        )
+                    )
+                    if adopted.rowcount:
+                        if task.worker_id and task.worker_id != self.worker_id:
+                            logger.info(
+                                f"接管排队中的任务: {task.task_id} ({task.worker_id})"
+                            )
+                        recovered.append((task.task_id, task.priority or 0))
+                    continue
+
+                if task.status == TaskStatus.DOWNLOADING:
+                    if task.worker_id and task.worker_id != self.worker_id:
+                        logger.info(
+                            f"接管租约过期的任务: {task.task_id} ({task.worker_id})"
+                        )
+
+                    # 进程退出前没来得及执行的删除命令
+                    if commands.get(task.task_id) == "delete":
+                        self._remove_task(db, task)
+                        continue
+
+                    if self._reconcile_files(task):
+                        continue
+
+                    if task.task_id in commands:
+                        task.status = (
+                            TaskStatus.PAUSED
+                            if commands[task.task_id] == "pause"
+                            else TaskStatus.STOPPED
+                        )
+                        task.speed = 0.0
+                        task.eta = None
+                        continue
+
+                    task.recovery_count = (task.recovery_count or 0) + 1
+                    if task.recovery_count > settings.RECOVERY_MAX_RETRIES:
+                        task.status = TaskStatus.FAILED
+                        task.error_message = "下载多次被中断,已停止自动恢复"
+                        logger.warning(f"任务多次被中断,标记为失败: {task.task_id}")
+                        continue
+
+                task.status = TaskStatus.PENDING
+                task.speed = 0.0
+                task.eta = None
+                self._hold_queued(task)
+                recovered.append((task.task_id, task.priority or 0))
+
+            if commands:
+                db.query(TaskCommand).filter(
+                    TaskCommand.task_id.in_(list(commands))
+                ).delete(synchronize_session=False)
+            db.commit()
+
+            return recovered, self._latest_cookies(db)
+        finally:
+            db.close()
+
+    def _latest_cookies(self, db: Session) -> Optional[str]:
+        """最近一次有效登录的Cookie"""
+        auth = (
+            db.query(UserAuth)
+            .filter(UserAuth.is_valid == 1)
+            .order_by(UserAuth.updated_at.desc())
+            .first()
+        )
+        return auth.cookies if auth else None
+
+    def start_control_loop(self, concurrency: Optional[int] = None):
+        """
+        启动后台控制循环: 执行发给本进程的命令、续期下载租约、接管租约过期的任务,
+        下载进程还从数据库队列中领取任务
+        Args:
+            concurrency: 下载进程的最大并发下载数
+        """
+        self.live_state.watch()
+        self.events.watch()
+        if self._control_loop is None or self._control_loop.done():
+            self._control_loop = asyncio.create_task(
+                self._run_control_loop(concurrency)
+            )
+
+    async def _run_control_loop(self, concurrency: Optional[int]):
+        while True:
+            try:
+                await self._control_cycle()
+                if self.is_worker:
+                    await self.poll_queue(
+                        concurrency or settings.MAX_CONCURRENT_DOWNLOADS
+                    )
+            except Exception as e:
+                logger.error(f"控制循环执行失败: {e}")
+            await asyncio.sleep(settings.WORKER_POLL_INTERVAL)
+
+    async def _control_cycle(self):
+        """执行一轮控制: 命令 -> 停止已不属于本进程的下载 -> 续期租约并接管过期租约"""
+        await self._handle_commands()
+
+        if self.leased_tasks:
+            revoked = await asyncio.to_thread(
+                self._find_revoked_tasks, list(self.leased_tasks)
+            )
+            for task_id in revoked:
+                logger.info(f"任务已不再由本进程下载,停止: {task_id}")
+                self._cancel_download(task_id)
+
+        if time.monotonic() - self._last_heartbeat >= settings.LEASE_HEARTBEAT_INTERVAL:
+            self._last_heartbeat = time.monotonic()
+            queued = [*self.scheduler.queued_ids(), *self.deferred_tasks]
+            if self.leased_tasks or queued:
+                await asyncio.to_thread(
+                    self._renew_leases, list(self.leased_tasks), queued
+                )
+            await self.recover_tasks(startup=False)
+
+    def _renew_leases(self, task_ids: List[str], queued_ids: List[str]):
+        """
+        续期本进程正在下载和排队中的任务的租约(租约字段不对外展示,无需让缓存失效)
+        Args:
+            task_ids: 正在下载的任务ID
+            queued_ids: 在本进程调度器中排队或推迟的任务ID
+        """
+        from ..database import SessionLocal
+
+        db = SessionLocal()
+        try:
+            for ids, status in (
+                (task_ids, TaskStatus.DOWNLOADING),
+                (queued_ids, TaskStatus.PENDING),
+            ):
+                if not ids:
+                    continue
+                db.execute(
+                    update(DownloadTask)
+                    .where(
+                        DownloadTask.task_id.in_(ids),
+                        DownloadTask.worker_id == self.worker_id,
+                        DownloadTask.status == status,
+                    )
+                    .values(lease_expires_at=self._lease_deadline())
+                )
+            db.commit()
+        finally:
+            db.close()
+
+    async def poll_queue(self, concurrency: int):
+        """
+        下载进程: 有空闲名额时从数据库队列中领取任务
+        Args:
+            concurrency: 本进程最大并发下载数
+        """
+        free = concurrency - len(self.active_tasks) + len(self.parked_tasks)
+        if free <= 0:
+            return
+
+        claimed, cookies = await asyncio.to_thread(self._claim_tasks, free)
+        for task_id in claimed:
+            self._launch_download(task_id, cookies)
+
+    def _claim_tasks(self, limit: int):
+        """
+        按 优先级 -> 入队时间 领取排队中的任务
+        每个任务用一条条件更新领取,其他进程已领取时影响行数为0,多个进程不会领取同一任务
+        Args:
+            limit: 最多领取的数量
+        Returns:
+            (领取到的任务ID列表, 最近一次有效登录的Cookie)
+        """
+        from ..database import SessionLocal
+
+        db = SessionLocal()
+        try:
+            candidates = (
+                db.query(DownloadTask.task_id)
+                .filter(
+                    DownloadTask.status == TaskStatus.PENDING,
+                    DownloadTask.queued_at
+                    <= datetime.now(),  # 推迟的任务入队时间在未来
+                )
+                .order_by(DownloadTask.priority.desc(), DownloadTask.queued_at)
+                .limit(limit * 2)
+                .all()
+            )
+
+            claimed = []
+            values = {
+                "status": TaskStatus.DOWNLOADING,
+                "worker_id": self.worker_id,
+                "lease_expires_at": self._lease_deadline(),
+                "started_at": datetime.now(),
+            }
+            for (task_id,) in candidates:
+                if len(claimed) >= limit:
+                    break
+                result = db.execute(
+                    update(DownloadTask)
+                    .where(
+                        DownloadTask.task_id == task_id,
+                        DownloadTask.status == TaskStatus.PENDING,
+                    )
+                    .values(**values)
+                )
+                db.commit()
+                if result.rowcount:
+                    claimed.append(task_id)
+
+            if claimed:
+                logger.info(f"领取任务 {len(claimed)} 个: {claimed}")
+                self._tasks_updated(claimed, values)
+            return claimed, self._latest_cookies(db) if claimed else None
+        finally:
+            db.close()
+
+    def _find_revoked_tasks(self, task_ids: List[str]) -> List[str]:
+        """本进程正在下载、但在数据库中已不再由本进程下载的任务(被停止、删除,或租约过期后被其他进程接管)"""
+        from ..database import SessionLocal
+
+        db = SessionLocal()
+        try:
+            owners = dict(
+                db.query(DownloadTask.task_id, DownloadTask.worker_id)
+                .filter(
+                    DownloadTask.task_id.in_(task_ids),
+                    DownloadTask.status == TaskStatus.DOWNLOADING,
+                )
+                .all()
+            )
+            return [
+                task_id
+                for task_id in task_ids
+                if task_id not in owners or owners[task_id] != self.worker_id
+            ]
+        finally:
+            db.close()
+
+    def _release_claimed_tasks(self):
+        """
+        进程退出时把本进程未完成的任务放回队列,并放弃本进程排队任务的所有权,
+        由下载进程领取、其他API进程定时接管,或由重启后的进程继续
+        """
+        from ..database import SessionLocal
+
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(DownloadTask)
+                .where(
+                    DownloadTask.worker_id == self.worker_id,
+                    DownloadTask.status == TaskStatus.PENDING,
+                )
+                .values(worker_id=None, lease_expires_at=None)
+            )
+            db.commit()
+
+            owned = (
+                DownloadTask.worker_id == self.worker_id,
+                DownloadTask.status == TaskStatus.DOWNLOADING,
+            )
+            task_ids = [
+                task_id for (task_id,) in db.query(DownloadTask.task_id).filter(*owned)
+            ]
+            if not task_ids:
+                return
+            values = {
+                "status": TaskStatus.PENDING,
+                "worker_id": None,
+                "lease_expires_at": None,
+                "speed": 0.0,
+                "eta": None,
+            }
+            db.execute(
+                update(DownloadTask)
+                .where(DownloadTask.task_id.in_(task_ids), *owned)
+                .values(**values)
+            )
+            db.commit()
+            logger.info(f"已把 {len(task_ids)} 个未完成任务放回队列")
+            self._tasks_updated(task_ids, values)
+        finally:
+            db.close()
+
+    def _reconcile_files(self, task: DownloadTask) -> bool:
+        """
+        按磁盘上的文件修正被中断任务的进度
+        Returns:
+            下载是否实际已完成(重命名完成后、状态写入前退出)
+        """
+        if not task.file_path:
+            return False
+
+        temp_file = f"{task.file_path}.tmp"
+        if not os.path.exists(temp_file) and os.path.exists(task.file_path):
+            size = os.path.getsize(task.file_path)
+            if not task.total_size or size == task.total_size:
+                task.status = TaskStatus.COMPLETED
+                task.downloaded_size = size
+                task.total_size = size
+                task.progress = 100.0
+                task.speed = 0.0
+                task.eta = 0.0
+                task.completed_at = datetime.now()
+                logger.info(f"任务文件已完成,更新状态: {task.task_id}")
+                return True
+
+        task.downloaded_size = (
+            self.downloader.get_downloaded_size(task.file_path)
+            if os.path.exists(temp_file)
+            else 0
+        )
+        task.progress = (
+            (task.downloaded_size / task.total_size * 100) if task.total_size else 0
+        )
+        return False
+
+    async def shutdown(self):
+        """
+        关闭任务管理器: 取消进行中的下载,把它们放回队列,并关闭下载连接池
+        临时文件保留,重启后或由其他进程断点续传
+        """
+        if self._control_loop is not None and not self._control_loop.done():
+            self._control_loop.cancel()
+            await asyncio.gather(self._control_loop, return_exceptions=True)
+
+        self.scheduler.close()
+        for handle in (*self.deferred_tasks.values(), *self.window_timers.values()):
+            handle.cancel()
+        self.deferred_tasks.clear()
+        self.window_timers.clear()
+        tasks = list(self.active_tasks.values())
+        for task_id in list(self.active_tasks):
+            self._cancel_download(task_id)
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        await self.progress_buffer.close()
+        await asyncio.to_thread(self._release_claimed_tasks)
+        await self.client_pool.close()
+        self.live_state.unwatch()
+        self.events.unwatch()
+
+
+# API进程的全局任务管理器实例,首次使用时创建;下载进程自行创建TaskManager,导入本模块时不会构造
+_task_manager: Optional[TaskManager] = None
+
+
+def get_task_manager() -> TaskManager:
+    """获取全局任务管理器"""
+    global _task_manager
+    if _task_manager is None:
+        _task_manager = TaskManager()
+    return _task_manager
+
 
-# 全局任务管理器实例
-task_manager = TaskManager()
+def __getattr__(name: str):
+    # 兼容 from .task_manager import task_manager
+    if name == "task_manager":
+        return get_task_manager()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
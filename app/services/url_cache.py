@@ -0,0 +1,148 @@
+"""
+下载链接缓存
+"""
+
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Hashable, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+from ..config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 以Unix时间戳(十进制)表示过期时间的查询参数
+EXPIRY_PARAMS = ("expires", "x-expires", "expire", "deadline", "exp", "e")
+
+
+def url_expiry(url: str) -> Optional[float]:
+    """
+    从签名链接的查询参数中解析过期时间
+    支持 expires/x-expires/deadline/e 等Unix时间戳、腾讯云CDN的 sign+t(十六进制时间戳)
+    和 X-Amz-Date+X-Amz-Expires
+    Args:
+        url: 下载链接
+    Returns:
+        过期时间(Unix时间戳),链接未带过期时间时为None
+    """
+    params = {
+        key.lower(): values[0]
+        for key, values in parse_qs(urlsplit(url).query).items()
+        if values
+    }
+    try:
+        for key in EXPIRY_PARAMS:
+            if key in params and params[key].isdigit():
+                return float(params[key])
+        if "sign" in params and len(params.get("t", "")) == 8:
+            return float(int(params["t"], 16))
+        if "x-amz-date" in params and "x-amz-expires" in params:
+            signed_at = datetime.strptime(
+                params["x-amz-date"], "%Y%m%dT%H%M%SZ"
+            ).replace(tzinfo=timezone.utc)
+            return signed_at.timestamp() + int(params["x-amz-expires"])
+    except ValueError:
+        logger.debug(f"无法解析链接的过期时间: {url}")
+    return None
+
+
+class DownloadUrlCache:
+    """
+    已解析的下载链接缓存,按 (视频ID, 画质) 缓存全部镜像链接
+    有效期取签名链接中最早的过期时间(提前expiry_margin秒失效),链接未带过期时间时为ttl秒;
+    下载遇到403/410(链接过期)时由调用方使对应的条目失效
+    """
+
+    def __init__(
+        self,
+        ttl: Optional[float] = None,
+        expiry_margin: Optional[float] = None,
+        maxsize: int = 1024,
+    ):
+        """
+        Args:
+            ttl: 链接未带过期时间时的有效期(秒)
+            expiry_margin: 比签名过期时间提前失效的秒数,留出下载所需的时间
+            maxsize: 最多缓存的条目数
+        """
+        self.ttl = ttl if ttl is not None else settings.DOWNLOAD_URL_CACHE_TTL
+        self.expiry_margin = (
+            expiry_margin
+            if expiry_margin is not None
+            else settings.DOWNLOAD_URL_EXPIRY_MARGIN
+        )
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Tuple[Hashable, str], Tuple[float, List[str]]]" = (
+            OrderedDict()
+        )  # key -> (失效时间, 链接)
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, video_id: Hashable, quality: str) -> Optional[List[str]]:
+        """
+        读取未过期的链接
+        Returns:
+            链接列表的副本,未缓存或已过期时为None
+        """
+        key = (video_id, quality)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] <= time.time():
+            del self._entries[key]
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return list(entry[1])
+
+    def put(self, video_id: Hashable, quality: str, urls: List[str]):
+        """
+        缓存链接,已过期或即将过期的链接不缓存
+        Args:
+            video_id: 视频ID
+            quality: 画质
+            urls: 下载链接(masterUrl在前)
+        """
+        if not urls:
+            return
+        now = time.time()
+        expiries = [expiry for expiry in map(url_expiry, urls) if expiry is not None]
+        expires_at = min(expiries) - self.expiry_margin if expiries else now + self.ttl
+        if expires_at <= now:
+            return
+
+        key = (video_id, quality)
+        self._entries[key] = (expires_at, list(urls))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, video_id: Hashable, quality: Optional[str] = None):
+        """
+        使视频的链接失效
+        Args:
+            video_id: 视频ID
+            quality: 画质,为空时清除该视频的所有画质
+        """
+        keys = [
+            key
+            for key in self._entries
+            if key[0] == video_id and (quality is None or key[1] == quality)
+        ]
+        for key in keys:
+            del self._entries[key]
+        if keys:
+            self.invalidations += 1
+
+    def to_dict(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "invalidations": self.invalidations,
+        }
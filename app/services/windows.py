@@ -0,0 +1,61 @@
+"""
+下载时段
+"""
+
+from datetime import datetime, time, timedelta
+
+
+class DownloadWindow:
+    """
+    每天重复的下载时段,格式 HH:MM-HH:MM,结束时间早于开始时间表示跨午夜(如 23:00-07:00)
+    """
+
+    def __init__(self, start: time, end: time):
+        """
+        Args:
+            start: 每天的开始时间
+            end: 每天的结束时间
+        """
+        if start == end:
+            raise ValueError("下载时段的开始和结束时间不能相同")
+        self.start = start
+        self.end = end
+
+    @classmethod
+    def parse(cls, text: str) -> "DownloadWindow":
+        """
+        解析 HH:MM-HH:MM
+        Raises:
+            ValueError: 格式错误
+        """
+        try:
+            start, end = (
+                datetime.strptime(part.strip(), "%H:%M").time()
+                for part in text.split("-")
+            )
+        except ValueError:
+            raise ValueError(f"下载时段格式应为 HH:MM-HH:MM: {text}")
+        return cls(start, end)
+
+    def contains(self, moment: datetime) -> bool:
+        """时间是否在下载时段内"""
+        current = moment.time()
+        if self.start < self.end:
+            return self.start <= current < self.end
+        return current >= self.start or current < self.end
+
+    def next_open(self, moment: datetime) -> datetime:
+        """从moment起最早可以下载的时间,已在时段内时为moment本身"""
+        if self.contains(moment):
+            return moment
+        opening = datetime.combine(moment.date(), self.start)
+        return opening if opening > moment else opening + timedelta(days=1)
+
+    def next_close(self, moment: datetime) -> datetime:
+        """moment所在(不在时段内时为下一个)下载时段的结束时间"""
+        opened = self.next_open(moment)
+        closing = datetime.combine(opened.date(), self.end)
+        return closing if closing > opened else closing + timedelta(days=1)
+
+    def __str__(self) -> str:
+        return f"{self.start:%H:%M}-{self.end:%H:%M}"
@@ -1,11 +1,16 @@
 """
 小红书API接口封装
 """
+
+import asyncio
 import httpx
 import json
 import re
-from typing import Dict, List, Optional
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
 from ..config import settings
+from .url_cache import DownloadUrlCache
 import logging
 
 logger = logging.getLogger(__name__)
@@ -29,6 +34,11 @@ class XiaohongshuAPI:
             "Accept": "application/json, text/plain, */*",
             "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8",
         }
+        # 解析过的视频页面 {视频ID: (获取时间, 视频信息)},补全任务信息后获取下载链接时复用
+        self._info_cache: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()
+        self._info_fetches: Dict[str, asyncio.Task] = {}  # 正在请求的视频页面
+        # 解析出的下载链接,按签名中的过期时间缓存,启动、重试同一视频时不再请求页面
+        self.url_cache = DownloadUrlCache()
 
     def _parse_cookies(self, cookies_str: str) -> Dict:
         """解析Cookie字符串"""
@@ -47,50 +57,106 @@ class XiaohongshuAPI:
         """设置Cookie"""
         self.cookies = self._parse_cookies(cookies)
 
-    async def get_video_info(self, video_url: str, debug: bool = False) -> Dict:
+    async def get_video_info(
+        self, video_url: str, debug: bool = False, use_cache: bool = False
+    ) -> Dict:
         """
         获取视频信息
         Args:
             video_url: 视频URL
             debug: 是否开启调试模式（保存HTML和JSON数据到/tmp目录）
+            use_cache: 是否使用VIDEO_INFO_CACHE_TTL内解析过的页面;同一视频正在请求时等待该请求的结果
         Returns:
             视频信息字典
         """
+        video_id = self.extract_video_id(video_url)
+        if not use_cache or not video_id or debug:
+            return await self._fetch_video_info(video_url, debug)
+
+        cached = self._cached_info(video_id)
+        if cached is not None:
+            return cached
+
+        # 请求在独立的任务中进行,某个等待方被取消时不影响其他等待方
+        fetch = self._info_fetches.get(video_id)
+        if fetch is None:
+            fetch = asyncio.ensure_future(self._fetch_video_info(video_url, debug))
+            self._info_fetches[video_id] = fetch
+            fetch.add_done_callback(lambda done: self._fetch_finished(video_id, done))
+        return await asyncio.shield(fetch)
+
+    def _fetch_finished(self, video_id: str, fetch: asyncio.Task):
+        """请求结束时移除记录;等待方都已取消时取出异常,避免"exception was never retrieved"警告"""
+        if self._info_fetches.get(video_id) is fetch:
+            del self._info_fetches[video_id]
+        if not fetch.cancelled():
+            fetch.exception()
+
+    def _cached_info(self, video_id: str) -> Optional[Dict]:
+        """读取VIDEO_INFO_CACHE_TTL内解析过的页面,过期的条目同时移除"""
+        cached = self._info_cache.get(video_id)
+        if cached is None:
+            return None
+        if time.monotonic() - cached[0] >= settings.VIDEO_INFO_CACHE_TTL:
+            del self._info_cache[video_id]
+            return None
+        self._info_cache.move_to_end(video_id)
+        return cached[1]
+
+    def _cache_info(self, video_id: str, video_info: Dict):
+        """缓存解析过的页面,超过VIDEO_INFO_CACHE_SIZE时淘汰最久未使用的"""
+        self._info_cache[video_id] = (time.monotonic(), video_info)
+        self._info_cache.move_to_end(video_id)
+        while len(self._info_cache) > settings.VIDEO_INFO_CACHE_SIZE:
+            self._info_cache.popitem(last=False)
+
+    async def _fetch_video_info(self, video_url: str, debug: bool = False) -> Dict:
+        """请求并解析视频页面,解析出视频链接时写入缓存"""
         try:
             # 从URL中提取视频ID
-            video_id = self._extract_video_id(video_url)
+            video_id = self.extract_video_id(video_url)
             if not video_id:
                 raise ValueError("无法从URL中提取视频ID")
 
             logger.info(f"提取到视频ID: {video_id}")
 
-            async with httpx.AsyncClient(cookies=self.cookies, headers=self.headers, timeout=settings.TIMEOUT) as client:
+            async with httpx.AsyncClient(
+                cookies=self.cookies, headers=self.headers, timeout=settings.TIMEOUT
+            ) as client:
                 # 获取视频详情页
                 logger.info(f"正在请求视频页面: {video_url}")
                 response = await client.get(video_url, follow_redirects=True)
                 response.raise_for_status()
 
-                logger.info(f"页面请求成功，状态码: {response.status_code}, 内容长度: {len(response.text)}")
+                logger.info(
+                    f"页面请求成功，状态码: {response.status_code}, 内容长度: {len(response.text)}"
+                )
 
                 # 调试模式：保存HTML内容
                 if debug:
                     import os
+
                     debug_dir = "/tmp/xiaohongshu_debug"
                     os.makedirs(debug_dir, exist_ok=True)
 
                     html_file = f"{debug_dir}/{video_id}_page.html"
-                    with open(html_file, 'w', encoding='utf-8') as f:
+                    with open(html_file, "w", encoding="utf-8") as f:
                         f.write(response.text)
                     logger.info(f"调试模式：已保存HTML到 {html_file}")
 
                 # 解析页面内容获取视频信息
-                video_info = self._parse_video_page(response.text, video_id, debug=debug)
+                video_info = self._parse_video_page(
+                    response.text, video_id, debug=debug
+                )
+                if video_info.get("video_url"):
+                    self._cache_info(video_id, video_info)
 
                 # 调试模式：保存解析结果
                 if debug:
                     import json as json_module
+
                     result_file = f"{debug_dir}/{video_id}_result.json"
-                    with open(result_file, 'w', encoding='utf-8') as f:
+                    with open(result_file, "w", encoding="utf-8") as f:
                         json_module.dump(video_info, f, ensure_ascii=False, indent=2)
                     logger.info(f"调试模式：已保存解析结果到 {result_file}")
 
@@ -99,10 +165,11 @@ class XiaohongshuAPI:
         except Exception as e:
             logger.error(f"获取视频信息失败: {e}")
             import traceback
+
             logger.error(traceback.format_exc())
             raise
 
-    def _extract_video_id(self, url: str) -> Optional[str]:
+    def extract_video_id(self, url: str) -> Optional[str]:
         """
         从URL中提取视频ID
         支持格式:
@@ -110,9 +177,9 @@ class XiaohongshuAPI:
         - https://xhslink.com/短链接
         """
         patterns = [
-            r'explore/([a-zA-Z0-9]+)',
-            r'discovery/item/([a-zA-Z0-9]+)',
-            r'/([a-zA-Z0-9]{24})$',
+            r"explore/([a-zA-Z0-9]+)",
+            r"discovery/item/([a-zA-Z0-9]+)",
+            r"/([a-zA-Z0-9]{24})$",
         ]
 
         for pattern in patterns:
@@ -128,10 +195,10 @@ class XiaohongshuAPI:
         """
         # 尝试多种正则模式来提取__INITIAL_STATE__数据
         state_patterns = [
-            r'<script>window\.__INITIAL_STATE__=({.*?})</script>',
-            r'window\.__INITIAL_STATE__\s*=\s*({.*?})\s*</script>',
-            r'window\.__INITIAL_STATE__\s*=\s*({.*?})\s*;',
-            r'__INITIAL_STATE__\s*=\s*({[\s\S]*?})\s*(?:</script>|;)',
+            r"<script>window\.__INITIAL_STATE__=({.*?})</script>",
+            r"window\.__INITIAL_STATE__\s*=\s*({.*?})\s*</script>",
+            r"window\.__INITIAL_STATE__\s*=\s*({.*?})\s*;",
+            r"__INITIAL_STATE__\s*=\s*({[\s\S]*?})\s*(?:</script>|;)",
         ]
 
         state_data = None
@@ -139,20 +206,29 @@ class XiaohongshuAPI:
             match = re.search(pattern, html, re.DOTALL)
             if match:
                 try:
-                    json_str = match.group(1).replace(':undefined', ':null').replace(':null,', ':"",')
+                    json_str = (
+                        match.group(1)
+                        .replace(":undefined", ":null")
+                        .replace(":null,", ':"",')
+                    )
                     state_data = json.loads(json_str)
                     logger.info(f"成功使用模式 {i+1} 匹配到 __INITIAL_STATE__")
 
                     # 调试模式：保存原始JSON
                     if debug:
                         import os
+
                         debug_dir = "/tmp/xiaohongshu_debug"
                         os.makedirs(debug_dir, exist_ok=True)
 
                         json_file = f"{debug_dir}/{video_id}_initial_state.json"
-                        with open(json_file, 'w', encoding='utf-8') as f:
-                            f.write(json.dumps(state_data, ensure_ascii=False, indent=2))
-                        logger.info(f"调试模式：已保存 __INITIAL_STATE__ 到 {json_file}")
+                        with open(json_file, "w", encoding="utf-8") as f:
+                            f.write(
+                                json.dumps(state_data, ensure_ascii=False, indent=2)
+                            )
+                        logger.info(
+                            f"调试模式：已保存 __INITIAL_STATE__ 到 {json_file}"
+                        )
 
                     break
                 except json.JSONDecodeError as e:
@@ -162,79 +238,99 @@ class XiaohongshuAPI:
         if state_data:
             try:
                 # 解析视频信息
-                note_data = state_data.get('note', {}).get('noteDetailMap', {})
+                note_data = state_data.get("note", {}).get("noteDetailMap", {})
                 logger.info(f"noteDetailMap 包含 {len(note_data)} 个条目")
 
                 if note_data:
                     for note_id, note_info in note_data.items():
-                        note = note_info.get('note', {})
-                        video = note.get('video', {})
+                        note = note_info.get("note", {})
+                        video = note.get("video", {})
 
-                        logger.info(f"正在解析笔记 {note_id}, 类型: {note.get('type', 'unknown')}")
+                        logger.info(
+                            f"正在解析笔记 {note_id}, 类型: {note.get('type', 'unknown')}"
+                        )
 
                         # 尝试多种方式提取视频URL
-                        video_url = ''
+                        video_url = ""
+                        video_urls = []  # 同一视频的全部CDN镜像
 
                         # 方式1: 从 media.stream.h264 获取
                         if video:
-                            media = video.get('media', {})
-                            stream = media.get('stream', {})
-                            h264_list = stream.get('h264', [])
+                            media = video.get("media", {})
+                            stream = media.get("stream", {})
+                            h264_list = stream.get("h264", [])
 
                             logger.info(f"h264 列表长度: {len(h264_list)}")
 
                             if h264_list and len(h264_list) > 0:
+                                # masterUrl 和 backupUrls 是同一文件的不同CDN镜像,全部保留
+                                candidates = [h264_list[0].get("masterUrl", "")]
+                                candidates.extend(
+                                    h264_list[0].get("backupUrls", None) or []
+                                )
+                                video_urls = [
+                                    url for url in dict.fromkeys(candidates) if url
+                                ]
+                                logger.info(f"视频镜像数量: {len(video_urls)}")
+
                                 # 尝试获取 masterUrl
-                                video_url = h264_list[0].get('masterUrl', '')
+                                video_url = h264_list[0].get("masterUrl", "")
 
                                 # 如果 masterUrl 为空，尝试 backupUrls
                                 if not video_url:
-                                    backup_urls = h264_list[0].get('backupUrls', [])
+                                    backup_urls = h264_list[0].get("backupUrls", [])
                                     if backup_urls and len(backup_urls) > 0:
                                         video_url = backup_urls[0]
                                         logger.info("从 backupUrls 获取视频链接")
 
                                 # 如果还是为空，尝试直接从 stream 获取
-                                if not video_url and 'url' in h264_list[0]:
-                                    video_url = h264_list[0].get('url', '')
+                                if not video_url and "url" in h264_list[0]:
+                                    video_url = h264_list[0].get("url", "")
                                     logger.info("从 h264[0].url 获取视频链接")
 
                             # 方式2: 尝试从 video.consumer.originVideoKey 获取
                             if not video_url:
-                                consumer = video.get('consumer', {})
-                                origin_video_key = consumer.get('originVideoKey', '')
+                                consumer = video.get("consumer", {})
+                                origin_video_key = consumer.get("originVideoKey", "")
                                 if origin_video_key:
                                     # 通常需要拼接CDN域名
                                     video_url = f"https://sns-video-bd.xhscdn.com/{origin_video_key}"
                                     logger.info("从 originVideoKey 构建视频链接")
 
                             # 方式3: 尝试从 video.masterUrl 直接获取
-                            if not video_url and 'masterUrl' in video:
-                                video_url = video.get('masterUrl', '')
+                            if not video_url and "masterUrl" in video:
+                                video_url = video.get("masterUrl", "")
                                 logger.info("从 video.masterUrl 获取视频链接")
 
+                        if video_url and video_url not in video_urls:
+                            video_urls.insert(0, video_url)
+
                         if video_url:
                             logger.info(f"成功提取视频URL: {video_url[:100]}...")
                         else:
                             logger.warning("未能提取视频URL，所有方法均失败")
 
                         return {
-                            'video_id': video_id,
-                            'title': note.get('title', ''),
-                            'desc': note.get('desc', ''),
-                            'author': note.get('user', {}).get('nickname', ''),
-                            'author_id': note.get('user', {}).get('userId', ''),
-                            'cover_url': video.get('cover', {}).get('url', '') if video else '',
-                            'video_url': video_url,
-                            'duration': video.get('duration', 0) if video else 0,
-                            'width': video.get('width', 0) if video else 0,
-                            'height': video.get('height', 0) if video else 0,
-                            'parts': self._extract_video_parts(video) if video else [],
-                            'available_qualities': ['hd', 'sd', 'ld'],  # 示例
+                            "video_id": video_id,
+                            "title": note.get("title", ""),
+                            "desc": note.get("desc", ""),
+                            "author": note.get("user", {}).get("nickname", ""),
+                            "author_id": note.get("user", {}).get("userId", ""),
+                            "cover_url": (
+                                video.get("cover", {}).get("url", "") if video else ""
+                            ),
+                            "video_url": video_url,
+                            "video_urls": video_urls,
+                            "duration": video.get("duration", 0) if video else 0,
+                            "width": video.get("width", 0) if video else 0,
+                            "height": video.get("height", 0) if video else 0,
+                            "parts": self._extract_video_parts(video) if video else [],
+                            "available_qualities": ["hd", "sd", "ld"],  # 示例
                         }
             except Exception as e:
                 logger.error(f"解析视频页面失败: {e}")
                 import traceback
+
                 logger.error(traceback.format_exc())
         else:
             logger.warning("未找到 __INITIAL_STATE__ 数据")
@@ -242,13 +338,14 @@ class XiaohongshuAPI:
         # 如果解析失败,返回基本信息
         logger.warning(f"返回默认视频信息，video_id: {video_id}")
         return {
-            'video_id': video_id,
-            'title': '未知标题',
-            'author': '未知作者',
-            'cover_url': '',
-            'video_url': '',
-            'parts': [],
-            'available_qualities': ['hd'],
+            "video_id": video_id,
+            "title": "未知标题",
+            "author": "未知作者",
+            "cover_url": "",
+            "video_url": "",
+            "video_urls": [],
+            "parts": [],
+            "available_qualities": ["hd"],
         }
 
     def _extract_video_parts(self, video_data: Dict) -> List[Dict]:
@@ -256,11 +353,13 @@ class XiaohongshuAPI:
         # 小红书通常没有分P,这里返回单个视频信息
         parts = []
         if video_data:
-            parts.append({
-                'part': 1,
-                'title': '正片',
-                'duration': video_data.get('duration', 0),
-            })
+            parts.append(
+                {
+                    "part": 1,
+                    "title": "正片",
+                    "duration": video_data.get("duration", 0),
+                }
+            )
         return parts
 
     async def get_favorites(self, user_id: str) -> List[Dict]:
@@ -272,7 +371,9 @@ class XiaohongshuAPI:
             收藏夹列表
         """
         try:
-            async with httpx.AsyncClient(cookies=self.cookies, headers=self.headers, timeout=settings.TIMEOUT) as client:
+            async with httpx.AsyncClient(
+                cookies=self.cookies, headers=self.headers, timeout=settings.TIMEOUT
+            ) as client:
                 # API endpoint (需要根据实际情况调整)
                 url = f"{self.api_base_url}/api/sns/web/v1/user/favlist"
                 params = {"user_id": user_id}
@@ -281,13 +382,15 @@ class XiaohongshuAPI:
                 response.raise_for_status()
 
                 data = response.json()
-                return data.get('data', {}).get('list', [])
+                return data.get("data", {}).get("list", [])
 
         except Exception as e:
             logger.error(f"获取收藏夹列表失败: {e}")
             return []
 
-    async def get_favorite_videos(self, favorite_id: str, page: int = 1, page_size: int = 20) -> Dict:
+    async def get_favorite_videos(
+        self, favorite_id: str, page: int = 1, page_size: int = 20
+    ) -> Dict:
         """
         获取收藏夹中的视频列表
         Args:
@@ -298,7 +401,9 @@ class XiaohongshuAPI:
             视频列表数据
         """
         try:
-            async with httpx.AsyncClient(cookies=self.cookies, headers=self.headers, timeout=settings.TIMEOUT) as client:
+            async with httpx.AsyncClient(
+                cookies=self.cookies, headers=self.headers, timeout=settings.TIMEOUT
+            ) as client:
                 url = f"{self.api_base_url}/api/sns/web/v1/board/notes"
                 params = {
                     "board_id": favorite_id,
@@ -310,11 +415,11 @@ class XiaohongshuAPI:
                 response.raise_for_status()
 
                 data = response.json()
-                return data.get('data', {})
+                return data.get("data", {})
 
         except Exception as e:
             logger.error(f"获取收藏夹视频失败: {e}")
-            return {'list': [], 'has_more': False}
+            return {"list": [], "has_more": False}
 
     async def check_video_valid(self, video_id: str) -> bool:
         """
@@ -326,10 +431,12 @@ class XiaohongshuAPI:
         """
         try:
             video_url = f"{self.base_url}/explore/{video_id}"
-            async with httpx.AsyncClient(cookies=self.cookies, headers=self.headers, timeout=settings.TIMEOUT) as client:
+            async with httpx.AsyncClient(
+                cookies=self.cookies, headers=self.headers, timeout=settings.TIMEOUT
+            ) as client:
                 response = await client.get(video_url, follow_redirects=True)
                 # 如果返回404或页面不存在,则视频失效
-                return response.status_code == 200 and '404' not in response.text
+                return response.status_code == 200 and "404" not in response.text
 
         except Exception as e:
             logger.error(f"检查视频有效性失败: {e}")
@@ -346,7 +453,9 @@ class XiaohongshuAPI:
             if not self.cookies:
                 return False
 
-            async with httpx.AsyncClient(cookies=self.cookies, headers=self.headers, timeout=settings.TIMEOUT) as client:
+            async with httpx.AsyncClient(
+                cookies=self.cookies, headers=self.headers, timeout=settings.TIMEOUT
+            ) as client:
                 # 尝试访问小红书主页,检查是否包含登录标识
                 response = await client.get(self.base_url, follow_redirects=True)
 
@@ -360,13 +469,13 @@ class XiaohongshuAPI:
 
                 # 检查是否包含用户登录状态的标识
                 # 登录后通常会有 window.__INITIAL_STATE__ 且包含用户信息
-                if 'window.__INITIAL_STATE__' in content and '"user":' in content:
+                if "window.__INITIAL_STATE__" in content and '"user":' in content:
                     return True
 
                 # 也可以尝试访问API端点验证
                 api_response = await client.get(
                     f"{self.api_base_url}/api/sns/web/v1/user/selfinfo",
-                    follow_redirects=True
+                    follow_redirects=True,
                 )
 
                 # 如果API返回200且有数据,说明认证成功
@@ -374,7 +483,7 @@ class XiaohongshuAPI:
                     try:
                         data = api_response.json()
                         # 检查返回数据是否包含用户信息
-                        if data.get('success') or data.get('data'):
+                        if data.get("success") or data.get("data"):
                             return True
                     except:
                         pass
@@ -385,19 +494,51 @@ class XiaohongshuAPI:
             logger.error(f"验证Cookie失败: {e}")
             return False
 
-    async def get_download_url(self, video_id: str, quality: str = 'hd') -> Optional[str]:
+    async def get_download_url(
+        self, video_id: str, quality: str = "hd", use_cache: bool = True
+    ) -> Optional[str]:
         """
         获取视频下载链接
         Args:
             video_id: 视频ID
             quality: 画质 (hd/sd/ld)
+            use_cache: 是否使用缓存的链接,链接已过期时应传False
         Returns:
             下载链接
         """
+        urls = await self.get_download_urls(video_id, quality, use_cache=use_cache)
+        return urls[0] if urls else None
+
+    async def get_download_urls(
+        self, video_id: str, quality: str = "hd", use_cache: bool = True
+    ) -> List[str]:
+        """
+        获取视频的全部CDN镜像链接(masterUrl在前,其后为backupUrls)
+        Args:
+            video_id: 视频ID
+            quality: 画质 (hd/sd/ld)
+            use_cache: 是否使用缓存的链接;链接已过期(下载返回403/410)时应传False,
+                同时清除该视频缓存的链接并重新请求页面
+        Returns:
+            下载链接列表
+        """
+        if use_cache:
+            cached = self.url_cache.get(video_id, quality)
+            if cached:
+                return cached
+        else:
+            self.url_cache.invalidate(video_id)
+
         try:
-            video_info = await self.get_video_info(f"{self.base_url}/explore/{video_id}")
-            return video_info.get('video_url')
+            video_info = await self.get_video_info(
+                f"{self.base_url}/explore/{video_id}", use_cache=use_cache
+            )
+            urls = video_info.get("video_urls") or [
+                url for url in [video_info.get("video_url")] if url
+            ]
+            self.url_cache.put(video_id, quality, urls)
+            return urls
 
         except Exception as e:
             logger.error(f"获取下载链接失败: {e}")
-            return None
+            return []
@@ -0,0 +1,106 @@
+"""
+独立下载进程
+从数据库队列中领取任务并下载,API进程只负责创建任务、入队和查询(需要设置 EMBEDDED_WORKER=False)
+
+用法:
+    python -m app.worker [--worker-id ID] [--concurrency N] [--processes N]
+"""
+
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+from typing import Optional
+from . import models
+from .config import settings
+from .database import engine, upgrade_schema
+from .services.task_manager import TaskManager
+
+logger = logging.getLogger(__name__)
+
+
+async def run_worker(worker_id: str, concurrency: int):
+    """
+    运行下载进程,收到SIGINT/SIGTERM后停止下载并把未完成的任务放回队列
+    Args:
+        worker_id: 下载进程ID
+        concurrency: 最大并发下载数
+    """
+    manager = TaskManager(worker_id=worker_id)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    logger.info(f"下载进程已启动: {worker_id}, 并发数 {concurrency}")
+    try:
+        if settings.RECOVER_TASKS_ON_STARTUP:
+            await manager.recover_tasks()
+
+        # 领取任务、执行控制命令、续期租约都在控制循环中进行
+        manager.start_control_loop(concurrency)
+        await stop.wait()
+    finally:
+        await manager.shutdown()
+        logger.info(f"下载进程已退出: {worker_id}")
+
+
+def _run(worker_id: str, concurrency: int):
+    """子进程入口"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s %(processName)s %(levelname)s %(message)s",
+    )
+    asyncio.run(run_worker(worker_id, concurrency))
+
+
+def main(argv: Optional[list] = None):
+    parser = argparse.ArgumentParser(description="小红书视频下载进程")
+    parser.add_argument(
+        "--worker-id",
+        help="下载进程ID,默认 主机名-进程号;固定ID的进程崩溃重启后会继续自己被中断的任务",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=settings.MAX_CONCURRENT_DOWNLOADS,
+        help="每个进程的最大并发下载数",
+    )
+    parser.add_argument("--processes", type=int, default=1, help="启动的下载进程数")
+    args = parser.parse_args(argv)
+
+    # 和API进程一样,确保表结构是最新的
+    models.Base.metadata.create_all(bind=engine)
+    upgrade_schema()
+
+    base_id = args.worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    concurrency = max(1, args.concurrency)
+    if args.processes <= 1:
+        _run(base_id, concurrency)
+        return
+
+    # 每个进程使用独立的事件循环和CPU核心
+    processes = [
+        multiprocessing.Process(
+            target=_run,
+            args=(f"{base_id}-{index}", concurrency),
+            name=f"worker-{index}",
+        )
+        for index in range(1, args.processes + 1)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        # Ctrl+C同时发给了子进程,等待它们把任务放回队列
+        for process in processes:
+            process.join()
+
+
+if __name__ == "__main__":
+    main()
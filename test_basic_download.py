@@ -2,20 +2,21 @@
 """
 基础下载功能测试 - 使用公开测试文件
 """
+
 import asyncio
 import sys
 import os
 
-sys.path.insert(0, '/home/user/first_job')
+sys.path.insert(0, "/home/user/first_job")
 
 from app.services.downloader import VideoDownloader
 
 
 async def test_basic_download():
     """测试基础下载功能"""
-    print("="*60)
+    print("=" * 60)
     print("测试: 基础下载功能")
-    print("="*60)
+    print("=" * 60)
 
     # 使用一个小的公开测试视频
     test_url = "https://commondatastorage.googleapis.com/gtv-videos-bucket/sample/BigBuckBunny.mp4"
@@ -30,14 +31,18 @@ async def test_basic_download():
         # 进度追踪
         async def progress_callback(downloaded, total, speed):
             progress = (downloaded / total * 100) if total > 0 else 0
-            print(f"\r进度: {progress:.1f}% | {downloaded}/{total} bytes | {speed/1024:.1f} KB/s", end='', flush=True)
+            print(
+                f"\r进度: {progress:.1f}% | {downloaded}/{total} bytes | {speed/1024:.1f} KB/s",
+                end="",
+                flush=True,
+            )
 
         print("开始下载...")
         success = await downloader.download_video(
             url=test_url,
             file_path=file_path,
             progress_callback=progress_callback,
-            resume=True
+            resume=True,
         )
 
         print("\n")  # 换行
@@ -55,6 +60,7 @@ async def test_basic_download():
     except Exception as e:
         print(f"\n❌ 下载出错: {e}")
         import traceback
+
         traceback.print_exc()
         return False
 
@@ -2,12 +2,13 @@
 """
 下载功能测试脚本
 """
+
 import asyncio
 import sys
 import os
 
 # 添加项目路径
-sys.path.insert(0, '/home/user/first_job')
+sys.path.insert(0, "/home/user/first_job")
 
 from app.services.xiaohongshu_api import XiaohongshuAPI
 from app.services.downloader import VideoDownloader
@@ -31,12 +32,15 @@ async def test_video_info(video_url: str):
         print(f"  - 作者: {video_info.get('author')}")
         print(f"  - 时长: {video_info.get('duration')}秒")
         print(f"  - 分辨率: {video_info.get('width')}x{video_info.get('height')}")
-        print(f"  - 下载URL: {video_info.get('video_url')[:80] if video_info.get('video_url') else '未找到'}...")
+        print(
+            f"  - 下载URL: {video_info.get('video_url')[:80] if video_info.get('video_url') else '未找到'}..."
+        )
 
         return video_info
     except Exception as e:
         print(f"\n❌ 获取视频信息失败: {e}")
         import traceback
+
         traceback.print_exc()
         return None
 
@@ -50,7 +54,7 @@ async def test_download_url(video_id: str):
 
     try:
         api = XiaohongshuAPI()
-        download_url = await api.get_download_url(video_id, 'hd')
+        download_url = await api.get_download_url(video_id, "hd")
 
         if download_url:
             print(f"\n✅ 成功获取下载链接:")
@@ -62,6 +66,7 @@ async def test_download_url(video_id: str):
     except Exception as e:
         print(f"\n❌ 获取下载链接失败: {e}")
         import traceback
+
         traceback.print_exc()
         return None
 
@@ -78,20 +83,22 @@ async def test_download(download_url: str, file_path: str):
         downloader = VideoDownloader()
 
         # 进度回调
-        progress_data = {'last_progress': 0}
+        progress_data = {"last_progress": 0}
 
         async def progress_callback(downloaded, total, speed):
             progress = (downloaded / total * 100) if total > 0 else 0
             # 每10%更新一次显示
-            if progress - progress_data['last_progress'] >= 10:
-                print(f"  进度: {progress:.1f}% ({downloaded}/{total} bytes, {speed/1024:.1f} KB/s)")
-                progress_data['last_progress'] = progress
+            if progress - progress_data["last_progress"] >= 10:
+                print(
+                    f"  进度: {progress:.1f}% ({downloaded}/{total} bytes, {speed/1024:.1f} KB/s)"
+                )
+                progress_data["last_progress"] = progress
 
         success = await downloader.download_video(
             url=download_url,
             file_path=file_path,
             progress_callback=progress_callback,
-            resume=True
+            resume=True,
         )
 
         if success:
@@ -107,6 +114,7 @@ async def test_download(download_url: str, file_path: str):
     except Exception as e:
         print(f"\n❌ 下载过程出错: {e}")
         import traceback
+
         traceback.print_exc()
         return False
 
@@ -119,11 +127,12 @@ async def test_url_accessibility(url: str):
 
     try:
         import httpx
+
         async with httpx.AsyncClient(timeout=10, follow_redirects=True) as client:
             response = await client.head(url)
             print(f"URL状态码: {response.status_code}")
             if response.status_code == 200:
-                content_length = response.headers.get('content-length')
+                content_length = response.headers.get("content-length")
                 if content_length:
                     print(f"文件大小: {int(content_length) / (1024*1024):.2f} MB")
                 print(f"✅ URL可访问")
@@ -138,16 +147,18 @@ async def test_url_accessibility(url: str):
 
 async def main():
     """主测试流程"""
-    print("\n" + "="*60)
+    print("\n" + "=" * 60)
     print("小红书视频下载功能测试")
-    print("="*60)
+    print("=" * 60)
 
     # 测试URL - 使用用户提供的URL或默认测试URL
     test_url = input("\n请输入小红书视频URL (按回车使用默认测试): ").strip()
 
     if not test_url:
         print("\n⚠️  未提供测试URL，无法继续测试")
-        print("请提供一个小红书视频URL，格式如: https://www.xiaohongshu.com/explore/xxxxxxxxx")
+        print(
+            "请提供一个小红书视频URL，格式如: https://www.xiaohongshu.com/explore/xxxxxxxxx"
+        )
         return
 
     # 第一步: 获取视频信息
@@ -156,13 +167,13 @@ async def main():
         print("\n❌ 测试终止: 无法获取视频信息")
         return
 
-    video_id = video_info.get('video_id')
+    video_id = video_info.get("video_id")
     if not video_id:
         print("\n❌ 测试终止: 无法提取视频ID")
         return
 
     # 第二步: 获取下载链接
-    download_url = video_info.get('video_url')
+    download_url = video_info.get("video_url")
     if not download_url:
         print("\n尝试通过API获取下载链接...")
         download_url = await test_download_url(video_id)
@@ -2,12 +2,13 @@
 """
 测试页面解析逻辑（使用示例HTML）
 """
+
 import sys
 import re
 import json
 
 # 添加项目路径
-sys.path.insert(0, '/home/user/first_job')
+sys.path.insert(0, "/home/user/first_job")
 
 
 def test_parse_logic():
@@ -19,9 +20,9 @@ def test_parse_logic():
     test_url = "https://www.xiaohongshu.com/explore/6909e6c1000000000300ea0e?xsec_token=ABCWdlNJTwSsZlWZe7j8AOqymZmKn6j9Gexc_IPDjJ0js=&xsec_source=pc_feed"
 
     patterns = [
-        r'explore/([a-zA-Z0-9]+)',
-        r'discovery/item/([a-zA-Z0-9]+)',
-        r'/([a-zA-Z0-9]{24})$',
+        r"explore/([a-zA-Z0-9]+)",
+        r"discovery/item/([a-zA-Z0-9]+)",
+        r"/([a-zA-Z0-9]{24})$",
     ]
 
     for i, pattern in enumerate(patterns):
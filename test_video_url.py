@@ -2,12 +2,13 @@
 """
 测试特定视频URL的下载链接提取
 """
+
 import asyncio
 import sys
 import os
 
 # 添加项目路径
-sys.path.insert(0, '/home/user/first_job')
+sys.path.insert(0, "/home/user/first_job")
 
 from app.services.xiaohongshu_api import XiaohongshuAPI
 
@@ -36,17 +37,19 @@ async def test_video_url(video_url: str):
         print(f"作者: {video_info.get('author')}")
         print(f"时长: {video_info.get('duration')}秒")
         print(f"分辨率: {video_info.get('width')}x{video_info.get('height')}")
-        print(f"封面URL: {video_info.get('cover_url')[:80] if video_info.get('cover_url') else 'N/A'}...")
+        print(
+            f"封面URL: {video_info.get('cover_url')[:80] if video_info.get('cover_url') else 'N/A'}..."
+        )
         print(f"\n视频URL: {video_info.get('video_url') or '未找到视频链接 ❌'}")
 
-        if video_info.get('video_url'):
+        if video_info.get("video_url"):
             print(f"\n✅ 成功提取到视频下载链接！")
             print(f"\n完整链接:")
-            print(video_info.get('video_url'))
+            print(video_info.get("video_url"))
         else:
             print(f"\n❌ 未能提取到视频下载链接")
             print(f"\n请查看调试文件以了解详情:")
-            video_id = video_info.get('video_id')
+            video_id = video_info.get("video_id")
             print(f"  - HTML: /tmp/xiaohongshu_debug/{video_id}_page.html")
             print(f"  - JSON: /tmp/xiaohongshu_debug/{video_id}_initial_state.json")
             print(f"  - 结果: /tmp/xiaohongshu_debug/{video_id}_result.json")
@@ -58,6 +61,7 @@ async def test_video_url(video_url: str):
     except Exception as e:
         print(f"\n❌ 测试失败: {e}")
         import traceback
+
         traceback.print_exc()
         return None
 
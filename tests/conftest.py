@@ -0,0 +1,25 @@
+import sys
+import os
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app import database
+from app.database import Base
+
+
+@pytest.fixture
+def session_factory(tmp_path, monkeypatch):
+    """
+    Create a fresh SQLite database under tmp_path and make it the app's SessionLocal,
+    so code that opens its own sessions uses the same database as the test.
+    """
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    Base.metadata.create_all(bind=engine)
+    monkeypatch.setattr(database, "SessionLocal", Session)
+    yield Session
+    engine.dispose()
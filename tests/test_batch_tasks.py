@@ -0,0 +1,76 @@
+import sys
+import os
+import asyncio
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.config import settings
+from app.models import DownloadTask
+from app.schemas import DownloadTaskCreate
+from app.services.task_manager import TaskManager
+
+
+def test_batch_resolves_concurrently_and_inserts_once(session_factory, monkeypatch):
+    """
+    Test that a batch resolves metadata with bounded concurrency and creates every task.
+    """
+    monkeypatch.setattr(settings, "METADATA_CONCURRENCY", 4)
+
+    manager = TaskManager()
+    running = {"now": 0, "peak": 0}
+
+    async def get_video_info(video_url, use_cache=False):
+        running["now"] += 1
+        running["peak"] = max(running["peak"], running["now"])
+        await asyncio.sleep(0.01)
+        running["now"] -= 1
+        return {"video_id": video_url.rsplit("/", 1)[-1], "title": "t", "author": "a"}
+
+    monkeypatch.setattr(manager.xhs_api, "get_video_info", get_video_info)
+
+    async def run():
+        job = manager.create_tasks_batch(
+            [
+                DownloadTaskCreate(video_url=f"https://www.xiaohongshu.com/explore/{i}")
+                for i in range(20)
+            ]
+        )
+        assert job.status == "running"
+        await job.runner
+        return job
+
+    job = asyncio.run(run())
+
+    assert job.status == "completed"
+    assert job.resolved == 20
+    assert running["peak"] == 4
+    db = session_factory()
+    assert db.query(DownloadTask).count() == 20
+    db.close()
+
+
+def test_cancelled_batch_is_marked_failed(session_factory, monkeypatch):
+    """
+    Test that cancelling a batch while it resolves metadata does not leave it running.
+    """
+    manager = TaskManager()
+
+    async def get_video_info(video_url, use_cache=False):
+        await asyncio.sleep(10)
+
+    monkeypatch.setattr(manager.xhs_api, "get_video_info", get_video_info)
+
+    async def run():
+        job = manager.create_tasks_batch(
+            [DownloadTaskCreate(video_url="https://www.xiaohongshu.com/explore/a")]
+        )
+        await asyncio.sleep(0.01)
+        job.runner.cancel()
+        await asyncio.gather(job.runner, return_exceptions=True)
+        return job
+
+    job = asyncio.run(run())
+
+    assert job.status == "failed"
+    assert job.error == "已取消"
@@ -0,0 +1,57 @@
+import sys
+import os
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.services.buffers import AdaptiveChunkSizer, BufferPool
+
+KB = 1024
+MB = 1024 * 1024
+
+
+def test_buffer_pool_reuses_within_byte_budget():
+    """
+    Test that released buffers are reused by size and that free buffers beyond
+    the byte budget are dropped instead of pinned.
+    """
+    pool = BufferPool(max_free_bytes=3 * MB)
+
+    first = pool.acquire(MB)
+    pool.release(first)
+    assert pool.acquire(MB) is first
+    assert pool.free_bytes == 0
+
+    buffers = [pool.acquire(2 * MB) for _ in range(2)] + [pool.acquire(MB)]
+    for buffer in buffers:
+        pool.release(buffer)
+    # the second 2MB buffer does not fit the budget
+    assert pool.free_bytes == 3 * MB
+    assert pool.to_dict()["allocated"] == 4
+    assert pool.acquire(64 * KB) is not None
+    assert pool.to_dict()["reused"] == 1
+
+
+def test_chunk_size_follows_throughput():
+    """
+    Test that the chunk size tracks ~target_seconds of data, stays a power of two
+    within bounds, and grows when a buffer fills instantly.
+    """
+    sizer = AdaptiveChunkSizer(MB, 64 * KB, 8 * MB, target_seconds=0.25)
+    assert sizer.size == MB
+
+    # 40MB/s -> 10MB per 0.25s, capped at the maximum
+    sizer.update(MB, MB / (40 * MB))
+    assert sizer.size == 8 * MB
+
+    # a slow link pulls the average down to the minimum
+    for _ in range(20):
+        sizer.update(64 * KB, 64 * KB / (16 * KB))
+    assert sizer.size == 64 * KB
+
+    sizer.update(64 * KB, 0)
+    assert sizer.size == 128 * KB
+
+    clamped = AdaptiveChunkSizer(100 * MB, 3 * KB, 5 * MB)
+    assert clamped.size == 4 * MB
+    assert clamped.minimum == 2 * KB
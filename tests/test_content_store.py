@@ -0,0 +1,148 @@
+import sys
+import os
+import asyncio
+import errno
+import hashlib
+import pytest
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.models import DownloadTask, StoredVideo, TaskStatus, VideoQuality
+from app.services import content_store
+from app.services.content_store import ContentStore
+from app.services.task_manager import TaskManager
+
+DATA = b"video" * 1000
+CONTENT_HASH = hashlib.sha256(DATA).hexdigest()
+
+
+@pytest.fixture
+def store(tmp_path):
+    """
+    Create a store under tmp_path.
+    """
+    return ContentStore(str(tmp_path / ".store"))
+
+
+@pytest.fixture
+def db(session_factory):
+    db = session_factory()
+    yield db
+    db.close()
+
+
+def ingest(store, db, path, video_id="abc", quality=VideoQuality.HD):
+    with open(path, "wb") as f:
+        f.write(DATA)
+    asyncio.run(store.ingest(db, video_id, quality, str(path), CONTENT_HASH, len(DATA)))
+
+
+def test_lookup_hit_and_miss(store, db, tmp_path):
+    """
+    Test that a stored video is found for its own id and quality only,
+    materializes with the same content, and is forgotten once its blob is gone.
+    """
+    ingest(store, db, tmp_path / "first.mp4")
+
+    assert store.lookup(db, "abc", VideoQuality.SD) is None
+    assert store.lookup(db, "other", VideoQuality.HD) is None
+    stored = store.lookup(db, "abc", VideoQuality.HD)
+    assert stored.content_hash == CONTENT_HASH
+
+    target = tmp_path / "second.mp4"
+    asyncio.run(store.materialize(db, stored, str(target)))
+    assert target.read_bytes() == DATA
+    assert stored.hit_count == 1
+    assert stored.saved_bytes == len(DATA)
+
+    # same content under another id shares the blob
+    ingest(store, db, tmp_path / "mirror.mp4", video_id="mirror")
+    assert store.get_stats(db)["blob_count"] == 1
+
+    os.remove(stored.blob_path)
+    assert store.lookup(db, "abc", VideoQuality.HD) is None
+    assert db.query(StoredVideo).filter_by(video_id="abc").count() == 0
+
+
+def test_link_fallback_chain(store, tmp_path, monkeypatch):
+    """
+    Test that linking prefers reflink, then a hard link, then a plain copy.
+    """
+    blob = tmp_path / "blob"
+    blob.write_bytes(DATA)
+
+    class FakeFcntl:
+        @staticmethod
+        def ioctl(fd, request, arg):
+            os.write(fd, DATA)
+
+    monkeypatch.setattr(content_store, "fcntl", FakeFcntl)
+    assert store._link(str(blob), str(tmp_path / "reflink.mp4")) == "reflink"
+    assert not os.path.samefile(blob, tmp_path / "reflink.mp4")
+
+    monkeypatch.setattr(content_store, "fcntl", None)
+    assert store._link(str(blob), str(tmp_path / "hardlink.mp4")) == "hardlink"
+    assert os.path.samefile(blob, tmp_path / "hardlink.mp4")
+
+    def cross_device(src, dst):
+        raise OSError(errno.EXDEV, "cross-device link")
+
+    monkeypatch.setattr(os, "link", cross_device)
+    assert store._link(str(blob), str(tmp_path / "copy.mp4")) == "copy"
+    assert (tmp_path / "copy.mp4").read_bytes() == DATA
+    assert not os.path.exists(tmp_path / "copy.mp4.link")
+
+
+def test_deleting_last_task_frees_the_blob(store, db, tmp_path):
+    """
+    Test that a blob stays while any task references its content and is removed,
+    with its records, when the last such task is deleted.
+    """
+    ingest(store, db, tmp_path / "a.mp4")
+    blob_path = store.lookup(db, "abc", VideoQuality.HD).blob_path
+    for name in ("a", "b"):
+        db.add(
+            DownloadTask(
+                task_id=name,
+                video_url="u",
+                status=TaskStatus.COMPLETED,
+                file_path=str(tmp_path / f"{name}.mp4"),
+                content_hash=CONTENT_HASH,
+            )
+        )
+    db.commit()
+
+    manager = TaskManager()
+    manager.content_store = store
+    assert manager.delete_task(db, "a")
+    assert os.path.exists(blob_path)
+
+    assert manager.delete_task(db, "b")
+    assert not os.path.exists(blob_path)
+    assert db.query(StoredVideo).count() == 0
+    assert store.release(db, CONTENT_HASH) is False
+
+
+def test_deleting_a_task_keeps_a_file_other_tasks_use(db, tmp_path):
+    """
+    Test that deleting a task leaves its file alone while another task still points at it.
+    """
+    shared = tmp_path / "shared.mp4"
+    shared.write_bytes(DATA)
+    for name in ("a", "b"):
+        db.add(
+            DownloadTask(
+                task_id=name,
+                video_url="u",
+                status=TaskStatus.COMPLETED,
+                file_path=str(shared),
+            )
+        )
+    db.commit()
+
+    manager = TaskManager()
+    assert manager.delete_task(db, "a")
+    assert shared.exists()
+    assert manager.delete_task(db, "b")
+    assert not shared.exists()
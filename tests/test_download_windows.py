@@ -0,0 +1,89 @@
+import sys
+import os
+import asyncio
+from datetime import datetime, timedelta
+import pytest
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.config import settings
+from app.models import DownloadTask, TaskStatus
+from app.services.task_manager import TaskManager
+from app.services.windows import DownloadWindow
+
+
+def test_overnight_window():
+    """
+    Test that a window crossing midnight opens and closes on the right days.
+    """
+    window = DownloadWindow.parse("23:00-07:00")
+    day = datetime(2026, 10, 16)
+
+    assert window.contains(day.replace(hour=23, minute=30))
+    assert window.contains(day.replace(hour=6, minute=59))
+    assert not window.contains(day.replace(hour=7))
+    assert window.next_open(day.replace(hour=12)) == day.replace(hour=23)
+    assert window.next_close(day.replace(hour=12)) == day.replace(hour=7) + timedelta(
+        days=1
+    )
+    assert window.next_close(day.replace(hour=1)) == day.replace(hour=7)
+
+    with pytest.raises(ValueError):
+        DownloadWindow.parse("08:00-08:00")
+    with pytest.raises(ValueError):
+        DownloadWindow.parse("8 to 9")
+
+
+def test_scheduled_tasks_wait_and_closed_windows_requeue(session_factory, monkeypatch):
+    """
+    Test that a task scheduled for later is held back instead of queued,
+    and a download still running when its window closes is requeued for the next window.
+    """
+    monkeypatch.setattr(settings, "EMBEDDED_WORKER", True)
+
+    now = datetime.now()
+    later = now + timedelta(hours=1)
+    # 当前时间之后一小时开始、两小时结束的下载时段
+    window = f"{later:%H:%M}-{later + timedelta(hours=1):%H:%M}"
+    db = session_factory()
+    db.add_all(
+        [
+            DownloadTask(
+                task_id="scheduled",
+                video_url="u",
+                status=TaskStatus.PENDING,
+                scheduled_at=later,
+            ),
+            DownloadTask(
+                task_id="running",
+                video_url="u",
+                status=TaskStatus.DOWNLOADING,
+                download_window=window,
+            ),
+        ]
+    )
+    db.commit()
+
+    async def run():
+        manager = TaskManager()
+        await manager.start_task(db, "scheduled")
+        manager.leased_tasks.add("running")
+        manager._close_window("running", now)
+        deferred = set(manager.deferred_tasks)
+        await manager.shutdown()
+        return manager, deferred
+
+    manager, deferred = asyncio.run(run())
+    assert manager.scheduler.queued_count == 0
+    assert deferred == {"scheduled", "running"}
+
+    db.expire_all()
+    scheduled = (
+        db.query(DownloadTask).filter(DownloadTask.task_id == "scheduled").first()
+    )
+    running = db.query(DownloadTask).filter(DownloadTask.task_id == "running").first()
+    assert scheduled.status == TaskStatus.PENDING and scheduled.queued_at == later
+    assert running.status == TaskStatus.PENDING
+    assert running.queued_at == DownloadWindow.parse(window).next_open(now)
+    db.close()
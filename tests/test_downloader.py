@@ -0,0 +1,480 @@
+import sys
+import os
+import re
+import json
+import asyncio
+import hashlib
+import itertools
+import httpx
+import pytest
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.services import downloader as downloader_module
+from app.services.circuit import HostCircuitBreaker
+from app.services.downloader import (
+    VideoDownloader,
+    CancelToken,
+    HostUnavailableError,
+    _DownloadJob,
+)
+from app.services.http_pool import DownloadClientPool
+
+DATA = os.urandom(9 * 1024 * 1024 + 321)
+ETAG = '"%s"' % hashlib.md5(DATA).hexdigest()
+
+
+def cdn_handler(request):
+    """
+    Serve DATA with Range and If-Range support, like the xhscdn edge.
+    URLs containing "expired" are rejected with 403, "missing" with 404 and "down" with 503.
+    """
+    if "expired" in request.url.path:
+        return httpx.Response(403)
+    if "missing" in request.url.path:
+        return httpx.Response(404)
+    if "down" in request.url.path:
+        return httpx.Response(503)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if not range_header or (if_range and if_range != ETAG):
+        return httpx.Response(200, content=DATA, headers={"etag": ETAG})
+
+    match = re.match(r"bytes=(\d+)-(\d*)", range_header)
+    start = int(match.group(1))
+    end = int(match.group(2)) if match.group(2) else len(DATA) - 1
+    if start >= len(DATA):
+        return httpx.Response(416)
+    return httpx.Response(
+        206,
+        content=DATA[start : end + 1],
+        headers={"content-range": f"bytes {start}-{end}/{len(DATA)}", "etag": ETAG},
+    )
+
+
+@pytest.fixture
+def downloader():
+    """
+    Create a downloader whose shared client talks to the mock CDN.
+    """
+    pool = DownloadClientPool()
+    pool._client = httpx.AsyncClient(transport=httpx.MockTransport(cdn_handler))
+    downloader = VideoDownloader(pool)
+    downloader.segment_min_size = 2 * 1024 * 1024
+    yield downloader
+    asyncio.run(pool.close())
+
+
+def download(downloader, file_path):
+    """
+    Run a download and return (success, size, content_hash).
+    """
+    completed = {}
+
+    async def complete_callback(size, content_hash):
+        completed.update(size=size, content_hash=content_hash)
+
+    success = asyncio.run(
+        downloader.download_video(
+            "https://cdn.test/v.mp4", file_path, complete_callback=complete_callback
+        )
+    )
+    return success, completed.get("size"), completed.get("content_hash")
+
+
+def test_segmented_download(downloader, tmp_path):
+    """
+    Test that a large file is fetched in ranges, reassembled and hashed.
+    """
+    file_path = str(tmp_path / "video.mp4")
+    success, size, content_hash = download(downloader, file_path)
+
+    assert success
+    assert size == len(DATA)
+    assert content_hash == hashlib.sha256(DATA).hexdigest()
+    with open(file_path, "rb") as f:
+        assert f.read() == DATA
+    assert os.listdir(tmp_path) == ["video.mp4"]
+
+
+def test_single_stream_download(downloader, tmp_path):
+    """
+    Test the single-connection path when segmentation is disabled.
+    """
+    downloader.segments = 1
+    file_path = str(tmp_path / "video.mp4")
+    success, _, content_hash = download(downloader, file_path)
+
+    assert success
+    assert content_hash == hashlib.sha256(DATA).hexdigest()
+
+    with open(file_path, "rb") as f:
+        assert f.read() == DATA
+
+
+def test_cancel_only_affects_own_download(downloader, tmp_path):
+    """
+    Test that cancelling one download leaves a concurrent one running.
+    """
+    cancelled = CancelToken()
+    cancelled.cancel()
+
+    async def run():
+        return await asyncio.gather(
+            downloader.download_video(
+                "https://cdn.test/v.mp4",
+                str(tmp_path / "a.mp4"),
+                cancel_token=cancelled,
+            ),
+            downloader.download_video(
+                "https://cdn.test/v.mp4", str(tmp_path / "b.mp4")
+            ),
+        )
+
+    first, second = asyncio.run(run())
+
+    assert first is False
+    assert second is True
+    with open(tmp_path / "b.mp4", "rb") as f:
+        assert f.read() == DATA
+
+
+def test_resume_discards_changed_file(downloader, tmp_path):
+    """
+    Test that a partial download of a different object is not stitched into the result.
+    """
+    file_path = str(tmp_path / "video.mp4")
+    temp_file = file_path + ".tmp"
+    half = len(DATA) // 2
+    with open(temp_file, "wb") as f:
+        f.write(b"x" * len(DATA))
+    with open(temp_file + ".state", "w") as f:
+        json.dump(
+            {
+                "total_size": len(DATA),
+                "segments": [[0, half - 1, half], [half, len(DATA) - 1, 0]],
+                "etag": '"stale"',
+            },
+            f,
+        )
+
+    success, _, content_hash = download(downloader, file_path)
+
+    assert success
+    assert content_hash == hashlib.sha256(DATA).hexdigest()
+    with open(file_path, "rb") as f:
+        assert f.read() == DATA
+
+
+def test_stream_resume_rejects_misplaced_range(downloader, tmp_path):
+    """
+    Test that resuming a stream download without a state file restarts from scratch
+    when the 206 response does not start where the temp file ends.
+    """
+    downloader.segments = 1
+    downloader.backoff_base = 0
+
+    async def body():
+        yield DATA
+
+    def handler(request):
+        # no content-length, and the requested start offset is ignored
+        if request.headers.get("range"):
+            headers = {"content-range": f"bytes 0-{len(DATA) - 1}/{len(DATA)}"}
+            return httpx.Response(206, content=body(), headers=headers)
+        return httpx.Response(200, content=body())
+
+    downloader.client_pool._client = httpx.AsyncClient(
+        transport=httpx.MockTransport(handler)
+    )
+    file_path = str(tmp_path / "video.mp4")
+    with open(file_path + ".tmp", "wb") as f:
+        f.write(DATA[:1000])
+
+    success, _, content_hash = download(downloader, file_path)
+
+    assert success
+    assert content_hash == hashlib.sha256(DATA).hexdigest()
+    with open(file_path, "rb") as f:
+        assert f.read() == DATA
+
+
+def test_expired_url_is_resolved_again(downloader, tmp_path):
+    """
+    Test that a 403 from an expired URL fetches a fresh URL and continues.
+    """
+    resolved = []
+
+    async def url_resolver():
+        resolved.append(True)
+        return "https://cdn.test/v.mp4"
+
+    file_path = str(tmp_path / "video.mp4")
+    success = asyncio.run(
+        downloader.download_video(
+            "https://cdn.test/expired/v.mp4", file_path, url_resolver=url_resolver
+        )
+    )
+
+    assert success
+    assert resolved == [True]
+    with open(file_path, "rb") as f:
+        assert f.read() == DATA
+
+
+def test_switches_away_from_slow_mirror(downloader, tmp_path):
+    """
+    Test that a mirror whose throughput collapses is abandoned for the next one.
+    """
+
+    async def trickle(start):
+        for offset in range(start, start + 100 * 256, 256):
+            await asyncio.sleep(0.05)
+            yield DATA[offset : offset + 256]
+
+    def handler(request):
+        range_header = request.headers.get("range")
+        if request.url.host == "slow.test" and range_header != "bytes=0-0":
+            start = int(re.match(r"bytes=(\d+)-", range_header).group(1))
+            return httpx.Response(206, content=trickle(start))
+        return cdn_handler(request)
+
+    downloader.client_pool._client = httpx.AsyncClient(
+        transport=httpx.MockTransport(handler)
+    )
+    downloader.mirror_check_interval = 0.2
+    downloader.mirrors.record_latency("https://slow.test/v.mp4", 0.001)
+    downloader.mirrors.record_latency("https://fast.test/v.mp4", 0.1)
+
+    file_path = str(tmp_path / "video.mp4")
+    success = asyncio.run(
+        downloader.download_video(
+            "https://slow.test/v.mp4",
+            file_path,
+            mirror_urls=["https://fast.test/v.mp4"],
+        )
+    )
+
+    assert success
+    with open(file_path, "rb") as f:
+        assert f.read() == DATA
+    assert downloader.mirrors.to_dict()["slow.test"]["throughput"] < 20 * 1024
+
+
+def test_fatal_error_is_not_retried(downloader, tmp_path):
+    """
+    Test that a 404 fails immediately without spending retries.
+    """
+    errors = []
+
+    async def error_callback(retry_count, error):
+        errors.append(retry_count)
+
+    success = asyncio.run(
+        downloader.download_video(
+            "https://cdn.test/missing.mp4",
+            str(tmp_path / "v.mp4"),
+            error_callback=error_callback,
+        )
+    )
+
+    assert success is False
+    assert errors == [0]
+
+
+def test_failing_host_opens_circuit(downloader, tmp_path):
+    """
+    Test that repeated 5xx responses trip the host's breaker and defer the download
+    before the retry budget is spent.
+    """
+    downloader.breaker = HostCircuitBreaker(threshold=2, open_seconds=30)
+    downloader.backoff_base = 0
+    errors = []
+
+    async def error_callback(retry_count, error):
+        errors.append(retry_count)
+
+    with pytest.raises(HostUnavailableError) as raised:
+        asyncio.run(
+            downloader.download_video(
+                "https://cdn.test/down.mp4",
+                str(tmp_path / "v.mp4"),
+                error_callback=error_callback,
+            )
+        )
+
+    assert errors == [1, 2]
+    assert raised.value.host == "cdn.test"
+    assert raised.value.retry_after > 0
+    assert downloader.breaker.retry_after("https://cdn.test/v.mp4") > 0
+
+
+def test_plan_segments(downloader, tmp_path):
+    """
+    Test that segments cover the file end to end and the temp file is preallocated,
+    while small files and servers without Range support fall back to one stream.
+    """
+
+    def job(name):
+        file_path = str(tmp_path / name)
+        return _DownloadJob(
+            url="https://cdn.test/v.mp4",
+            file_path=file_path,
+            temp_file=file_path + ".tmp",
+            task_key=name,
+            cancel_token=CancelToken(),
+        )
+
+    planned = job("a.mp4")
+    state = asyncio.run(downloader._plan_segments(planned))
+    segments = state["segments"]
+    assert len(segments) == 4
+    assert segments[0][0] == 0 and segments[-1][1] == len(DATA) - 1
+    assert all(prev[1] + 1 == nxt[0] for prev, nxt in itertools.pairwise(segments))
+    assert all(done == 0 for _, _, done in segments)
+    assert os.path.getsize(planned.temp_file) == len(DATA)
+    assert downloader._load_segment_state(planned.temp_file) == state
+
+    downloader.segment_min_size = len(DATA)
+    assert asyncio.run(downloader._plan_segments(job("b.mp4"))) is None
+
+    downloader.segment_min_size = 2 * 1024 * 1024
+    downloader.client_pool._client = httpx.AsyncClient(
+        transport=httpx.MockTransport(lambda request: httpx.Response(200, content=DATA))
+    )
+    assert asyncio.run(downloader._plan_segments(job("c.mp4"))) is None
+
+
+def test_segmented_resume_fetches_only_missing_ranges(downloader, tmp_path):
+    """
+    Test that resuming a segmented download requests each segment from its
+    persisted offset and keeps the bytes already on disk.
+    """
+    ranges = []
+
+    def handler(request):
+        ranges.append(request.headers.get("range"))
+        return cdn_handler(request)
+
+    downloader.client_pool._client = httpx.AsyncClient(
+        transport=httpx.MockTransport(handler)
+    )
+    file_path = str(tmp_path / "video.mp4")
+    temp_file = file_path + ".tmp"
+    half = len(DATA) // 2
+    with open(temp_file, "wb") as f:
+        f.write(DATA[:1000] + b"\0" * (len(DATA) - 1000))
+    with open(temp_file + ".state", "w") as f:
+        json.dump(
+            {
+                "total_size": len(DATA),
+                "segments": [[0, half - 1, 1000], [half, len(DATA) - 1, 0]],
+                "etag": ETAG,
+            },
+            f,
+        )
+
+    success, _, content_hash = download(downloader, file_path)
+
+    assert success
+    assert sorted(ranges) == sorted(
+        [f"bytes=1000-{half - 1}", f"bytes={half}-{len(DATA) - 1}"]
+    )
+    assert content_hash == hashlib.sha256(DATA).hexdigest()
+    with open(file_path, "rb") as f:
+        assert f.read() == DATA
+
+
+def test_retry_budget_resets_after_progress(downloader, tmp_path):
+    """
+    Test that a connection dropping after each chunk keeps resuming as long as data
+    arrives, and only consecutive failures without progress use up the retries.
+    """
+    downloader.segments = 1
+    downloader.backoff_base = 0
+    downloader.retry_times = 2
+    downloader.breaker = HostCircuitBreaker(threshold=10, open_seconds=30)
+    chunk = len(DATA) // 5 + 1
+
+    def handler(request):
+        match = re.match(r"bytes=(\d+)-", request.headers.get("range", ""))
+        start = int(match.group(1)) if match else 0
+
+        async def body():
+            yield DATA[start : start + chunk]
+            if start + chunk < len(DATA):
+                raise httpx.ReadError("connection reset")
+
+        headers = {"etag": ETAG}
+        if match:
+            headers["content-range"] = f"bytes {start}-{len(DATA) - 1}/{len(DATA)}"
+        return httpx.Response(206 if match else 200, content=body(), headers=headers)
+
+    downloader.client_pool._client = httpx.AsyncClient(
+        transport=httpx.MockTransport(handler)
+    )
+    errors = []
+
+    async def error_callback(retry_count, error):
+        errors.append(retry_count)
+
+    file_path = str(tmp_path / "video.mp4")
+    success = asyncio.run(
+        downloader.download_video(
+            "https://cdn.test/v.mp4", file_path, error_callback=error_callback
+        )
+    )
+
+    assert success
+    # more failures than retry_times, each after progress
+    assert len(errors) > downloader.retry_times
+    assert set(errors) == {1}
+    with open(file_path, "rb") as f:
+        assert f.read() == DATA
+
+
+def test_progress_is_recorded_before_preallocation(downloader, tmp_path, monkeypatch):
+    """
+    Test that a crash while preallocating never leaves a temp file without a state file.
+    """
+
+    def crash(fd, size):
+        os.ftruncate(fd, size)
+        raise RuntimeError("killed")
+
+    monkeypatch.setattr(downloader_module, "preallocate", crash)
+    file_path = str(tmp_path / "v.mp4")
+    job = _DownloadJob(
+        url="https://cdn.test/v.mp4",
+        file_path=file_path,
+        temp_file=file_path + ".tmp",
+        task_key="v",
+        cancel_token=CancelToken(),
+    )
+    with pytest.raises(RuntimeError):
+        asyncio.run(downloader._plan_segments(job))
+
+    state = downloader._load_segment_state(job.temp_file)
+    assert state is not None
+    assert all(done == 0 for _, _, done in state["segments"])
+
+
+def test_preallocated_temp_without_state_is_downloaded_again(downloader, tmp_path):
+    """
+    Test that a full-size temp file with no state file (a crash right after
+    preallocation) is not taken as complete when the server answers 416.
+    """
+    downloader.backoff_base = 0
+    file_path = str(tmp_path / "video.mp4")
+    with open(file_path + ".tmp", "wb") as f:
+        f.truncate(len(DATA))
+
+    success, size, content_hash = download(downloader, file_path)
+
+    assert success
+    assert size == len(DATA)
+    assert content_hash == hashlib.sha256(DATA).hexdigest()
+    with open(file_path, "rb") as f:
+        assert f.read() == DATA
@@ -0,0 +1,119 @@
+import sys
+import os
+import asyncio
+import errno
+import threading
+import pytest
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.services.file_writer import ChunkWriter, preallocate
+
+
+def test_full_queue_pauses_the_producer(tmp_path):
+    """
+    Test that writes wait once max_pending_bytes are queued and resume as the
+    writer thread drains them, without blocking the event loop.
+    """
+    path = str(tmp_path / "out.bin")
+    disk = threading.Event()
+
+    async def run():
+        writer = ChunkWriter(path, max_pending_bytes=4)
+        pwrite = writer._pwrite
+
+        def slow_pwrite(data, offset):
+            disk.wait()
+            pwrite(data, offset)
+
+        writer._pwrite = slow_pwrite
+        await writer.write(b"a" * 4)
+        second = asyncio.create_task(writer.write(b"b" * 4))
+        await asyncio.sleep(0.05)
+        # the loop keeps running while the second write waits for a free slot
+        assert not second.done()
+
+        disk.set()
+        await asyncio.wait_for(second, timeout=1)
+        await writer.close()
+        return writer
+
+    writer = asyncio.run(run())
+
+    assert writer.backpressure_seconds > 0
+    assert writer.stats.bytes_written == 8
+    with open(path, "rb") as f:
+        assert f.read() == b"aaaabbbb"
+
+
+def test_out_of_order_offsets_land_in_place(tmp_path):
+    """
+    Test that chunks written at explicit offsets into a preallocated file
+    end up at those offsets regardless of submission order.
+    """
+    path = str(tmp_path / "out.bin")
+
+    async def run():
+        writer = ChunkWriter(path, max_pending_bytes=1024)
+        assert os.path.getsize(path) == 0
+        await writer.preallocate(12)
+        assert os.path.getsize(path) == 12
+        await writer.write(b"cccc", 8)
+        await writer.write(b"aaaa", 0)
+        await writer.write(b"bbbb", 4)
+        await writer.close()
+
+    asyncio.run(run())
+
+    with open(path, "rb") as f:
+        assert f.read() == b"aaaabbbbcccc"
+
+
+def test_preallocate_falls_back_to_ftruncate(tmp_path, monkeypatch):
+    """
+    Test that filesystems without fallocate get a sparse file of the right size,
+    and that other fallocate errors are not swallowed.
+    """
+
+    def unsupported(fd, offset, size):
+        raise OSError(errno.EOPNOTSUPP, "not supported")
+
+    monkeypatch.setattr(os, "posix_fallocate", unsupported, raising=False)
+    fd = os.open(tmp_path / "sparse.bin", os.O_RDWR | os.O_CREAT)
+    try:
+        assert preallocate(fd, 4096) is False
+        assert os.fstat(fd).st_size == 4096
+    finally:
+        os.close(fd)
+
+    def no_space(fd, offset, size):
+        raise OSError(errno.ENOSPC, "no space")
+
+    monkeypatch.setattr(os, "posix_fallocate", no_space, raising=False)
+    fd = os.open(tmp_path / "full.bin", os.O_RDWR | os.O_CREAT)
+    try:
+        with pytest.raises(OSError) as raised:
+            preallocate(fd, 4096)
+        assert raised.value.errno == errno.ENOSPC
+    finally:
+        os.close(fd)
+
+
+def test_chunk_larger_than_budget_is_accepted_alone(tmp_path):
+    """
+    Test that a chunk bigger than max_pending_bytes is still written
+    when nothing else is queued, instead of waiting forever.
+    """
+    path = str(tmp_path / "out.bin")
+
+    async def run():
+        writer = ChunkWriter(path, max_pending_bytes=4)
+        await asyncio.wait_for(writer.write(b"x" * 16), timeout=1)
+        await asyncio.wait_for(writer.write(b"y" * 16), timeout=1)
+        await writer.close()
+
+    asyncio.run(run())
+
+    with open(path, "rb") as f:
+        assert f.read() == b"x" * 16 + b"y" * 16
@@ -1,19 +1,19 @@
 import sys
 import os
+import tempfile
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 import pytest
 
 # Add the project root to the Python path
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 from app.main import app
 from app.database import Base
 from app.routers.items import get_db
 
-
-SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
+SQLALCHEMY_DATABASE_URL = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test.db')}"
 
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
@@ -78,4 +78,4 @@ def test_read_items(db_session):
     data = response.json()
     assert len(data) == 2
     assert data[0]["name"] == "Foo"
-    assert data[1]["name"] == "Bar"
\ No newline at end of file
+    assert data[1]["name"] == "Bar"
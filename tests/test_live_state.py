@@ -0,0 +1,82 @@
+import sys
+import os
+from datetime import datetime
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.models import DownloadTask, TaskStatus
+from app.services.live_state import LiveTaskRegistry
+from app.services.task_manager import TaskManager
+
+
+def test_cache_is_invalidated_by_task_commits(session_factory):
+    """
+    Test that cached reads survive progress-only updates and are dropped on task commits.
+    """
+
+    registry = LiveTaskRegistry()
+    registry.watch(session_factory)
+    registry.store("tasks", ["cached"])
+
+    db = session_factory()
+    db.add(DownloadTask(task_id="a", video_url="u", status=TaskStatus.DOWNLOADING))
+    db.commit()
+    assert registry.cached("tasks") is None
+
+    registry.store("tasks", ["cached"])
+    registry.update("a", progress=50.0)
+    db.commit()
+    assert registry.cached("tasks") == ["cached"]
+    assert registry.get("a") == {"progress": 50.0}
+
+    db.query(DownloadTask).filter_by(task_id="a").one().status = TaskStatus.COMPLETED
+    db.commit()
+    assert registry.cached("tasks") is None
+    db.close()
+
+
+def test_watch_registers_once_and_unwatch_removes_listeners(session_factory):
+    """
+    Test that watching twice registers a single set of listeners and unwatching stops invalidation.
+    """
+    registry = LiveTaskRegistry()
+    registry.watch(session_factory)
+    registry.watch(session_factory)
+    assert len(registry._listeners) == 2
+
+    registry.unwatch()
+    registry.store("tasks", ["cached"])
+    db = session_factory()
+    db.add(DownloadTask(task_id="a", video_url="u", status=TaskStatus.PENDING))
+    db.commit()
+    db.close()
+    assert registry.cached("tasks") == ["cached"]
+
+
+def test_claiming_tasks_invalidates_the_cache(session_factory):
+    """
+    Test that conditional updates made outside the session tracking still drop cached reads.
+    """
+    db = session_factory()
+    db.add(
+        DownloadTask(
+            task_id="a",
+            video_url="u",
+            status=TaskStatus.PENDING,
+            queued_at=datetime.now(),
+        )
+    )
+    db.commit()
+    db.close()
+
+    manager = TaskManager(worker_id="worker")
+    manager.live_state.cache_size = 64
+    manager.live_state.store("tasks", ["cached"])
+    claimed, _ = manager._claim_tasks(1)
+    assert claimed == ["a"]
+    assert manager.live_state.cached("tasks") is None
+
+    manager.live_state.store("tasks", ["cached"])
+    manager._release_claimed_tasks()
+    assert manager.live_state.cached("tasks") is None
@@ -0,0 +1,41 @@
+import sys
+import os
+import asyncio
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.models import DownloadTask, TaskStatus
+from app.services.progress import ProgressBuffer
+
+
+def test_progress_updates_are_batched(session_factory):
+    """
+    Test that updates are coalesced into one transaction and never touch finished tasks.
+    """
+
+    db = session_factory()
+    db.add(DownloadTask(task_id="a", video_url="u", status=TaskStatus.DOWNLOADING))
+    db.add(
+        DownloadTask(
+            task_id="b", video_url="u", status=TaskStatus.COMPLETED, progress=100.0
+        )
+    )
+    db.commit()
+
+    async def run():
+        buffer = ProgressBuffer(0.05, session_factory)
+        for downloaded in range(1, 51):
+            buffer.update("a", downloaded_size=downloaded, progress=downloaded * 2.0)
+            buffer.update("b", progress=10.0)
+        await asyncio.sleep(0.2)
+        await buffer.close()
+        return buffer
+
+    buffer = asyncio.run(run())
+
+    assert buffer.flushes == 1
+    db.expire_all()
+    assert db.query(DownloadTask).filter_by(task_id="a").one().downloaded_size == 50
+    assert db.query(DownloadTask).filter_by(task_id="b").one().progress == 100.0
+    db.close()
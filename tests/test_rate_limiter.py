@@ -0,0 +1,58 @@
+import sys
+import os
+import asyncio
+import time
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.services.rate_limiter import BandwidthLimiter
+
+
+async def run_streams(limiter, streams, duration):
+    """
+    Run (task_key, stream_count) readers for a while and count granted bytes.
+    """
+    granted = {}
+
+    async def reader(task_key):
+        while True:
+            await limiter.acquire(task_key, 10 * 1024)
+            granted[task_key] = granted.get(task_key, 0) + 10 * 1024
+            await asyncio.sleep(0)
+
+    readers = [
+        asyncio.create_task(reader(task_key))
+        for task_key, count in streams
+        for _ in range(count)
+    ]
+    await asyncio.sleep(duration)
+    for reader_task in readers:
+        reader_task.cancel()
+    await asyncio.gather(*readers, return_exceptions=True)
+    return granted
+
+
+def test_global_limit_is_shared_fairly():
+    """
+    Test that a task with many streams does not starve a single-stream task.
+    """
+    limiter = BandwidthLimiter(global_rate=200 * 1024)
+    granted = asyncio.run(run_streams(limiter, [("a", 4), ("b", 1)], 1.0))
+
+    assert abs(granted["a"] - granted["b"]) <= 40 * 1024
+    assert granted["a"] + granted["b"] <= 200 * 1024 + 40 * 1024
+
+
+def test_task_limit_and_runtime_configure():
+    """
+    Test the per-task cap and that it can be lifted at runtime.
+    """
+    limiter = BandwidthLimiter(task_rate=50 * 1024)
+    start = time.monotonic()
+    granted = asyncio.run(run_streams(limiter, [("a", 2)], 0.5))
+    assert granted["a"] <= 50 * 1024 * (time.monotonic() - start) + 20 * 1024
+
+    limiter.configure(task_rate=0)
+    granted = asyncio.run(run_streams(limiter, [("a", 1)], 0.1))
+    assert granted["a"] > 1024 * 1024
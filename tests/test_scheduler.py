@@ -0,0 +1,87 @@
+import sys
+import os
+import asyncio
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.services.scheduler import DownloadScheduler
+
+
+def test_scheduler_bounds_concurrency_and_orders_by_priority():
+    """
+    Test that at most N downloads run and queued ones start by priority, then FIFO.
+    """
+
+    async def run():
+        started = []
+        done = {}
+
+        def launch(task_id, payload):
+            started.append(task_id)
+            done[task_id] = asyncio.Event()
+            return asyncio.create_task(done[task_id].wait())
+
+        scheduler = DownloadScheduler(launch, 2)
+        for task_id, priority in [("a", 0), ("b", 0), ("c", 0), ("d", 5), ("e", 0)]:
+            scheduler.submit(task_id, priority)
+
+        assert started == ["a", "b"]
+        assert scheduler.positions() == {"d": 1, "c": 2, "e": 3}
+
+        scheduler.reprioritize("e", 10)
+        done["a"].set()
+        await asyncio.sleep(0.01)
+        assert started == ["a", "b", "e"]
+
+        scheduler.remove("c")
+        scheduler.set_concurrency(5)
+        assert started == ["a", "b", "e", "d"]
+        assert scheduler.running_count == 3
+
+        for event in done.values():
+            event.set()
+
+    asyncio.run(run())
+
+
+def test_released_slot_goes_to_queue_and_is_reacquired_first():
+    """
+    Test that a download giving up its slot lets a queued one start,
+    and gets the next free slot back before later queued downloads.
+    """
+
+    async def run():
+        started = []
+        done = {}
+
+        def launch(task_id, payload):
+            started.append(task_id)
+            done[task_id] = asyncio.Event()
+            return asyncio.create_task(done[task_id].wait())
+
+        scheduler = DownloadScheduler(launch, 1)
+        for task_id in ("a", "b", "c"):
+            scheduler.submit(task_id)
+        first = next(iter(scheduler._running))
+
+        assert scheduler.release(first) is True
+        assert started == ["a", "b"]
+        assert scheduler.release(first) is False
+
+        reacquire = asyncio.create_task(scheduler.reacquire(first))
+        await asyncio.sleep(0.01)
+        assert not reacquire.done()
+
+        done["b"].set()
+        await asyncio.sleep(0.01)
+        assert reacquire.done()
+        assert started == ["a", "b"]
+        assert scheduler.running_count == 1
+
+        done["a"].set()
+        await asyncio.sleep(0.01)
+        assert started == ["a", "b", "c"]
+        done["c"].set()
+
+    asyncio.run(run())
@@ -0,0 +1,56 @@
+import sys
+import os
+import logging
+from sqlalchemy import create_engine, inspect, text
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app import database
+
+
+def test_upgrade_adds_missing_columns_and_indexes(tmp_path, monkeypatch, caplog):
+    """
+    Test that upgrading an old database adds new columns and indexes,
+    and skips a unique index the existing rows violate with a warning.
+    """
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                "CREATE TABLE download_tasks "
+                "(id INTEGER PRIMARY KEY, task_id VARCHAR, video_url VARCHAR)"
+            )
+        )
+        conn.execute(
+            text(
+                "CREATE TABLE stored_videos "
+                "(id INTEGER PRIMARY KEY, video_id VARCHAR, quality VARCHAR)"
+            )
+        )
+        conn.execute(
+            text(
+                "INSERT INTO stored_videos (video_id, quality) "
+                "VALUES ('abc', 'HD'), ('abc', 'HD')"
+            )
+        )
+    monkeypatch.setattr(database, "engine", engine)
+
+    with caplog.at_level(logging.WARNING):
+        database.upgrade_schema()
+        database.upgrade_schema()
+
+    inspector = inspect(engine)
+    columns = {column["name"] for column in inspector.get_columns("download_tasks")}
+    assert {"queued_at", "worker_id", "content_hash"} <= columns
+    indexes = {index["name"] for index in inspector.get_indexes("download_tasks")}
+    assert {
+        "ix_download_tasks_queued_at",
+        "ix_download_tasks_cdn_host",
+        "ix_download_tasks_content_hash",
+        "ix_download_tasks_worker_lease",
+    } <= indexes
+    stored_indexes = {index["name"] for index in inspector.get_indexes("stored_videos")}
+    assert "ix_stored_videos_video_quality" not in stored_indexes
+    assert "ix_stored_videos_video_quality" in caplog.text
+    engine.dispose()
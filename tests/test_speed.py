@@ -0,0 +1,28 @@
+import sys
+import os
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.services import speed as speed_module
+from app.services.speed import SpeedEstimator
+
+
+def test_speed_decays_when_stalled(monkeypatch):
+    """
+    Test that speed covers only the window and drops to zero after a stall.
+    """
+    now = [100.0]
+    monkeypatch.setattr(speed_module.time, "monotonic", lambda: now[0])
+
+    estimator = SpeedEstimator(window=10.0)
+    for _ in range(20):
+        now[0] += 1
+        estimator.add(1024)
+
+    assert estimator.speed == 1024
+    assert estimator.eta(10 * 1024) == 10
+
+    now[0] += 30
+    assert estimator.speed == 0
+    assert estimator.eta(10 * 1024) is None
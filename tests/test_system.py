@@ -0,0 +1,31 @@
+import sys
+import os
+from fastapi.testclient import TestClient
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.config import settings
+from app.main import app
+
+client = TestClient(app)
+
+
+def test_limits_cannot_be_changed_without_an_embedded_worker(monkeypatch):
+    """
+    Test that changing the bandwidth or concurrency is refused when downloads run
+    in separate worker processes, and applied when they run in the API process.
+    """
+    monkeypatch.setattr(settings, "EMBEDDED_WORKER", False)
+    response = client.put("/api/system/bandwidth", json={"global_limit": 100})
+    assert response.status_code == 409
+    response = client.put(
+        "/api/system/concurrency", json={"max_concurrent_downloads": 2}
+    )
+    assert response.status_code == 409
+
+    monkeypatch.setattr(settings, "EMBEDDED_WORKER", True)
+    response = client.put("/api/system/bandwidth", json={"global_limit": 100})
+    assert response.status_code == 200
+    assert response.json()["data"]["global_limit"] == 100
+    client.put("/api/system/bandwidth", json={"global_limit": 0})
@@ -0,0 +1,177 @@
+import sys
+import os
+import asyncio
+import pytest
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.config import settings
+from app.models import DownloadTask, TaskStatus
+from app.schemas import DownloadTaskCreate
+from app.services.task_manager import TaskManager
+
+VIDEO_URL = "https://www.xiaohongshu.com/explore/abc"
+
+
+@pytest.fixture
+def manager(session_factory, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "DOWNLOAD_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "CONTENT_STORE_ENABLED", False)
+
+    manager = TaskManager()
+
+    async def get_video_info(video_url, use_cache=False):
+        return {"video_id": "abc", "title": "t", "author": "a"}
+
+    async def get_download_urls(video_id, quality="hd", use_cache=True):
+        return ["https://cdn/abc.mp4"]
+
+    monkeypatch.setattr(manager.xhs_api, "get_video_info", get_video_info)
+    monkeypatch.setattr(manager.xhs_api, "get_download_urls", get_download_urls)
+    return manager
+
+
+def test_create_task_returns_existing_task(manager, session_factory):
+    """
+    Test that creating the same video twice returns the existing task unless duplicates are allowed.
+    """
+
+    async def run():
+        db = session_factory()
+        try:
+            first = await manager.create_task(
+                db, DownloadTaskCreate(video_url=VIDEO_URL)
+            )
+            again = await manager.create_task(
+                db, DownloadTaskCreate(video_url=VIDEO_URL, priority=5)
+            )
+            forced = await manager.create_task(
+                db, DownloadTaskCreate(video_url=VIDEO_URL, allow_duplicate=True)
+            )
+            await asyncio.gather(*manager._enrichments)
+            return first.task_id, again.task_id, again.priority, forced.task_id
+        finally:
+            db.close()
+
+    first_id, again_id, priority, forced_id = asyncio.run(run())
+
+    assert again_id == first_id
+    assert priority == 5
+    assert forced_id != first_id
+    db = session_factory()
+    assert db.query(DownloadTask).count() == 2
+    db.close()
+
+
+def test_concurrent_downloads_share_one_stream(manager, session_factory, monkeypatch):
+    """
+    Test that two tasks for the same video download it once and both complete.
+    """
+    downloads = []
+
+    async def download_video(url, file_path, complete_callback=None, **kwargs):
+        downloads.append(file_path)
+        await asyncio.sleep(0.05)
+        with open(file_path, "wb") as f:
+            f.write(b"x" * 10)
+        await complete_callback(10, "hash")
+        return True
+
+    monkeypatch.setattr(manager.downloader, "download_video", download_video)
+
+    async def run():
+        db = session_factory()
+        try:
+            ids = []
+            for _ in range(2):
+                task = await manager.create_task(
+                    db, DownloadTaskCreate(video_url=VIDEO_URL, allow_duplicate=True)
+                )
+                ids.append(task.task_id)
+            await asyncio.gather(*manager._enrichments)
+            for task_id in ids:
+                await manager.start_task(db, task_id)
+            await asyncio.gather(*list(manager.active_tasks.values()))
+            return ids
+        finally:
+            db.close()
+
+    ids = asyncio.run(run())
+
+    assert len(downloads) == 1
+    db = session_factory()
+    tasks = db.query(DownloadTask).filter(DownloadTask.task_id.in_(ids)).all()
+    assert [task.status for task in tasks] == [TaskStatus.COMPLETED] * 2
+    assert {task.content_hash for task in tasks} == {"hash"}
+    leader, follower = sorted(tasks, key=lambda task: ids.index(task.task_id))
+    assert leader.file_path != follower.file_path
+
+    # each task owns its copy: deleting the leader leaves the follower's file
+    assert manager.delete_task(db, leader.task_id)
+    assert not os.path.exists(leader.file_path)
+    with open(follower.file_path, "rb") as f:
+        assert f.read() == b"x" * 10
+    db.close()
+    assert not manager.shared_downloads
+
+
+def test_waiting_task_does_not_hold_a_download_slot(
+    manager, session_factory, monkeypatch
+):
+    """
+    Test that a task waiting on a shared download frees its slot for other queued tasks.
+    """
+    manager.scheduler.set_concurrency(2)
+    release = asyncio.Event()
+    downloads = []
+
+    async def download_video(url, file_path, complete_callback=None, **kwargs):
+        downloads.append(file_path)
+        if len(downloads) == 1:
+            await release.wait()
+        with open(file_path, "wb") as f:
+            f.write(b"x" * 10)
+        await complete_callback(10, "hash")
+        return True
+
+    async def get_video_info(video_url, use_cache=False):
+        video_id = video_url.rsplit("/", 1)[-1]
+        return {"video_id": video_id, "title": video_id, "author": "a"}
+
+    monkeypatch.setattr(manager.downloader, "download_video", download_video)
+    monkeypatch.setattr(manager.xhs_api, "get_video_info", get_video_info)
+
+    async def run():
+        db = session_factory()
+        try:
+            ids = []
+            for url in (
+                VIDEO_URL,
+                VIDEO_URL,
+                "https://www.xiaohongshu.com/explore/xyz",
+            ):
+                task = await manager.create_task(
+                    db, DownloadTaskCreate(video_url=url, allow_duplicate=True)
+                )
+                ids.append(task.task_id)
+            await asyncio.gather(*manager._enrichments)
+            for task_id in ids:
+                await manager.start_task(db, task_id)
+            await asyncio.sleep(0.05)
+            # the leader is blocked, the follower is parked and the third task ran
+            assert len(downloads) == 2
+            assert manager.parked_tasks == {ids[1]}
+            release.set()
+            await asyncio.gather(*list(manager.active_tasks.values()))
+            return ids
+        finally:
+            db.close()
+
+    ids = asyncio.run(run())
+
+    db = session_factory()
+    tasks = db.query(DownloadTask).filter(DownloadTask.task_id.in_(ids)).all()
+    assert [task.status for task in tasks] == [TaskStatus.COMPLETED] * 3
+    db.close()
+    assert not manager.parked_tasks
@@ -0,0 +1,132 @@
+import sys
+import os
+import asyncio
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.config import settings
+from app.models import DownloadTask
+from app.schemas import DownloadTaskCreate
+from app.services.task_manager import TaskManager
+from app.services.xiaohongshu_api import XiaohongshuAPI
+
+VIDEO_URL = "https://www.xiaohongshu.com/explore/abc"
+
+
+def fake_fetch(api, fetches):
+    async def fetch_video_info(video_url, debug=False):
+        fetches.append(video_url)
+        await asyncio.sleep(0.01)
+        video_info = {
+            "video_id": "abc",
+            "title": "t",
+            "author": "a",
+            "video_url": "https://cdn/abc.mp4",
+        }
+        api._cache_info("abc", video_info)
+        return video_info
+
+    return fetch_video_info
+
+
+def test_video_info_cache_shares_inflight_fetch(monkeypatch):
+    """
+    Test that concurrent cached lookups share one page fetch and later lookups reuse it.
+    """
+    api = XiaohongshuAPI()
+    fetches = []
+    monkeypatch.setattr(api, "_fetch_video_info", fake_fetch(api, fetches))
+
+    async def run():
+        results = await asyncio.gather(
+            *(api.get_video_info(VIDEO_URL, use_cache=True) for _ in range(5))
+        )
+        cached = await api.get_download_urls("abc")
+        fresh = await api.get_download_urls("abc", use_cache=False)
+        return results, cached, fresh
+
+    results, cached, fresh = asyncio.run(run())
+
+    assert all(result["video_url"] == "https://cdn/abc.mp4" for result in results)
+    assert cached == fresh == ["https://cdn/abc.mp4"]
+    # 5 concurrent lookups + 1 cached lookup share one fetch; use_cache=False fetches again
+    assert len(fetches) == 2
+
+
+def test_create_task_returns_before_enrichment(session_factory, monkeypatch):
+    """
+    Test that create_task returns without metadata and the background enrichment fills it in.
+    """
+
+    manager = TaskManager()
+    fetches = []
+    monkeypatch.setattr(
+        manager.xhs_api, "_fetch_video_info", fake_fetch(manager.xhs_api, fetches)
+    )
+
+    async def run():
+        db = session_factory()
+        try:
+            task = await manager.create_task(
+                db, DownloadTaskCreate(video_url=VIDEO_URL)
+            )
+            created = (task.task_id, task.video_id, task.title)
+            await asyncio.gather(*manager._enrichments)
+            urls = await manager.xhs_api.get_download_urls("abc")
+            return created, urls
+        finally:
+            db.close()
+
+    (task_id, video_id, title), urls = asyncio.run(run())
+
+    assert video_id == "abc"
+    assert title is None
+    assert urls == ["https://cdn/abc.mp4"]
+    assert len(fetches) == 1
+
+    db = session_factory()
+    task = db.query(DownloadTask).filter(DownloadTask.task_id == task_id).first()
+    assert (task.title, task.author) == ("t", "a")
+    db.close()
+
+
+def test_cancelled_caller_does_not_cancel_shared_fetch(monkeypatch):
+    """
+    Test that cancelling the caller that started a fetch leaves other waiters with its result.
+    """
+    api = XiaohongshuAPI()
+    fetches = []
+    monkeypatch.setattr(api, "_fetch_video_info", fake_fetch(api, fetches))
+
+    async def run():
+        leader = asyncio.create_task(api.get_video_info(VIDEO_URL, use_cache=True))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(api.get_video_info(VIDEO_URL, use_cache=True))
+        await asyncio.sleep(0)
+        leader.cancel()
+        return await follower, leader.cancelled()
+
+    result, leader_cancelled = asyncio.run(run())
+
+    assert leader_cancelled
+    assert result["video_url"] == "https://cdn/abc.mp4"
+    assert len(fetches) == 1
+
+
+def test_video_info_cache_is_bounded(monkeypatch):
+    """
+    Test that the page cache evicts the least recently used entry and drops expired ones.
+    """
+    monkeypatch.setattr(settings, "VIDEO_INFO_CACHE_SIZE", 2)
+    api = XiaohongshuAPI()
+    for video_id in ("a", "b"):
+        api._cache_info(video_id, {"video_id": video_id})
+    assert api._cached_info("a") == {"video_id": "a"}
+    api._cache_info("c", {"video_id": "c"})
+    assert api._cached_info("b") is None
+    assert list(api._info_cache) == ["a", "c"]
+
+    monkeypatch.setattr(settings, "VIDEO_INFO_CACHE_TTL", 0)
+    assert api._cached_info("a") is None
+    assert "a" not in api._info_cache
@@ -0,0 +1,126 @@
+import sys
+import os
+import asyncio
+import json
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.models import DownloadTask, TaskStatus
+from app.services.events import TaskEventBus
+
+
+def test_committed_task_changes_are_published(session_factory):
+    """
+    Test that created, updated and deleted tasks are published on commit,
+    with only the changed fields for updates and nothing for rolled back changes.
+    """
+
+    async def run():
+        bus = TaskEventBus(interval=60)
+        bus.watch(session_factory)
+        subscriber = bus.subscribe()
+
+        db = session_factory()
+        db.add(DownloadTask(task_id="t1", video_url="u", status=TaskStatus.PENDING))
+        db.commit()
+        bus.flush()
+        created = subscriber.take()["t1"]
+        assert created["status"] == TaskStatus.PENDING
+        assert created["video_url"] == "u"
+
+        task = db.query(DownloadTask).filter(DownloadTask.task_id == "t1").first()
+        task.status = TaskStatus.FAILED
+        task.error_message = "boom"
+        db.commit()
+        task.priority = 3
+        db.flush()
+        db.rollback()
+        bus.flush()
+        changes = subscriber.take()["t1"]
+        assert changes["status"] == TaskStatus.FAILED
+        assert changes["error_message"] == "boom"
+        assert "video_url" not in changes and "priority" not in changes
+
+        db.delete(db.query(DownloadTask).filter(DownloadTask.task_id == "t1").first())
+        db.commit()
+        bus.flush()
+        assert subscriber.take() == {"t1": None}
+
+        bus.watch(session_factory)
+        bus.unwatch()
+        db.add(DownloadTask(task_id="t2", video_url="u", status=TaskStatus.PENDING))
+        db.commit()
+        db.close()
+        bus.flush()
+        assert subscriber.take() == {}
+        bus.unsubscribe(subscriber)
+
+    asyncio.run(run())
+
+
+def test_stream_coalesces_progress_per_interval():
+    """
+    Test that the SSE stream sends a ready event, then one merged message per flush
+    however many progress updates arrived, and unsubscribes when the client goes away.
+    """
+
+    async def run():
+        bus = TaskEventBus(interval=60)
+        stream = bus.stream()
+        assert (await stream.__anext__()).startswith("event: ready")
+
+        for downloaded in range(1, 101):
+            bus.publish(
+                "t1", {"downloaded_size": downloaded, "progress": float(downloaded)}
+            )
+        bus.publish("t2", {"status": TaskStatus.COMPLETED, "unknown": 1})
+        bus.flush()
+
+        message = await stream.__anext__()
+        event, data = message.strip().split("\n")
+        assert event == "event: tasks"
+        assert json.loads(data[len("data: ") :]) == {
+            "t1": {"downloaded_size": 100, "progress": 100.0},
+            "t2": {"status": "completed"},
+        }
+        assert bus.published == 101 and bus.pushes == 1
+
+        await stream.aclose()
+        assert bus.subscriber_count == 0
+        bus.publish("t1", {"progress": 1.0})
+        assert bus.published == 101
+
+    asyncio.run(run())
+
+
+def test_queue_position_changes_are_published():
+    """
+    Test that queue positions are compared between pushes, publishing only the
+    positions that moved and None for tasks that left the queue.
+    """
+
+    async def run():
+        queue = {"t1": 1, "t2": 2}
+        bus = TaskEventBus(interval=0.01, positions=lambda: dict(queue))
+        subscriber = bus.subscribe()
+
+        await asyncio.wait_for(subscriber.ready.wait(), timeout=1)
+        assert subscriber.take() == {
+            "t1": {"queue_position": 1},
+            "t2": {"queue_position": 2},
+        }
+
+        queue.pop("t1")
+        queue["t2"] = 1
+        await asyncio.wait_for(subscriber.ready.wait(), timeout=1)
+        assert subscriber.take() == {
+            "t1": {"queue_position": None},
+            "t2": {"queue_position": 1},
+        }
+
+        await asyncio.sleep(0.05)
+        assert subscriber.take() == {}
+        bus.unsubscribe(subscriber)
+
+    asyncio.run(run())
@@ -0,0 +1,209 @@
+import sys
+import os
+import asyncio
+from datetime import datetime, timedelta
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.models import DownloadTask, TaskCommand, TaskStatus
+from app.services.task_manager import TaskManager
+
+
+def test_stop_is_forwarded_to_lease_owner(session_factory):
+    """
+    Test that stopping a task leased by another process sends it a command
+    instead of changing the task directly, and only one process acquires a task.
+    """
+    db = session_factory()
+    db.add_all(
+        [
+            DownloadTask(
+                task_id="remote",
+                video_url="u",
+                status=TaskStatus.DOWNLOADING,
+                worker_id="owner",
+                lease_expires_at=datetime.now() + timedelta(seconds=30),
+            ),
+            DownloadTask(
+                task_id="queued",
+                video_url="u",
+                status=TaskStatus.PENDING,
+                queued_at=datetime.now(),
+            ),
+        ]
+    )
+    db.commit()
+
+    api, owner = TaskManager(), TaskManager(worker_id="owner")
+    asyncio.run(api.stop_task(db, "remote"))
+    db.expire_all()
+
+    assert (
+        db.query(DownloadTask).filter(DownloadTask.task_id == "remote").first().status
+        == TaskStatus.DOWNLOADING
+    )
+    assert owner._take_commands() == [("remote", "stop")]
+    assert db.query(TaskCommand).count() == 0
+
+    assert api._acquire_lease(db, "queued") is True
+    assert owner._acquire_lease(db, "queued") is False
+    db.close()
+
+
+def test_expired_leases_are_taken_over(session_factory):
+    """
+    Test that tasks whose lease expired are requeued, honouring a command the dead owner never ran.
+    """
+    expired = datetime.now() - timedelta(seconds=1)
+    db = session_factory()
+    db.add_all(
+        [
+            DownloadTask(
+                task_id="orphan",
+                video_url="u",
+                status=TaskStatus.DOWNLOADING,
+                worker_id="dead",
+                lease_expires_at=expired,
+                queued_at=expired,
+            ),
+            DownloadTask(
+                task_id="paused",
+                video_url="u",
+                status=TaskStatus.DOWNLOADING,
+                worker_id="dead",
+                lease_expires_at=expired,
+                queued_at=expired,
+            ),
+            DownloadTask(
+                task_id="alive",
+                video_url="u",
+                status=TaskStatus.DOWNLOADING,
+                worker_id="other",
+                lease_expires_at=datetime.now() + timedelta(seconds=30),
+            ),
+            TaskCommand(task_id="paused", worker_id="dead", command="pause"),
+        ]
+    )
+    db.commit()
+    db.close()
+
+    recovered, _ = TaskManager()._reconcile_interrupted_tasks(startup=False)
+
+    assert recovered == [("orphan", 0)]
+    db = session_factory()
+    statuses = dict(db.query(DownloadTask.task_id, DownloadTask.status).all())
+    assert statuses == {
+        "orphan": TaskStatus.PENDING,
+        "paused": TaskStatus.PAUSED,
+        "alive": TaskStatus.DOWNLOADING,
+    }
+    # interruptions are counted apart from the download retry budget
+    orphan = db.query(DownloadTask).filter(DownloadTask.task_id == "orphan").one()
+    assert (orphan.recovery_count, orphan.retry_count) == (1, 0)
+    assert db.query(TaskCommand).count() == 0
+    db.close()
+
+
+def test_orphaned_queued_tasks_are_adopted(session_factory):
+    """
+    Test that API processes adopt queued tasks without a live owner once they are due,
+    leave tasks queued by a live process alone, and give up their queue on exit.
+    """
+    past = datetime.now() - timedelta(seconds=10)
+    db = session_factory()
+    db.add_all(
+        [
+            DownloadTask(
+                task_id="released",
+                video_url="u",
+                status=TaskStatus.PENDING,
+                queued_at=past,
+            ),
+            DownloadTask(
+                task_id="crashed",
+                video_url="u",
+                status=TaskStatus.PENDING,
+                queued_at=past,
+                worker_id="dead",
+                lease_expires_at=past,
+            ),
+            DownloadTask(
+                task_id="owned",
+                video_url="u",
+                status=TaskStatus.PENDING,
+                queued_at=past,
+                worker_id="other",
+                lease_expires_at=datetime.now() + timedelta(seconds=30),
+            ),
+            DownloadTask(
+                task_id="later",
+                video_url="u",
+                status=TaskStatus.PENDING,
+                queued_at=datetime.now() + timedelta(minutes=5),
+            ),
+        ]
+    )
+    db.commit()
+
+    manager = TaskManager()
+    recovered, _ = manager._reconcile_interrupted_tasks(startup=False)
+    assert sorted(task_id for task_id, _ in recovered) == ["crashed", "released"]
+    recovered, _ = TaskManager()._reconcile_interrupted_tasks(startup=True)
+    assert [task_id for task_id, _ in recovered] == ["later"]
+
+    owners = dict(db.query(DownloadTask.task_id, DownloadTask.worker_id).all())
+    assert owners["released"] == owners["crashed"] == manager.worker_id
+    assert owners["owned"] == "other"
+
+    manager._release_claimed_tasks()
+    db.expire_all()
+    owners = dict(db.query(DownloadTask.task_id, DownloadTask.worker_id).all())
+    assert owners["released"] is None and owners["crashed"] is None
+    db.close()
+
+
+def test_delete_is_forwarded_to_lease_owner(session_factory, tmp_path):
+    """
+    Test that deleting a task leased by another process lets that process stop the
+    download and clean up its temp files before the task is removed, and that a
+    delete the dead owner never ran is carried out by the process taking over.
+    """
+    db = session_factory()
+    for task_id, worker_id, lease in (
+        ("remote", "owner", datetime.now() + timedelta(seconds=30)),
+        ("orphan", "dead", datetime.now() - timedelta(seconds=1)),
+    ):
+        file_path = str(tmp_path / f"{task_id}.mp4")
+        for suffix in (".tmp", ".tmp.state"):
+            with open(file_path + suffix, "wb") as f:
+                f.write(b"partial")
+        db.add(
+            DownloadTask(
+                task_id=task_id,
+                video_url="u",
+                status=TaskStatus.DOWNLOADING,
+                worker_id=worker_id,
+                lease_expires_at=lease,
+                queued_at=datetime.now(),
+                file_path=file_path,
+            )
+        )
+    db.add(TaskCommand(task_id="orphan", worker_id="dead", command="delete"))
+    db.commit()
+
+    api, owner = TaskManager(), TaskManager(worker_id="owner")
+    assert api.delete_task(db, "remote") is True
+    db.expire_all()
+    assert db.query(DownloadTask).filter(DownloadTask.task_id == "remote").count()
+    assert os.path.exists(tmp_path / "remote.mp4.tmp")
+
+    asyncio.run(owner._handle_commands())
+    recovered, _ = api._reconcile_interrupted_tasks(startup=False)
+
+    assert recovered == []
+    db.expire_all()
+    assert db.query(DownloadTask).count() == 0
+    assert db.query(TaskCommand).count() == 0
+    assert os.listdir(tmp_path) == ["test.db"]
+    db.close()
@@ -0,0 +1,38 @@
+import sys
+import os
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.models import DownloadTask, TaskStatus
+from app.services.task_manager import TaskManager
+
+
+def test_reconcile_interrupted_task_files(tmp_path):
+    """
+    Test that an interrupted task takes its progress from the temp file,
+    and a task whose file was already renamed is marked completed.
+    """
+    manager = TaskManager()
+
+    partial = DownloadTask(
+        task_id="a",
+        status=TaskStatus.DOWNLOADING,
+        file_path=str(tmp_path / "a.mp4"),
+        total_size=10,
+        downloaded_size=8,
+    )
+    (tmp_path / "a.mp4.tmp").write_bytes(b"x" * 4)
+    assert manager._reconcile_files(partial) is False
+    assert partial.downloaded_size == 4
+    assert partial.progress == 40
+
+    finished = DownloadTask(
+        task_id="b",
+        status=TaskStatus.DOWNLOADING,
+        file_path=str(tmp_path / "b.mp4"),
+        total_size=10,
+    )
+    (tmp_path / "b.mp4").write_bytes(b"x" * 10)
+    assert manager._reconcile_files(finished) is True
+    assert finished.status == TaskStatus.COMPLETED
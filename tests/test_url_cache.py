@@ -0,0 +1,88 @@
+import sys
+import os
+import asyncio
+import time
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.services.url_cache import DownloadUrlCache, url_expiry
+from app.services.xiaohongshu_api import XiaohongshuAPI
+
+
+def test_url_expiry_and_cache_lifetime():
+    """
+    Test that signed URL expiry parameters are parsed and bound the cache entry's lifetime.
+    """
+    now = int(time.time())
+    assert url_expiry(f"https://cdn.test/v.mp4?Expires={now + 600}&sign=x") == now + 600
+    assert url_expiry(f"https://cdn.test/v.mp4?sign=abc&t={now + 600:08x}") == now + 600
+    assert (
+        url_expiry(
+            "https://cdn.test/v.mp4?X-Amz-Date=20260101T000000Z&X-Amz-Expires=300"
+        )
+        == 1767225900
+    )
+    assert url_expiry("https://cdn.test/v.mp4") is None
+
+    cache = DownloadUrlCache(ttl=600, expiry_margin=60)
+    cache.put(
+        "a",
+        "hd",
+        [f"https://cdn.test/a.mp4?expires={now + 3600}", "https://backup.test/a.mp4"],
+    )
+    cache.put(
+        "b", "hd", [f"https://cdn.test/b.mp4?expires={now + 30}"]
+    )  # 即将过期,不缓存
+    cache.put("c", "hd", ["https://cdn.test/c.mp4"])
+
+    assert cache.get("a", "hd") == [
+        f"https://cdn.test/a.mp4?expires={now + 3600}",
+        "https://backup.test/a.mp4",
+    ]
+    assert cache.get("a", "sd") is None
+    assert cache.get("b", "hd") is None
+    assert cache.get("c", "hd") == ["https://cdn.test/c.mp4"]
+
+    cache.invalidate("a")
+    assert cache.get("a", "hd") is None
+    assert cache.to_dict() == {
+        "entries": 1,
+        "hits": 2,
+        "misses": 3,
+        "hit_rate": 0.4,
+        "invalidations": 1,
+    }
+
+
+def test_download_urls_are_cached_until_expired_link(monkeypatch):
+    """
+    Test that repeated lookups reuse resolved URLs without fetching the page,
+    and an expired-link refresh drops the entry and resolves again.
+    """
+    api = XiaohongshuAPI()
+    fetches = []
+
+    async def get_video_info(video_url, debug=False, use_cache=False):
+        fetches.append(use_cache)
+        return {
+            "video_id": "abc",
+            "video_urls": [f"https://cdn.test/abc.mp4?v={len(fetches)}"],
+        }
+
+    monkeypatch.setattr(api, "get_video_info", get_video_info)
+
+    async def run():
+        first = await api.get_download_urls("abc", "hd")
+        again = await api.get_download_urls("abc", "hd")
+        refreshed = await api.get_download_urls("abc", "hd", use_cache=False)
+        latest = await api.get_download_url("abc", "hd")
+        return first, again, refreshed, latest
+
+    first, again, refreshed, latest = asyncio.run(run())
+
+    assert first == again == ["https://cdn.test/abc.mp4?v=1"]
+    assert refreshed == ["https://cdn.test/abc.mp4?v=2"]
+    assert latest == "https://cdn.test/abc.mp4?v=2"
+    assert fetches == [True, False]
+    assert api.url_cache.to_dict()["invalidations"] == 1
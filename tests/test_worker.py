@@ -0,0 +1,122 @@
+import sys
+import os
+import asyncio
+from datetime import datetime, timedelta
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.config import settings
+from app.models import DownloadTask, TaskStatus
+from app.schemas import DownloadTaskCreate
+from app.services.task_manager import TaskManager
+
+VIDEO_URL = "https://www.xiaohongshu.com/explore"
+
+
+def test_workers_claim_queued_tasks_once(session_factory, monkeypatch):
+    """
+    Test that workers claim queued tasks by priority without overlap, skip deferred tasks,
+    and notice tasks that were stopped through the API.
+    """
+    monkeypatch.setattr(settings, "EMBEDDED_WORKER", False)
+
+    now = datetime.now() - timedelta(seconds=10)
+    db = session_factory()
+    db.add_all(
+        [
+            DownloadTask(
+                task_id="low",
+                video_url="u",
+                status=TaskStatus.PENDING,
+                priority=0,
+                queued_at=now,
+            ),
+            DownloadTask(
+                task_id="high",
+                video_url="u",
+                status=TaskStatus.PENDING,
+                priority=5,
+                queued_at=now,
+            ),
+            DownloadTask(
+                task_id="later",
+                video_url="u",
+                status=TaskStatus.PENDING,
+                priority=0,
+                queued_at=now + timedelta(seconds=1),
+            ),
+            DownloadTask(task_id="created", video_url="u", status=TaskStatus.PENDING),
+            DownloadTask(
+                task_id="deferred",
+                video_url="u",
+                status=TaskStatus.PENDING,
+                priority=9,
+                queued_at=datetime.now() + timedelta(minutes=1),
+            ),
+        ]
+    )
+    db.commit()
+
+    api = TaskManager()
+    asyncio.run(api.start_task(db, "created"))
+    assert api.scheduler.queued_count == 0
+
+    first, second = TaskManager(worker_id="w1"), TaskManager(worker_id="w2")
+    claimed_first, _ = first._claim_tasks(2)
+    claimed_second, _ = second._claim_tasks(5)
+    assert claimed_first == ["high", "low"]
+    assert sorted(claimed_second) == ["created", "later"]
+
+    task = db.query(DownloadTask).filter(DownloadTask.task_id == "low").first()
+    task.status = TaskStatus.STOPPED
+    db.commit()
+    db.close()
+    assert first._find_revoked_tasks(["high", "low"]) == ["low"]
+
+
+def test_api_process_leaves_metadata_to_workers(session_factory, monkeypatch):
+    """
+    Test that with a separate worker the API process creates tasks without fetching pages.
+    """
+    monkeypatch.setattr(settings, "EMBEDDED_WORKER", False)
+    api = TaskManager()
+    fetches = []
+
+    async def get_video_info(video_url, use_cache=False):
+        fetches.append(video_url)
+        return {"video_id": "abc", "title": "t", "author": "a"}
+
+    monkeypatch.setattr(api.xhs_api, "get_video_info", get_video_info)
+
+    async def run():
+        db = session_factory()
+        try:
+            task = await api.create_task(
+                db, DownloadTaskCreate(video_url=f"{VIDEO_URL}/abc")
+            )
+            job = api.create_tasks_batch(
+                [DownloadTaskCreate(video_url=f"{VIDEO_URL}/{i}") for i in range(3)]
+            )
+            await job.runner
+            return task.video_id, task.title, job
+        finally:
+            db.close()
+
+    video_id, title, job = asyncio.run(run())
+
+    assert (video_id, title) == ("abc", None)
+    assert job.status == "completed"
+    assert job.resolved == 3 and len(job.task_ids) == 3
+    assert fetches == []
+    assert TaskManager(worker_id="w1").fetches_metadata
+
+
+def test_importing_the_module_does_not_build_the_manager():
+    """
+    Test that the global manager is only built on first use, so workers don't construct it.
+    """
+    import app.services.task_manager as module
+
+    assert "task_manager" not in vars(module)
+    assert module.task_manager is module.get_task_manager()